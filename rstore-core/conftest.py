@@ -0,0 +1,160 @@
+import pytest
+from django.contrib.auth.models import Group, Permission
+from django.db import connection
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from saleor.account.models import Address, User
+from saleor.core.permissions import AccountPermissions, CommissionPermissions
+from saleor.order.models import Order
+from saleor.partner.models import Partner
+from saleor.product.models import ProductType
+from saleor.shipping.models import ShippingZone
+from saleor.warehouse.models import Warehouse
+
+
+class ApiClient:
+    """Execute GraphQL operations on a schema as the given user."""
+
+    def __init__(self, schema, user):
+        self.schema = schema
+        self.user = user
+
+    def post_graphql(self, query, variables=None):
+        request = RequestFactory().post("/graphql/")
+        request.user = self.user
+        request.app = None
+        return self.schema.execute(
+            query, context_value=request, variable_values=variables
+        )
+
+
+def get_graphql_content(response):
+    assert not response.errors, response.errors
+    return response.data
+
+
+@pytest.fixture
+def schema():
+    """Schema the API clients execute operations on.
+
+    Test modules override it with a schema of the query types they cover.
+    """
+    raise NotImplementedError("Override the schema fixture in the test module.")
+
+
+@pytest.fixture
+def address(db):
+    return Address.objects.create(
+        first_name="John",
+        last_name="Doe",
+        street_address_1="House 7, Road 2",
+        city="Dhaka",
+        postal_code="1207",
+        country="BD",
+    )
+
+
+@pytest.fixture
+def customer_user(address):
+    user = User.objects.create(
+        phone="01811111111",
+        email="test@example.com",
+        default_billing_address=address,
+        default_shipping_address=address,
+    )
+    user.addresses.add(address)
+    return user
+
+
+@pytest.fixture
+def staff_user(db):
+    user = User.objects.create(
+        phone="01822222222", email="staff_test@example.com", is_staff=True
+    )
+    user.groups.add(Group.objects.create(name="staff"))
+    return user
+
+
+@pytest.fixture
+def staff_api_client(schema, staff_user):
+    return ApiClient(schema, staff_user)
+
+
+@pytest.fixture
+def permission_manage_staff():
+    return Permission.objects.get(codename=AccountPermissions.MANAGE_STAFF.codename)
+
+
+@pytest.fixture
+def permission_view_commission():
+    return Permission.objects.get(
+        codename=CommissionPermissions.VIEW_COMMISSION.codename
+    )
+
+
+@pytest.fixture
+def partner(db):
+    return Partner.objects.create(
+        partner_name="Example Partner",
+        partner_oidc_id="example-partner-oidc",
+        partner_id="example-partner",
+        email="partner@example.com",
+        secret="partner-secret",
+        root_url="https://example.com",
+        redirect_urls="https://example.com",
+    )
+
+
+@pytest.fixture
+def shipping_zone(db):
+    return ShippingZone.objects.create(name="Bangladesh", countries=["BD"])
+
+
+@pytest.fixture
+def warehouse(address, shipping_zone):
+    warehouse = Warehouse.objects.create(
+        address=address,
+        name="Example Warehouse",
+        slug="example-warehouse",
+        email="warehouse@example.com",
+    )
+    warehouse.shipping_zones.add(shipping_zone)
+    return warehouse
+
+
+@pytest.fixture
+def product_type(db):
+    return ProductType.objects.create(
+        name="Default Type", has_variants=True, is_shipping_required=True
+    )
+
+
+@pytest.fixture
+def order(customer_user, address):
+    return Order.objects.create(
+        user=customer_user,
+        user_email=customer_user.email,
+        billing_address=address,
+        shipping_address=address,
+    )
+
+
+@pytest.fixture
+def assert_query_count_does_not_grow(django_assert_num_queries):
+    """Check that a query takes as many database queries after adding rows.
+
+    The query is executed once before counting, so caches it fills don't
+    change the count. Returns the content of the last response.
+    """
+
+    def check(api_client, query, add_rows):
+        get_graphql_content(api_client.post_graphql(query))
+        with CaptureQueriesContext(connection) as queries:
+            get_graphql_content(api_client.post_graphql(query))
+        add_rows()
+        with django_assert_num_queries(len(queries)):
+            response = api_client.post_graphql(query)
+        return get_graphql_content(response)
+
+    return check
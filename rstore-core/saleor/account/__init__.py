@@ -1,3 +1,6 @@
+default_app_config = "saleor.account.apps.AccountAppConfig"
+
+
 class CustomerEvents:
     """The different customer event types."""
 
@@ -1,7 +1,10 @@
 import ast
 import json
+import threading
+import time
 
 from django.conf import settings
+from jose import jwt
 from keycloak import KeycloakAdmin, KeycloakOpenID
 from keycloak.exceptions import raise_error_from_response, KeycloakGetError
 from keycloak.urls_patterns import URL_ADMIN_CLIENT, URL_ADMIN_USER_REALM_ROLES, URL_ADMIN_REALM_ROLES_ROLE_BY_NAME
@@ -200,6 +203,16 @@ class KeyCloakAdminConnector(AdminConnector):
 
 
 class KeycloakTokenAuthorizer(TokenAuthorizer):
+    """Verify Keycloak access tokens locally against the realm's signing keys.
+
+    The realm JWKS is cached for `AUTHORIZATION_PUBLIC_KEY_TTL` seconds and
+    refetched earlier only when a token is signed with an unknown `kid`, so
+    rotated keys are picked up without a network call per token. The `userinfo`
+    endpoint is called only when `AUTHORIZATION_CHECK_REVOCATION` is enabled.
+    """
+
+    # Minimum number of seconds between two JWKS refreshes caused by unknown kids.
+    KID_MISS_REFRESH_INTERVAL = 10
 
     def __init__(self):
         keycloak_config = settings.KEYCLOAK_ADMIN_CONFIG
@@ -209,13 +222,40 @@ class KeycloakTokenAuthorizer(TokenAuthorizer):
             realm_name=keycloak_config['AUTHORIZATION_REALM_NAME'],
             client_secret_key=keycloak_config['AUTHORIZATION_CLIENT_SECRET_KEY']
         )
+        self.public_key_ttl = keycloak_config.get('AUTHORIZATION_PUBLIC_KEY_TTL', 3600)
+        self.check_revocation = keycloak_config.get('AUTHORIZATION_CHECK_REVOCATION', False)
+        self._jwks = None
+        self._jwks_kids = set()
+        self._jwks_fetched_at = 0.0
+        self._jwks_lock = threading.Lock()
+
+    def _fetch_jwks(self):
+        jwks = self.keycloak_openid.certs()
+        self._jwks = jwks
+        self._jwks_kids = {key.get('kid') for key in jwks.get('keys', [])}
+        self._jwks_fetched_at = time.monotonic()
+
+    def _is_jwks_stale(self, kid):
+        if self._jwks is None:
+            return True
+        age = time.monotonic() - self._jwks_fetched_at
+        if age > self.public_key_ttl:
+            return True
+        return kid is not None and kid not in self._jwks_kids and age > self.KID_MISS_REFRESH_INTERVAL
+
+    def get_jwks(self, kid=None):
+        if self._is_jwks_stale(kid):
+            with self._jwks_lock:
+                if self._is_jwks_stale(kid):
+                    self._fetch_jwks()
+        return self._jwks
 
     def validate_token(self, token):
-        return self.keycloak_openid.userinfo(token)
+        if self.check_revocation:
+            self.keycloak_openid.userinfo(token)
+        return self.token_info(token)
 
     def token_info(self, token):
-        keycloak_public_key = '-----BEGIN PUBLIC KEY-----\n' + \
-                              self.keycloak_openid.public_key() + \
-                              '\n-----END PUBLIC KEY-----'
+        kid = jwt.get_unverified_header(token).get('kid')
         options = {"verify_signature": True, "verify_aud": False, "exp": True}
-        return self.keycloak_openid.decode_token(token, key=keycloak_public_key, options=options)
+        return self.keycloak_openid.decode_token(token, key=self.get_jwks(kid), options=options)
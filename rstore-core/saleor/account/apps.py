@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class AccountAppConfig(AppConfig):
+    name = "saleor.account"
+
+    def ready(self):
+        # Connect the principal and reference data cache invalidation signals.
+        from . import principal, reference_data  # noqa: F401
@@ -474,15 +474,20 @@ class User(PermissionsMixin, ModelWithMetadata, AbstractBaseUser, SoftDeleteMode
 
         return q
 
-    def get_children(self, include_self=True):
+    def get_children(self, include_self=True, group=None, region_ids=None):
         start_time = time()
         # all_users = User.objects.all()
 
-        group_children = get_hierarchy(group_id=self.groups.first().id)
+        if group is None:
+            group = self.groups.first()
+        if region_ids is None:
+            region_ids = list(self.regions.values_list('id', flat=True))
 
-        if len(group_children) == 1 and group_children[0] == self.groups.first().id:
+        group_children = get_hierarchy(group_id=group.id)
+
+        if len(group_children) == 1 and group_children[0] == group.id:
             if GroupHierarchy.objects.filter(
-                    child_id=self.groups.first().id, has_txn=True
+                    child_id=group.id, has_txn=True
             ).exists():
                 return [self.pk]
 
@@ -493,10 +498,8 @@ class User(PermissionsMixin, ModelWithMetadata, AbstractBaseUser, SoftDeleteMode
             qf &= Q(groups__in=group_children)
             # all_users = all_users.filter(groups__in=group_children)
 
-        if self.regions.count() > 0:
-            result = []
-            parent_regions = self.regions.all().values_list('id', flat=True)
-            qf &= Q(regions__in=parent_regions)
+        if len(region_ids) > 0:
+            qf &= Q(regions__in=region_ids)
 
             # parent_regions = self.regions.all()
             # result = all_users.filter(regions__in=parent_regions)
@@ -510,10 +513,7 @@ class User(PermissionsMixin, ModelWithMetadata, AbstractBaseUser, SoftDeleteMode
             # all_users = result
         all_users = User.objects.filter(qf)
 
-        child_list = []
-
-        for user in all_users:
-            child_list.append(user.id)
+        child_list = list(all_users.values_list('id', flat=True))
 
         if include_self:
             child_list.append(self.pk)
@@ -0,0 +1,156 @@
+import hashlib
+from typing import Iterable, List, Optional, Set, Tuple
+from uuid import uuid4
+
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import User
+from .scope import RequesterScope
+
+PRINCIPAL_KEY_PREFIX = "account-principal"
+GLOBAL_VERSION_KEY = f"{PRINCIPAL_KEY_PREFIX}-version"
+
+
+def _get_token_key(access_token: str) -> str:
+    token_hash = hashlib.sha256(access_token.encode()).hexdigest()
+    return f"{PRINCIPAL_KEY_PREFIX}:{token_hash}"
+
+
+def _get_user_version_key(user_pk) -> str:
+    return f"{GLOBAL_VERSION_KEY}:{user_pk}"
+
+
+class Principal:
+    """Compact snapshot of an authenticated user cached per access token.
+
+    Besides the user row it keeps the group names, region ids and permission
+    codenames, so an authenticated request can be served without hitting the
+    database for authentication or permission checks.
+    """
+
+    def __init__(
+        self,
+        user_fields: dict,
+        groups: List[Tuple[int, str]],
+        region_ids: List[int],
+        permissions: Set[str],
+        versions: Tuple[Optional[str], Optional[str]],
+    ):
+        self.user_fields = user_fields
+        self.groups = groups
+        self.region_ids = region_ids
+        self.permissions = permissions
+        self.versions = versions
+
+    @property
+    def user_pk(self):
+        return self.user_fields["id"]
+
+    @property
+    def is_active(self):
+        return self.user_fields["is_active"]
+
+    @property
+    def group_names(self):
+        return [name for _pk, name in self.groups]
+
+    @classmethod
+    def from_user(cls, user: User, versions) -> "Principal":
+        user_fields = {
+            field.attname: getattr(user, field.attname)
+            for field in User._meta.concrete_fields
+        }
+        groups = list(user.groups.order_by("pk").values_list("pk", "name"))
+        region_ids = list(user.regions.values_list("id", flat=True))
+        permissions = set(user.get_all_permissions())
+        return cls(user_fields, groups, region_ids, permissions, versions)
+
+    def get_user(self) -> User:
+        """Return a user instance with its permission cache already populated."""
+        field_names = list(self.user_fields.keys())
+        values = [self.user_fields[name] for name in field_names]
+        user = User.from_db("default", field_names, values)
+        # Read by ModelBackend.get_all_permissions() instead of querying the
+        # user and group permission tables.
+        user._perm_cache = set(self.permissions)
+        return user
+
+    def get_requester_scope(self, user: User) -> RequesterScope:
+        scope = RequesterScope(user)
+        group = None
+        if self.groups:
+            group_pk, group_name = self.groups[0]
+            group = Group(pk=group_pk, name=group_name)
+        scope.prime("group", group)
+        scope.prime("region_ids", list(self.region_ids))
+        return scope
+
+
+def _get_versions(user_pk) -> Tuple[Optional[str], Optional[str]]:
+    user_version_key = _get_user_version_key(user_pk)
+    versions = cache.get_many([GLOBAL_VERSION_KEY, user_version_key])
+    return versions.get(GLOBAL_VERSION_KEY), versions.get(user_version_key)
+
+
+def get_cached_principal(access_token: str) -> Optional[Principal]:
+    principal = cache.get(_get_token_key(access_token))
+    if principal is None:
+        return None
+    if principal.versions != _get_versions(principal.user_pk):
+        return None
+    return principal
+
+
+def cache_principal(access_token: str, user: User, ttl: int) -> Principal:
+    versions = _get_versions(user.pk)
+    principal = Principal.from_user(user, versions)
+    if ttl > 0:
+        cache.set(_get_token_key(access_token), principal, timeout=ttl)
+    return principal
+
+
+def invalidate_user_principals(user_pks: Iterable):
+    cache.set_many(
+        {_get_user_version_key(pk): uuid4().hex for pk in user_pks}, timeout=None
+    )
+
+
+def invalidate_all_principals():
+    cache.set(GLOBAL_VERSION_KEY, uuid4().hex, timeout=None)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def handle_user_change(sender, instance, **kwargs):
+    invalidate_user_principals([instance.pk])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=User.regions.through)
+def handle_user_relations_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidate_user_principals([instance.pk])
+    elif pk_set:
+        invalidate_user_principals(pk_set)
+    else:
+        # Clearing the relation from the other side, e.g. `group.user_set.clear()`.
+        invalidate_all_principals()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def handle_group_permissions_change(sender, action, **kwargs):
+    if action.startswith("post_"):
+        invalidate_all_principals()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def handle_group_or_permission_change(sender, **kwargs):
+    invalidate_all_principals()
@@ -0,0 +1,92 @@
+from typing import Callable, Iterable, List
+from uuid import uuid4
+
+from decouple import config
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import District, MFSAccountType, Thana
+
+REFERENCE_DATA_KEY_PREFIX = "reference-data"
+REFERENCE_DATA_CACHE_TIMEOUT = config(
+    "REFERENCE_DATA_CACHE_TIMEOUT", default=60 * 60 * 24, cast=int
+)
+
+REGIONS = "regions"
+MFS_ACCOUNT_TYPES = "mfs-account-types"
+GROUPS = "groups"
+# Choices and address validation rules only change with a deployment.
+STATIC = "static"
+
+
+def _get_version_key(dataset: str) -> str:
+    return f"{REFERENCE_DATA_KEY_PREFIX}-version:{dataset}"
+
+
+def get_reference_data_version(dataset: str) -> str:
+    if dataset == STATIC:
+        return STATIC
+    version_key = _get_version_key(dataset)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid4().hex, timeout=None)
+        version = cache.get(version_key)
+    return version
+
+
+def invalidate_reference_data(dataset: str):
+    cache.set(_get_version_key(dataset), uuid4().hex, timeout=None)
+
+
+def _get_reference_data(dataset: str, name: str, load: Callable[[], Iterable]) -> List:
+    version = get_reference_data_version(dataset)
+    key = f"{REFERENCE_DATA_KEY_PREFIX}:{dataset}:{name}:{version}"
+    data = cache.get(key)
+    if data is None:
+        data = list(load())
+        cache.set(key, data, timeout=REFERENCE_DATA_CACHE_TIMEOUT)
+    return data
+
+
+def get_districts() -> List[District]:
+    return _get_reference_data(REGIONS, "districts", District.objects.all)
+
+
+def get_thanas() -> List[Thana]:
+    return _get_reference_data(REGIONS, "thanas", Thana.objects.all)
+
+
+def get_district_thanas(district_id) -> List[Thana]:
+    return [thana for thana in get_thanas() if str(thana.district_id) == str(district_id)]
+
+
+def get_mfs_account_types() -> List[MFSAccountType]:
+    return _get_reference_data(
+        MFS_ACCOUNT_TYPES, "all", lambda: MFSAccountType.objects.order_by("pk")
+    )
+
+
+def get_groups() -> List[Group]:
+    return _get_reference_data(GROUPS, "all", lambda: Group.objects.order_by("pk"))
+
+
+@receiver(post_save, sender=District)
+@receiver(post_delete, sender=District)
+@receiver(post_save, sender=Thana)
+@receiver(post_delete, sender=Thana)
+def handle_region_change(sender, **kwargs):
+    invalidate_reference_data(REGIONS)
+
+
+@receiver(post_save, sender=MFSAccountType)
+@receiver(post_delete, sender=MFSAccountType)
+def handle_mfs_account_type_change(sender, **kwargs):
+    invalidate_reference_data(MFS_ACCOUNT_TYPES)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def handle_group_change(sender, **kwargs):
+    invalidate_reference_data(GROUPS)
@@ -0,0 +1,103 @@
+import json
+import logging
+
+import redis
+from decouple import config
+from redis.exceptions import LockError, LockNotOwnedError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import SessionLog
+
+logger = logging.getLogger(__name__)
+
+SESSION_LOG_BUFFER_KEY = "account:session-log-buffer"
+SESSION_LOG_FLUSH_LOCK_KEY = "account:session-log-flush-lock"
+
+SESSION_LOG_BUFFER_URL = config(
+    "SESSION_LOG_BUFFER_URL",
+    default=config("CELERY_BROKER_URL", default="redis://localhost:6379/0"),
+)
+SESSION_LOG_FLUSH_INTERVAL = config("SESSION_LOG_FLUSH_INTERVAL", default=10, cast=int)
+SESSION_LOG_FLUSH_BATCH_SIZE = config(
+    "SESSION_LOG_FLUSH_BATCH_SIZE", default=500, cast=int
+)
+# Renewed for every batch, so it only has to outlast the write of one batch.
+SESSION_LOG_FLUSH_LOCK_TIMEOUT = SESSION_LOG_FLUSH_INTERVAL * 6
+
+_client = None
+
+
+def get_buffer_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(SESSION_LOG_BUFFER_URL)
+    return _client
+
+
+def buffer_session_log(user):
+    """Queue a session event to be written by `flush_session_logs`.
+
+    Falls back to a direct insert when the buffer is unavailable, so an event
+    is never lost.
+    """
+    event = json.dumps({"user_id": user.pk, "created": timezone.now().isoformat()})
+    try:
+        get_buffer_client().rpush(SESSION_LOG_BUFFER_KEY, event)
+    except redis.RedisError:
+        logger.warning(
+            "Session log buffer unavailable, writing directly.", exc_info=True
+        )
+        SessionLog.objects.create(user=user)
+
+
+def flush_session_logs(batch_size=SESSION_LOG_FLUSH_BATCH_SIZE):
+    """Write buffered session events to the database in batches.
+
+    Events are removed from the buffer only after their batch is inserted, so
+    delivery is at-least-once: a crash between the two steps replays the batch.
+    The flush stops when its lock is lost, leaving the rest to the flush that
+    holds it. Returns the number of written rows.
+    """
+    client = get_buffer_client()
+    lock = client.lock(
+        SESSION_LOG_FLUSH_LOCK_KEY, timeout=SESSION_LOG_FLUSH_LOCK_TIMEOUT
+    )
+    if not lock.acquire(blocking=False):
+        return 0
+
+    written = 0
+    try:
+        while True:
+            try:
+                lock.reacquire()
+            except LockNotOwnedError:
+                logger.warning("Session log flush lock expired, stopping the flush.")
+                break
+            events = client.lrange(SESSION_LOG_BUFFER_KEY, 0, batch_size - 1)
+            if not events:
+                break
+            events_data = [json.loads(event) for event in events]
+            with transaction.atomic():
+                session_logs = SessionLog.objects.bulk_create(
+                    [SessionLog(user_id=data["user_id"]) for data in events_data]
+                )
+                # `created` is auto_now_add, so the inserted rows are stamped with
+                # the flush time; they get the login time of their event instead.
+                # Events buffered without it keep the flush time.
+                logged_in = []
+                for session_log, data in zip(session_logs, events_data):
+                    if data.get("created"):
+                        session_log.created = parse_datetime(data["created"])
+                        logged_in.append(session_log)
+                SessionLog.objects.bulk_update(logged_in, ["created"])
+            client.ltrim(SESSION_LOG_BUFFER_KEY, len(events), -1)
+            written += len(events)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # Expired while the last batch was written.
+            pass
+    return written
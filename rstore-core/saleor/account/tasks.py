@@ -0,0 +1,7 @@
+from ..celeryconf import app
+from .session_buffer import flush_session_logs
+
+
+@app.task
+def flush_session_logs_task():
+    flush_session_logs()
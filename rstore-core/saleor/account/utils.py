@@ -1,4 +1,5 @@
 import csv
+import logging
 import os
 import random
 import string
@@ -9,6 +10,7 @@ import jwt
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
 
@@ -21,8 +23,12 @@ from ..order.models import Order, OrderLine
 from ..partner.models import Partner
 from ..plugins.manager import get_plugins_manager
 from saleor.account.models import Thana, User, Region, SessionLog
+from .principal import cache_principal, get_cached_principal
+from .session_buffer import buffer_session_log
 from ..product.models import Category, ProductType, Product, ProductVariant
 
+logger = logging.getLogger(__name__)
+
 managers_path = os.path.join(
     settings.PROJECT_ROOT, "saleor", "static", "rstore-managers.csv"
 )
@@ -120,12 +126,9 @@ def transfer_responsibility(email, phone, group, thana, first_name, last_name, o
         regions = old_user.regions.all()
         user.regions.add(*regions)
 
-        children = User.objects.filter(parent=old_user)
-
-        for child in children:
-            child.parent = user
-            child.save()
-            yield "For %s parent %s has been assigned" % (child, user)
+        with transaction.atomic():
+            transferred = User.objects.filter(parent=old_user).update(parent=user, updated=timezone.now())
+        yield "For %s children parent %s has been assigned" % (transferred, user)
     else:
         yield "User with %s not found to transfer children and regions" % old_email
 
@@ -384,10 +387,8 @@ def add_replace_managers():
                                                      parent=parent)
                 if regions:
                     user.regions.add(*regions)
-                if children:
-                    for child in children:
-                        child.parent = user
-                    User.objects.bulk_update(children, ['parent'])
+                if children is not None:
+                    children.update(parent=user, updated=timezone.now())
                 yield "%s: %s/%s/%s %s" % (group, user.email, user.phone, password, message)
         except Exception as e:
             print(e)
@@ -420,10 +421,7 @@ def replace_removed_managers():
                                                          parent=parent)
                     if regions:
                         user.regions.add(*regions)
-                    if children:
-                        for child in children:
-                            child.parent = user
-                        User.objects.bulk_update(children, ['parent'])
+                    children.update(parent=user, updated=timezone.now())
                     yield "%s: %s/%s/%s %s" % (group, user.email, user.phone, password, message)
             except Exception as e:
                 print(e)
@@ -473,21 +471,25 @@ def authorize(request, token=None):
             auth = full_token.split()
             if len(auth) == 2 and auth[0] == 'JWT':
                 access_token = auth[1]
-                if user_cache.has(access_token):
-                    request.user = User.objects.get(pk=user_cache.get(access_token))
-                else:
+                principal = get_cached_principal(access_token)
+                if principal is None:
                     try:
-                        token_authorizer.validate_token(access_token)
-                        token_info = token_authorizer.token_info(access_token)
-                        request.user = User.objects.get(oidc_id=token_info['sub'])
-                        SessionLog.objects.create(user=request.user)
+                        token_info = token_authorizer.validate_token(access_token)
                         ttl = token_info['exp'] - int(round(time.time()))
-                        if not user_cache.has(access_token):
-                            user_cache.add(key=access_token, value=request.user.pk, ttl=ttl)
-                    except Exception as e:
-                        print(e)
-                        if not hasattr(request, 'user') or request.user is None:
-                            request.user = AnonymousUser()
+                        if user_cache.has(access_token):
+                            user = User.objects.get(pk=user_cache.get(access_token))
+                        else:
+                            user = User.objects.get(oidc_id=token_info['sub'])
+                            buffer_session_log(user)
+                            user_cache.add(key=access_token, value=user.pk, ttl=ttl)
+                        principal = cache_principal(access_token, user, ttl)
+                    except Exception:
+                        logger.exception("Could not authorize the access token.")
+                if principal is not None:
+                    request.user = principal.get_user()
+                    request.requester_scope = principal.get_requester_scope(request.user)
+                else:
+                    request.user = AnonymousUser()
             else:
                 request.user = AnonymousUser()
         else:
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class AppAppConfig(AppConfig):
+    name = "saleor.app"
+
+    def ready(self):
+        # Connect the app token cache invalidation signals.
+        from . import auth_cache  # noqa: F401
@@ -0,0 +1,104 @@
+import hashlib
+from typing import Optional
+from uuid import uuid4
+
+from decouple import config
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from ..partner.models import Partner
+from .models import App, AppToken
+
+APP_TOKEN_KEY_PREFIX = "app-token"
+APP_TOKEN_VERSION_KEY = f"{APP_TOKEN_KEY_PREFIX}-version"
+APP_TOKEN_CACHE_TIMEOUT = config("APP_TOKEN_CACHE_TIMEOUT", default=300, cast=int)
+
+# Cached value for tokens which don't belong to any active app.
+NO_APP = "no-app"
+
+
+def _get_token_key(auth_token: str) -> str:
+    token_hash = hashlib.sha256(auth_token.encode()).hexdigest()
+    return f"{APP_TOKEN_KEY_PREFIX}:{token_hash}"
+
+
+def _get_model_fields(instance) -> dict:
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+    }
+
+
+def _build_instance(model, fields: dict):
+    field_names = list(fields.keys())
+    return model.from_db("default", field_names, [fields[name] for name in field_names])
+
+
+def _load_app_snapshot(auth_token: str):
+    app = App.objects.filter(tokens__auth_token=auth_token, is_active=True).first()
+    if app is None:
+        return NO_APP
+    partner = Partner.objects.filter(partner_app=app).first()
+    return {
+        "app": _get_model_fields(app),
+        "permissions": frozenset(app.get_permissions()),
+        "partner": _get_model_fields(partner) if partner else None,
+    }
+
+
+def _build_app(snapshot) -> App:
+    app = _build_instance(App, snapshot["app"])
+    # Same attributes App.get_permissions() and get_app_partner() memoize on.
+    app._app_perm_cache = set(snapshot["permissions"])
+    partner = snapshot["partner"]
+    app._partner_cache = _build_instance(Partner, partner) if partner else None
+    return app
+
+
+def get_app_by_token(auth_token: str) -> Optional[App]:
+    """Return the active app owning the token, served from cache when possible.
+
+    The cached snapshot holds the app row, its permission codenames and its
+    partner, so an authenticated partner request makes no database queries.
+    """
+    token_key = _get_token_key(auth_token)
+    cached = cache.get_many([token_key, APP_TOKEN_VERSION_KEY])
+    version = cached.get(APP_TOKEN_VERSION_KEY)
+    entry = cached.get(token_key)
+    if entry is None or entry[0] != version:
+        entry = (version, _load_app_snapshot(auth_token))
+        cache.set(token_key, entry, timeout=APP_TOKEN_CACHE_TIMEOUT)
+    snapshot = entry[1]
+    if snapshot == NO_APP:
+        return None
+    return _build_app(snapshot)
+
+
+def get_app_partner(app: App) -> Optional[Partner]:
+    """Return the partner using the app as its API client."""
+    if not hasattr(app, "_partner_cache"):
+        app._partner_cache = Partner.objects.filter(partner_app=app).first()
+    return app._partner_cache
+
+
+def invalidate_app_tokens():
+    cache.set(APP_TOKEN_VERSION_KEY, uuid4().hex, timeout=None)
+
+
+@receiver(post_save, sender=App)
+@receiver(post_delete, sender=App)
+@receiver(post_save, sender=AppToken)
+@receiver(post_delete, sender=AppToken)
+@receiver(post_save, sender=Partner)
+@receiver(post_delete, sender=Partner)
+@receiver(post_delete, sender=Permission)
+def handle_app_change(sender, **kwargs):
+    invalidate_app_tokens()
+
+
+@receiver(m2m_changed, sender=App.permissions.through)
+def handle_app_permissions_change(sender, action, **kwargs):
+    if action.startswith("post_"):
+        invalidate_app_tokens()
@@ -6,8 +6,10 @@ import graphene
 from django.db.models import Sum, Count
 
 from .types import CommissionsGroup, Commission as CommissionType, ServiceCommission, MonthlyServiceCommission
+from ..core.optimizer import optimize_queryset
 
 from ...account.models import User
+from ...account.scope import get_requester_scope
 from ...commission.models import Rule, Commission, UserProfile, CommissionServiceMonth
 from ...partner.models import Partner
 
@@ -22,8 +24,18 @@ def resolve_rule(rule_id):
 
 
 def resolve_commissions(info, **kwargs):
-    children_list = info.context.user.get_children()
-    all_commission = Commission.objects.filter(user_id__in=children_list)
+    children_list = get_requester_scope(info.context).get_children()
+    all_commission = Commission.objects.filter(user_id__in=children_list).select_related(
+        'commission_service_month'
+    )
+    # Commissions are grouped in Python, so the lookups of the selected groups
+    # and of their commissions are applied to the commissions themselves.
+    all_commission = optimize_queryset(
+        all_commission, info, CommissionsGroup, ['edges', 'node'], prefix='commission_service_month__'
+    )
+    all_commission = optimize_queryset(
+        all_commission, info, CommissionType, ['edges', 'node', 'serviceCommissions']
+    )
 
     service_month = {}
     for commission in all_commission:
@@ -99,7 +111,7 @@ def resolve_monthly_service_commission(info, month):
     # as front-end cliend can not send dynamic year/month now
     currentMonth = datetime.now().month
     currentYear = datetime.now().year
-    children_list = info.context.user.get_children()
+    children_list = get_requester_scope(info.context).get_children()
     commission_entries = Commission.objects.filter(user_id__in=children_list, created__year=currentYear,
                                                    created__month=currentMonth)
     total_commission = commission_entries.aggregate(Sum('amount'))['amount__sum']
@@ -5,6 +5,8 @@ import datetime
 from .models import Rule
 from ..account.views.bi import get_bi_data
 from ..account.views.user import get_user_data
+from ..account.session_buffer import SESSION_LOG_FLUSH_INTERVAL
+from ..order.pipeline import ORDER_PIPELINE_RESUME_AFTER
 
 
 @app.task
@@ -26,6 +28,9 @@ def deactivate_expired_rules():
 
 e_hour, e_minute = [int(z) for z in (config("DEACTIVATE_RULE").split(','))]
 b_hour, b_minute = [int(z) for z in (config("BI_RECEIPT_GENERATION").split(','))]
+t_hour, t_minute = [
+    int(z) for z in (config("ORDER_TOTALS_RECONCILIATION", default="3,0").split(','))
+]
 
 
 @app.task
@@ -51,5 +56,17 @@ app.conf.beat_schedule = {
     'export_bi_user_report': {
         'task': 'saleor.commission.tasks.export_bi_user_report_data',
         'schedule': crontab(hour=b_hour, minute=b_minute)
+    },
+    'flush_session_logs': {
+        'task': 'saleor.account.tasks.flush_session_logs_task',
+        'schedule': datetime.timedelta(seconds=SESSION_LOG_FLUSH_INTERVAL)
+    },
+    'resume_order_pipelines': {
+        'task': 'saleor.order.tasks.resume_order_pipelines_task',
+        'schedule': datetime.timedelta(seconds=ORDER_PIPELINE_RESUME_AFTER)
+    },
+    'reconcile_order_totals': {
+        'task': 'saleor.order.tasks.reconcile_order_totals_task',
+        'schedule': crontab(hour=t_hour, minute=t_minute)
     }
 }
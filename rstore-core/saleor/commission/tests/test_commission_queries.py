@@ -0,0 +1,113 @@
+from datetime import date
+
+import graphene
+import pytest
+
+from ....commission import RuleCategory, RuleType
+from ....commission.models import (
+    Commission,
+    CommissionServiceMonth,
+    Rule,
+    RuleHistory,
+)
+from ....partner.models import Partner
+from ..schema import CommissionQueries
+
+COMMISSIONS_QUERY = """
+    query Commissions {
+        commissions(first: 20) {
+            edges {
+                node {
+                    month
+                    totalAmount
+                    service {
+                        partnerName
+                    }
+                    user {
+                        email
+                    }
+                    serviceCommissions {
+                        amount
+                        rule {
+                            name
+                        }
+                        order {
+                            id
+                        }
+                    }
+                }
+            }
+        }
+    }
+"""
+
+
+@pytest.fixture
+def schema():
+    return graphene.Schema(query=CommissionQueries)
+
+
+@pytest.fixture
+def rule_history():
+    rule = Rule.objects.create(
+        name="Partner sale",
+        type=RuleType.REGULAR,
+        category=RuleCategory.REALTIME,
+    )
+    return RuleHistory.objects.create(rule=rule)
+
+
+def create_commissions(user, rule_history, order, count):
+    for index in range(count):
+        partner = Partner.objects.create(
+            partner_name=f"Partner {index}",
+            partner_oidc_id=f"partner-oidc-{index}",
+            partner_id=f"partner-{index}",
+            email=f"partner-{index}@example.com",
+            secret=f"secret-{index}",
+            root_url="https://example.com",
+            redirect_urls="https://example.com",
+        )
+        service_month = CommissionServiceMonth.objects.create(
+            user=user, service=partner, month=date(2020, 1, 1)
+        )
+        Commission.objects.bulk_create(
+            [
+                Commission(
+                    user=user,
+                    order=order,
+                    rule_history=rule_history,
+                    amount=10,
+                    commission_service_month=service_month,
+                )
+                for _ in range(2)
+            ]
+        )
+
+
+def test_commissions_query_count_does_not_grow_with_commissions(
+    staff_api_client,
+    permission_view_commission,
+    rule_history,
+    order,
+    assert_query_count_does_not_grow,
+):
+    # given
+    staff_api_client.user.user_permissions.add(permission_view_commission)
+    user = staff_api_client.user
+    create_commissions(user, rule_history, order, 1)
+
+    # when
+    content = assert_query_count_does_not_grow(
+        staff_api_client,
+        COMMISSIONS_QUERY,
+        lambda: create_commissions(user, rule_history, order, 3),
+    )
+
+    # then
+    groups = content["commissions"]["edges"]
+    assert len(groups) == 4
+    for group in groups:
+        assert len(group["node"]["serviceCommissions"]) == 2
+        assert group["node"]["totalAmount"] == 20
+        assert group["node"]["user"]["email"] == user.email
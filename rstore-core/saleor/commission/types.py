@@ -70,6 +70,11 @@ class Commission(CountableDjangoObjectType):
         description = "Represents commission"
         interfaces = [relay.Node]
         model = models.Commission
+        optimizer_hints = {
+            "rule": {"select_related": ["rule_history__rule"]},
+            "user": {"select_related": ["user"]},
+            "order": {"select_related": ["order"]},
+        }
 
     @staticmethod
     def resolve_rule(root: models.Commission, info):
@@ -86,6 +91,10 @@ class CommissionsGroup(CountableDjangoObjectType):
     class Meta:
         model = models.CommissionServiceMonth
         interfaces = [relay.Node]
+        optimizer_hints = {
+            "service": {"select_related": ["service"]},
+            "user": {"select_related": ["user"]},
+        }
 
     def resolve_total_amount(self, info):
         total = 0
@@ -1,18 +1,34 @@
 import json
-from typing import Any, Dict, Iterable, List, Tuple, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import graphene
-from django.db.models import Model as DjangoModel, Q, QuerySet
+from decouple import config
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import (
+    BooleanField,
+    F,
+    Field,
+    Func,
+    Model as DjangoModel,
+    Q,
+    QuerySet,
+    Value,
+)
 from graphene.relay.connection import Connection
 from graphene_django.types import DjangoObjectType
 from graphql.error import GraphQLError
 from graphql_relay.connection.connectiontypes import Edge, PageInfo
 from graphql_relay.utils import base64, unbase64
 
+from ...core.total_count import get_estimated_count, get_exact_count
 from ..core.enums import OrderDirection
 
 ConnectionArguments = Dict[str, Any]
 
+TOTAL_COUNT_ESTIMATE_THRESHOLD = config(
+    "TOTAL_COUNT_ESTIMATE_THRESHOLD", default=10000, cast=int
+)
+
 
 def to_global_cursor(values):
     if not isinstance(values, Iterable):
@@ -92,6 +108,71 @@ def _prepare_filter(
     return filter_kwargs
 
 
+class RowValue(Func):
+    template = "(%(expressions)s)"
+
+
+class RowValueComparison(Func):
+    """Compare two row values, e.g. `(created, pk) > ('2020-01-01', 10)`.
+
+    Unlike the equivalent chain of OR conditions, Postgres can answer a row value
+    comparison with a single range scan of a composite index.
+    """
+
+    template = "%(expressions)s"
+    output_field = BooleanField()
+
+    def __init__(self, lhs, operator, rhs):
+        super().__init__(lhs, rhs, arg_joiner=f" {operator} ")
+
+
+def _get_row_value_fields(model, sorting_fields: List[str]) -> Optional[List[Field]]:
+    """Return the model fields backing the sorting fields.
+
+    Return None when row values can't be compared: for annotations, relations
+    and nullable columns, as a NULL makes the whole row comparison unknown.
+    """
+    model_fields = []
+    for field_name in sorting_fields:
+        opts = model._meta
+        field = None
+        for part in field_name.split("__"):
+            if opts is None:
+                return None
+            try:
+                field = opts.pk if part == "pk" else opts.get_field(part)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.null:
+                return None
+            opts = field.related_model._meta if field.is_relation else None
+        if field.is_relation:
+            return None
+        model_fields.append(field)
+    return model_fields
+
+
+def _prepare_row_value_filter(
+    cursor: List[str],
+    sorting_fields: List[str],
+    sorting_direction: str,
+    model_fields: List[Field],
+) -> RowValueComparison:
+    try:
+        values = [
+            Value(field.to_python(value), output_field=field)
+            for field, value in zip(model_fields, cursor)
+        ]
+    except ValidationError:
+        raise GraphQLError("Received cursor is invalid.")
+    operator = ">" if sorting_direction == "gt" else "<"
+    return RowValueComparison(
+        RowValue(*[F(field) for field in sorting_fields], output_field=Field()),
+        operator,
+        RowValue(*values, output_field=Field()),
+    )
+
+
 def _validate_connection_args(args):
     first = args.get("first")
     last = args.get("last")
@@ -158,18 +239,13 @@ def _get_edges_for_connection(edge_type, qs, args, sorting_fields):
     cursor = after or before
     requested_count = first or last
 
-    if last:
-        start_slice, end_slice = 1, None
-    else:
-        start_slice, end_slice = 0, requested_count
-
     matching_records = list(qs)
-    if last:
-        matching_records = list(reversed(matching_records))
-        if len(matching_records) <= requested_count:
-            start_slice = 0
     page_info = _get_page_info(matching_records, cursor, first, last)
-    matching_records = matching_records[start_slice:end_slice]
+    # The queryset is already sorted in the pagination direction, so the extra
+    # record fetched to detect the next page is always the last one.
+    matching_records = matching_records[:requested_count]
+    if last:
+        matching_records.reverse()
 
     edges = [
         edge_type(
@@ -211,16 +287,50 @@ def connection_from_queryset_slice(
     sorting_direction = _get_sorting_direction(sort_by, last)
     if cursor and len(cursor) != len(sorting_fields):
         raise GraphQLError("Received cursor is invalid.")
-    filter_kwargs = (
-        _prepare_filter(cursor, sorting_fields, sorting_direction) if cursor else Q()
-    )
-    qs = qs.filter(filter_kwargs)
+    if cursor:
+        row_value_fields = _get_row_value_fields(qs.model, sorting_fields)
+        if row_value_fields and None not in cursor:
+            qs = qs.filter(
+                _prepare_row_value_filter(
+                    cursor, sorting_fields, sorting_direction, row_value_fields
+                )
+            )
+        else:
+            qs = qs.filter(_prepare_filter(cursor, sorting_fields, sorting_direction))
     qs = qs[:end_margin]
     edges, page_info = _get_edges_for_connection(edge_type, qs, args, sorting_fields)
 
     return connection_type(edges=edges, page_info=pageinfo_type(**page_info),)
 
 
+class TotalCountMode:
+    """Ways a connection can resolve its `totalCount` field.
+
+    The exact count is cached per query and invalidated when a row of the
+    counted model is saved or deleted. The estimated count takes the row
+    estimate of the query planner when it exceeds the configured threshold, and
+    falls back to the cached exact count below it. With the has-more mode
+    nothing is counted and clients rely on `pageInfo.hasNextPage` instead.
+    """
+
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+    HAS_MORE = "has_more"
+
+
+def get_total_count(qs: QuerySet, mode: str = TotalCountMode.EXACT) -> Optional[int]:
+    if mode == TotalCountMode.HAS_MORE:
+        return None
+    if mode == TotalCountMode.ESTIMATED:
+        estimated_count = get_estimated_count(qs)
+        if (
+            estimated_count is not None
+            and estimated_count > TOTAL_COUNT_ESTIMATE_THRESHOLD
+        ):
+            return estimated_count
+    return get_exact_count(qs)
+
+
 class NonNullConnection(Connection):
     class Meta:
         abstract = True
@@ -263,7 +373,8 @@ class CountableConnection(NonNullConnection):
     def resolve_total_count(root, *_args, **_kwargs):
         if isinstance(root.iterable, list):
             return len(root.iterable)
-        return root.iterable.count()
+        count_mode = getattr(root, "count_mode", TotalCountMode.EXACT)
+        return get_total_count(root.iterable, count_mode)
 
 
 class CountableDjangoObjectType(DjangoObjectType):
@@ -271,9 +382,11 @@ class CountableDjangoObjectType(DjangoObjectType):
         abstract = True
 
     @classmethod
-    def __init_subclass_with_meta__(cls, *args, **kwargs):
+    def __init_subclass_with_meta__(cls, *args, optimizer_hints=None, **kwargs):
         # Force it to use the countable connection
         countable_conn = CountableConnection.create_type(
             "{}CountableConnection".format(cls.__name__), node=cls
         )
         super().__init_subclass_with_meta__(*args, connection=countable_conn, **kwargs)
+        # Related lookups read by the resolvers, see `core.optimizer`.
+        cls._meta.optimizer_hints = optimizer_hints or {}
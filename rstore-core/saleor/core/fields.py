@@ -2,6 +2,7 @@ import json
 from functools import partial
 
 import graphene
+from django.db.models import QuerySet
 from django_measurement.models import MeasurementField
 from django_prices.models import MoneyField, TaxedMoneyField
 from graphene.relay import PageInfo
@@ -12,11 +13,26 @@ from graphql_relay.connection.arrayconnection import connection_from_list_slice
 from promise import Promise
 
 from ..utils.sorting import sort_queryset_for_connection
-from .connection import connection_from_queryset_slice
+from .connection import TotalCountMode, connection_from_queryset_slice
+from .optimizer import optimize_connection_queryset
 from .types.common import Weight
 from .types.money import Money, TaxedMoney
 
 
+def get_optimized_resolver(resolver, connection):
+    """Wrap the resolver to apply related lookups needed by the selected fields."""
+
+    def optimized_resolver(root, info, **args):
+        iterable = resolver(root, info, **args)
+        if isinstance(iterable, QuerySet):
+            iterable = optimize_connection_queryset(
+                iterable, info, connection._meta.node
+            )
+        return iterable
+
+    return optimized_resolver
+
+
 def patch_pagination_args(field: DjangoConnectionField):
     """Add descriptions to pagination arguments in a connection field.
 
@@ -71,10 +87,27 @@ class BaseDjangoConnectionField(DjangoConnectionField):
         connection.iterable = iterable
         return connection
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, count_mode=TotalCountMode.EXACT, **kwargs):
+        self.count_mode = count_mode
         super().__init__(*args, **kwargs)
         patch_pagination_args(self)
 
+    def get_resolver(self, parent_resolver):
+        resolver = super().get_resolver(parent_resolver)
+        count_mode = self.count_mode
+
+        def set_count_mode(connection):
+            connection.count_mode = count_mode
+            return connection
+
+        def resolve_with_count_mode(root, info, **args):
+            connection = resolver(root, info, **args)
+            if Promise.is_thenable(connection):
+                return Promise.resolve(connection).then(set_count_mode)
+            return set_count_mode(connection)
+
+        return resolve_with_count_mode
+
 
 @convert_django_field.register(TaxedMoneyField)
 def convert_field_taxed_money(*_args):
@@ -114,7 +147,7 @@ class PrefetchingConnectionField(BaseDjangoConnectionField):
             enforce_first_or_last = False
 
         return super().connection_resolver(
-            resolver,
+            get_optimized_resolver(resolver, connection),
             connection,
             default_manager,
             queryset_resolver,
@@ -181,7 +214,7 @@ class FilterInputConnectionField(PrefetchingConnectionField):
                 ).format(last, info.field_name, max_limit)
                 args["last"] = min(last, max_limit)
 
-        iterable = resolver(root, info, **args)
+        iterable = get_optimized_resolver(resolver, connection)(root, info, **args)
 
         if iterable is None:
             iterable = default_manager
@@ -0,0 +1,125 @@
+import random
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+from decouple import config
+from django.http import HttpResponse, HttpResponseForbidden
+
+RESOLVER_METRICS_SAMPLE_RATE = config(
+    "RESOLVER_METRICS_SAMPLE_RATE", default=0.1, cast=float
+)
+RESOLVER_METRICS_ALLOWED_IPS = config(
+    "RESOLVER_METRICS_ALLOWED_IPS",
+    default="127.0.0.1,::1",
+    cast=lambda value: [ip.strip() for ip in value.split(",") if ip.strip()],
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus format."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class ResolverMetrics:
+    """Latency and SQL query count histograms per resolved field.
+
+    Metrics are kept in the memory of the process, so every worker exposes its
+    own series.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency: Dict[Tuple[str, str], Histogram] = defaultdict(
+            lambda: Histogram(LATENCY_BUCKETS)
+        )
+        self._query_count: Dict[Tuple[str, str], Histogram] = defaultdict(
+            lambda: Histogram(QUERY_COUNT_BUCKETS)
+        )
+
+    def observe(self, parent_type: str, field_name: str, duration: float, queries: int):
+        key = (parent_type, field_name)
+        with self._lock:
+            self._latency[key].observe(duration)
+            self._query_count[key].observe(queries)
+
+    def render(self) -> str:
+        lines = [
+            "# HELP graphql_resolver_duration_seconds Time spent in the resolver.",
+            "# TYPE graphql_resolver_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (parent_type, field_name), histogram in sorted(self._latency.items()):
+                labels = f'parent_type="{parent_type}",field="{field_name}"'
+                lines.extend(
+                    histogram.render("graphql_resolver_duration_seconds", labels)
+                )
+            lines.extend(
+                [
+                    "# HELP graphql_resolver_queries SQL queries run by the resolver.",
+                    "# TYPE graphql_resolver_queries histogram",
+                ]
+            )
+            for (parent_type, field_name), histogram in sorted(
+                self._query_count.items()
+            ):
+                labels = f'parent_type="{parent_type}",field="{field_name}"'
+                lines.extend(histogram.render("graphql_resolver_queries", labels))
+        return "\n".join(lines) + "\n"
+
+
+resolver_metrics = ResolverMetrics()
+
+
+def should_sample_request(request) -> bool:
+    """Decide once per request whether its resolvers are measured."""
+    sampled = getattr(request, "resolver_metrics_sampled", None)
+    if sampled is None:
+        sampled = random.random() < RESOLVER_METRICS_SAMPLE_RATE
+        request.resolver_metrics_sampled = sampled
+    return sampled
+
+
+class QueryCounter:
+    """Database execute wrapper counting the executed queries."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def resolver_metrics_view(request):
+    """Expose resolver metrics to a scraper running on the same host."""
+    if request.META.get("REMOTE_ADDR") not in RESOLVER_METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        resolver_metrics.render(), content_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,112 @@
+from typing import Iterator, List, Set
+
+from django.db.models import QuerySet
+from graphene.utils.str_converters import to_snake_case
+from graphql import ResolveInfo
+from graphql.language import ast
+from graphql.type.definition import get_named_type
+
+
+def _get_fields(selection_set, fragments) -> Iterator[ast.Field]:
+    """Yield fields of the selection set, including the ones from fragments."""
+    if selection_set is None:
+        return
+    for selection in selection_set.selections:
+        if isinstance(selection, ast.Field):
+            yield selection
+        elif isinstance(selection, ast.InlineFragment):
+            yield from _get_fields(selection.selection_set, fragments)
+        elif isinstance(selection, ast.FragmentSpread):
+            fragment = fragments.get(selection.name.value)
+            if fragment is not None:
+                yield from _get_fields(fragment.selection_set, fragments)
+
+
+def _get_selection_set(field: ast.Field, path: List[str], fragments):
+    """Return the selection set of the field nested at the path of field names."""
+    selection_set = field.selection_set
+    for name in path:
+        selection_set = next(
+            (
+                nested_field.selection_set
+                for nested_field in _get_fields(selection_set, fragments)
+                if nested_field.name.value == name
+            ),
+            None,
+        )
+        if selection_set is None:
+            return None
+    return selection_set
+
+
+class QuerysetOptimizer:
+    """Collect related lookups needed to resolve the selected fields.
+
+    Types declare `optimizer_hints` in their Meta, mapping a field name to the
+    `select_related` and `prefetch_related` lookups its resolver reads. Hints of
+    nested types are prefixed with the lookup of the field they're selected
+    through; anything nested in a prefetched relation is prefetched as well.
+    """
+
+    def __init__(self, info: ResolveInfo):
+        self.schema = info.schema
+        self.fragments = info.fragments
+        self.select_related: Set[str] = set()
+        self.prefetch_related: Set[str] = set()
+
+    def collect(self, graphql_type, selection_set, prefix="", prefetch_only=False):
+        graphene_type = getattr(graphql_type, "graphene_type", None)
+        meta = getattr(graphene_type, "_meta", None)
+        hints = getattr(meta, "optimizer_hints", None)
+        if not hints:
+            return
+        for field in _get_fields(selection_set, self.fragments):
+            hint = hints.get(to_snake_case(field.name.value))
+            if not hint:
+                continue
+            field_def = graphql_type.fields.get(field.name.value)
+            field_type = get_named_type(field_def.type) if field_def else None
+            for lookup in hint.get("select_related", []):
+                lookup = prefix + lookup
+                if prefetch_only:
+                    self.prefetch_related.add(lookup)
+                else:
+                    self.select_related.add(lookup)
+                self._collect_nested(field, field_type, lookup, prefetch_only)
+            for lookup in hint.get("prefetch_related", []):
+                lookup = prefix + lookup
+                self.prefetch_related.add(lookup)
+                self._collect_nested(field, field_type, lookup, True)
+
+    def _collect_nested(self, field: ast.Field, field_type, lookup, prefetch_only):
+        if field.selection_set is None or field_type is None:
+            return
+        self.collect(field_type, field.selection_set, f"{lookup}__", prefetch_only)
+
+    def optimize(self, qs: QuerySet) -> QuerySet:
+        if self.select_related:
+            qs = qs.select_related(*sorted(self.select_related))
+        if self.prefetch_related:
+            qs = qs.prefetch_related(*sorted(self.prefetch_related))
+        return qs
+
+
+def optimize_queryset(
+    qs: QuerySet, info: ResolveInfo, object_type, path: List[str], prefix: str = ""
+) -> QuerySet:
+    """Apply related lookups for the objects selected at the path of the field.
+
+    Use a prefix when the objects are reached through a relation of the
+    queryset's model instead of being its rows.
+    """
+    graphql_type = info.schema.get_type(object_type._meta.name)
+    optimizer = QuerysetOptimizer(info)
+    for field in info.field_asts:
+        selection_set = _get_selection_set(field, path, info.fragments)
+        optimizer.collect(graphql_type, selection_set, prefix)
+    return optimizer.optimize(qs)
+
+
+def optimize_connection_queryset(qs: QuerySet, info: ResolveInfo, node_type) -> QuerySet:
+    """Apply related lookups for the nodes selected in a connection field."""
+    return optimize_queryset(qs, info, node_type, ["edges", "node"])
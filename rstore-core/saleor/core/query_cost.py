@@ -0,0 +1,182 @@
+from typing import Any, Dict, Optional
+
+from decouple import config
+from django.core.cache import cache
+from graphql import GraphQLError
+from graphql.language import ast
+from graphql.type.definition import (
+    GraphQLInterfaceType,
+    GraphQLList,
+    GraphQLObjectType,
+    get_named_type,
+    get_nullable_type,
+)
+
+QUERY_COST_LIMIT = config("QUERY_COST_LIMIT", default=50000, cast=int)
+QUERY_COST_BUDGET = config("QUERY_COST_BUDGET", default=500000, cast=int)
+QUERY_COST_BUDGET_WINDOW = config("QUERY_COST_BUDGET_WINDOW", default=60, cast=int)
+
+# Used for connections queried without `first` or `last`.
+DEFAULT_CONNECTION_SIZE = 100
+# Expected number of items in a list field which isn't paginated.
+DEFAULT_LIST_SIZE = 10
+LIST_SIZES = {
+    "OrderLine": 20,
+    "OrderEvent": 20,
+    "Fulfillment": 5,
+    "Payment": 5,
+    "Region": 5,
+    "Document": 5,
+    "Address": 5,
+    "Group": 2,
+    "OrderProcessingStage": 7,
+}
+
+QUERY_COST_KEY_PREFIX = "query-cost"
+
+
+class QueryCostAnalyzer:
+    """Estimate the cost of a GraphQL operation without executing it.
+
+    Every object field costs one unit plus the cost of its selection multiplied
+    by the number of items it's expected to return: `first` or `last` for
+    connections and a per-type size for plain lists. The `edges` of a
+    connection are already counted by the connection itself. Scalar fields
+    are free.
+    """
+
+    def __init__(self, schema, fragments, variables: Optional[Dict[str, Any]]):
+        self.schema = schema
+        self.fragments = fragments
+        self.variables = variables or {}
+
+    def get_operation_cost(self, operation: ast.OperationDefinition) -> int:
+        if operation.operation == "mutation":
+            root_type = self.schema.get_mutation_type()
+        elif operation.operation == "subscription":
+            root_type = self.schema.get_subscription_type()
+        else:
+            root_type = self.schema.get_query_type()
+        return self._get_selection_set_cost(operation.selection_set, root_type)
+
+    def _get_argument_value(self, field: ast.Field, name: str):
+        for argument in field.arguments or []:
+            if argument.name.value != name:
+                continue
+            value = argument.value
+            if isinstance(value, ast.Variable):
+                return self.variables.get(value.name.value)
+            if isinstance(value, ast.IntValue):
+                return int(value.value)
+        return None
+
+    def _get_multiplier(self, field: ast.Field, field_type, parent_type) -> int:
+        if field.name.value == "edges" and "pageInfo" in parent_type.fields:
+            return 1
+        named_type = get_named_type(field_type)
+        if "edges" in getattr(named_type, "fields", {}):
+            size = self._get_argument_value(field, "first") or self._get_argument_value(
+                field, "last"
+            )
+            return size or DEFAULT_CONNECTION_SIZE
+        if isinstance(get_nullable_type(field_type), GraphQLList):
+            return LIST_SIZES.get(named_type.name, DEFAULT_LIST_SIZE)
+        return 1
+
+    def _get_selection_set_cost(self, selection_set, parent_type) -> int:
+        if selection_set is None or parent_type is None:
+            return 0
+        cost = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                cost += self._get_field_cost(selection, parent_type)
+            elif isinstance(selection, ast.InlineFragment):
+                fragment_type = parent_type
+                if selection.type_condition:
+                    fragment_type = self.schema.get_type(
+                        selection.type_condition.name.value
+                    )
+                cost += self._get_selection_set_cost(
+                    selection.selection_set, fragment_type
+                )
+            elif isinstance(selection, ast.FragmentSpread):
+                fragment = self.fragments.get(selection.name.value)
+                if fragment is None:
+                    continue
+                fragment_type = self.schema.get_type(fragment.type_condition.name.value)
+                cost += self._get_selection_set_cost(
+                    fragment.selection_set, fragment_type
+                )
+        return cost
+
+    def _get_field_cost(self, field: ast.Field, parent_type) -> int:
+        if field.name.value.startswith("__"):
+            return 0
+        if not isinstance(parent_type, (GraphQLObjectType, GraphQLInterfaceType)):
+            return 0
+        field_def = parent_type.fields.get(field.name.value)
+        if field_def is None or field.selection_set is None:
+            return 0
+        field_type = field_def.type
+        selection_cost = self._get_selection_set_cost(
+            field.selection_set, get_named_type(field_type)
+        )
+        multiplier = self._get_multiplier(field, field_type, parent_type)
+        return 1 + multiplier * selection_cost
+
+
+def get_principal_key(request) -> str:
+    app = getattr(request, "app", None)
+    if app:
+        return f"app:{app.pk}"
+    user = getattr(request, "user", None)
+    if user and user.is_authenticated:
+        return f"user:{user.pk}"
+    return f"ip:{request.META.get('REMOTE_ADDR')}"
+
+
+def _get_budget_key(request) -> str:
+    return f"{QUERY_COST_KEY_PREFIX}:{get_principal_key(request)}"
+
+
+def refund_query_cost_budget(request, cost: int):
+    try:
+        cache.decr(_get_budget_key(request), cost)
+    except ValueError:
+        # The budget window expired, and the reservation with it.
+        pass
+
+
+def reserve_query_cost_budget(request, cost: int) -> bool:
+    """Charge the cost to the principal's budget if it fits in what's left.
+
+    The cost is added with a single `incr` before the operation runs and the
+    result compared to the budget, so concurrent operations can't all pass a
+    check of the same remaining budget. A cost that doesn't fit is refunded.
+    """
+    key = _get_budget_key(request)
+    cache.add(key, 0, timeout=QUERY_COST_BUDGET_WINDOW)
+    try:
+        spent = cache.incr(key, cost)
+    except ValueError:
+        # The key expired between `add` and `incr`.
+        cache.set(key, cost, timeout=QUERY_COST_BUDGET_WINDOW)
+        spent = cost
+    if spent > QUERY_COST_BUDGET:
+        refund_query_cost_budget(request, cost)
+        return False
+    return True
+
+
+def reserve_query_cost(request, cost: int):
+    """Reserve the cost of an operation in the budget or reject the operation."""
+    if cost > QUERY_COST_LIMIT:
+        raise GraphQLError(
+            f"Query cost {cost} exceeds the limit of {QUERY_COST_LIMIT}. "
+            "Request fewer items or fewer nested fields."
+        )
+    if not reserve_query_cost_budget(request, cost):
+        raise GraphQLError(
+            "Query cost budget exceeded. "
+            f"Try again in {QUERY_COST_BUDGET_WINDOW} seconds."
+        )
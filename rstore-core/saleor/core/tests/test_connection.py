@@ -0,0 +1,180 @@
+from datetime import date
+
+import pytest
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+from ...account.models import User
+from ...commission.models import CommissionServiceMonth
+from ...graphql.account.sorters import UserSortField
+from ...order.models import Order
+from ...order.sorters import OrderSortField
+from ..connection import _get_row_value_fields, connection_from_queryset_slice
+from ..enums import OrderDirection
+
+SORTING_FIELDS = ["month", "pk"]
+
+
+@pytest.fixture
+def service_months():
+    # Months repeat, so pages have to be split inside a group of equal values.
+    months = [date(2020, 1, 1)] * 3 + [date(2020, 2, 1)] * 3 + [date(2020, 3, 1)] * 2
+    return CommissionServiceMonth.objects.bulk_create(
+        [CommissionServiceMonth(month=month) for month in months]
+    )
+
+
+def _get_sorted_pks(direction):
+    ordering = [f"{direction}{field}" for field in SORTING_FIELDS]
+    return list(
+        CommissionServiceMonth.objects.order_by(*ordering).values_list("pk", flat=True)
+    )
+
+
+def _paginate(direction, **args):
+    # Connection fields sort the queryset in the pagination direction.
+    reverse = "last" in args
+    descending = (direction == OrderDirection.DESC) != reverse
+    ordering = [f"{'-' if descending else ''}{field}" for field in SORTING_FIELDS]
+    args["sort_by"] = {"field": SORTING_FIELDS, "direction": direction}
+    return connection_from_queryset_slice(
+        CommissionServiceMonth.objects.order_by(*ordering), args
+    )
+
+
+def test_row_value_fields_for_non_nullable_columns():
+    fields = _get_row_value_fields(CommissionServiceMonth, SORTING_FIELDS)
+    assert [field.name for field in fields] == ["month", "id"]
+
+
+@pytest.mark.parametrize("sorting_fields", [["user", "pk"], ["service__partner_name"]])
+def test_row_value_fields_not_used_for_relations(sorting_fields):
+    assert _get_row_value_fields(CommissionServiceMonth, sorting_fields) is None
+
+
+@pytest.mark.parametrize("direction", [OrderDirection.ASC, OrderDirection.DESC])
+def test_paginate_forward_with_duplicated_sort_values(service_months, direction):
+    # given
+    expected_pks = _get_sorted_pks(direction.value)
+
+    # when
+    pks = []
+    connection = _paginate(direction, first=2)
+    pks += [edge.node.pk for edge in connection.edges]
+    while connection.page_info.has_next_page:
+        connection = _paginate(
+            direction, first=2, after=connection.page_info.end_cursor
+        )
+        assert connection.page_info.has_previous_page
+        pks += [edge.node.pk for edge in connection.edges]
+
+    # then
+    assert pks == expected_pks
+
+
+@pytest.mark.parametrize("direction", [OrderDirection.ASC, OrderDirection.DESC])
+def test_paginate_backward_with_duplicated_sort_values(service_months, direction):
+    # given
+    expected_pks = _get_sorted_pks(direction.value)
+
+    # when
+    pages = []
+    connection = _paginate(direction, last=2)
+    pages.append([edge.node.pk for edge in connection.edges])
+    while connection.page_info.has_previous_page:
+        connection = _paginate(
+            direction, last=2, before=connection.page_info.start_cursor
+        )
+        assert connection.page_info.has_next_page
+        pages.append([edge.node.pk for edge in connection.edges])
+
+    # then
+    assert [pk for page in reversed(pages) for pk in page] == expected_pks
+
+
+@pytest.mark.parametrize("direction", [OrderDirection.ASC, OrderDirection.DESC])
+def test_cursor_round_trip_inside_duplicated_sort_values(service_months, direction):
+    # given
+    expected_pks = _get_sorted_pks(direction.value)
+    edges = _paginate(direction, first=len(expected_pks)).edges
+    # The second record shares its month with its neighbours.
+    cursor = edges[1].cursor
+
+    # when
+    after = _paginate(direction, first=len(expected_pks), after=cursor)
+    before = _paginate(direction, last=len(expected_pks), before=cursor)
+
+    # then
+    assert [edge.node.pk for edge in after.edges] == expected_pks[2:]
+    assert [edge.node.pk for edge in before.edges] == expected_pks[:1]
+
+
+@pytest.fixture
+def sorted_records(service_months, customer_user):
+    # Every model has records sharing the values of the leading sort fields.
+    User.objects.bulk_create(
+        [
+            User(
+                phone=f"0171000000{index}",
+                email=f"user-{index}@example.com",
+                first_name="John",
+                last_name="Doe",
+            )
+            for index in range(3)
+        ]
+    )
+    for _ in range(3):
+        Order.objects.create(user=customer_user, user_email=customer_user.email)
+
+
+def _get_page_query(qs, sorting_fields, direction):
+    """Return the SQL that fetches the page after the second record."""
+    descending = direction == OrderDirection.DESC
+    qs = qs.order_by(
+        *[f"{'-' if descending else ''}{field}" for field in sorting_fields]
+    )
+    args = {"first": 2, "sort_by": {"field": sorting_fields, "direction": direction}}
+    cursor = connection_from_queryset_slice(qs, args).edges[1].cursor
+    with CaptureQueriesContext(connections[qs.db]) as queries:
+        connection_from_queryset_slice(qs, {**args, "after": cursor})
+    (query,) = queries.captured_queries
+    return query["sql"]
+
+
+def _get_query_plan(qs, sql):
+    with connections[qs.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN {sql}")
+        return "\n".join(row[0] for row in cursor.fetchall())
+
+
+@pytest.mark.parametrize(
+    "model, sorting_fields",
+    [
+        (CommissionServiceMonth, SORTING_FIELDS),
+        (User, UserSortField.FIRST_NAME.value),
+        (User, UserSortField.LAST_NAME.value),
+        (Order, OrderSortField.CREATION_DATE.value),
+    ],
+)
+@pytest.mark.parametrize(
+    "direction, operator", [(OrderDirection.ASC, ">"), (OrderDirection.DESC, "<")]
+)
+def test_paginate_with_row_value_comparison(
+    sorted_records, model, sorting_fields, direction, operator
+):
+    # given
+    qs = model.objects.all()
+    columns = ", ".join(
+        f'"{model._meta.db_table}"."{field.column}"'
+        for field in _get_row_value_fields(model, sorting_fields)
+    )
+
+    # when
+    sql = _get_page_query(qs, sorting_fields, direction)
+    plan = _get_query_plan(qs, sql)
+
+    # then
+    assert f"({columns}) {operator} (" in sql
+    assert " OR " not in sql
+    assert "ROW(" in plan
+    assert " OR " not in plan
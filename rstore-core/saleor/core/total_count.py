@@ -0,0 +1,111 @@
+import hashlib
+import json
+from typing import Optional
+from uuid import uuid4
+
+from decouple import config
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import DatabaseError, connections, transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+
+TOTAL_COUNT_KEY_PREFIX = "total-count"
+TOTAL_COUNT_CACHE_TIMEOUT = config("TOTAL_COUNT_CACHE_TIMEOUT", default=30, cast=int)
+
+# Models whose exact counts are cached. Their cached counts are invalidated
+# when a row is saved or deleted; code that writes them with bulk or queryset
+# methods, which send no signals, has to call `invalidate_total_count`.
+CACHED_COUNT_MODELS = ["account.user", "order.order"]
+
+
+def _get_model_label(model) -> str:
+    return model._meta.label_lower
+
+
+def _get_version_key(model) -> str:
+    return f"{TOTAL_COUNT_KEY_PREFIX}-version:{_get_model_label(model)}"
+
+
+def _get_count_key(sql: str, params, version) -> str:
+    query_hash = hashlib.sha256(
+        json.dumps([sql, params, version], default=str).encode()
+    ).hexdigest()
+    return f"{TOTAL_COUNT_KEY_PREFIX}:{query_hash}"
+
+
+def invalidate_total_count(model):
+    """Drop the cached counts of the model once the current transaction commits.
+
+    Bumping the version only after the commit keeps a concurrent request from
+    caching the count it read before the change under the new version.
+    """
+    version_key = _get_version_key(model)
+    transaction.on_commit(lambda: cache.set(version_key, uuid4().hex, timeout=None))
+
+
+def _handle_model_change(sender, **kwargs):
+    invalidate_total_count(sender)
+
+
+# Connected on import, which the GraphQL connections do, so the receivers are
+# in place before any counted row is written.
+for _label in CACHED_COUNT_MODELS:
+    post_save.connect(
+        _handle_model_change,
+        sender=_label,
+        weak=False,
+        dispatch_uid=f"{TOTAL_COUNT_KEY_PREFIX}:{_label}",
+    )
+    post_delete.connect(
+        _handle_model_change,
+        sender=_label,
+        weak=False,
+        dispatch_uid=f"{TOTAL_COUNT_KEY_PREFIX}:{_label}",
+    )
+
+
+def get_exact_count(qs: QuerySet) -> int:
+    """Count the queryset, reusing a recent result of the same query.
+
+    Only the counts of the models in `CACHED_COUNT_MODELS` are cached.
+    """
+    if (
+        TOTAL_COUNT_CACHE_TIMEOUT <= 0
+        or _get_model_label(qs.model) not in CACHED_COUNT_MODELS
+    ):
+        return qs.count()
+    qs = qs.order_by()
+    try:
+        sql, params = qs.query.sql_with_params()
+    except EmptyResultSet:
+        # Filtered by an empty list, counted without querying the database.
+        return qs.count()
+
+    version = cache.get(_get_version_key(qs.model))
+    count_key = _get_count_key(sql, params, version)
+    count = cache.get(count_key)
+    if count is None:
+        count = qs.count()
+        cache.set(count_key, count, timeout=TOTAL_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def get_estimated_count(qs: QuerySet) -> Optional[int]:
+    """Return the number of rows the query planner expects the queryset to match."""
+    connection = connections[qs.db]
+    if connection.vendor != "postgresql":
+        return None
+    try:
+        sql, params = qs.order_by().query.sql_with_params()
+    except EmptyResultSet:
+        return None
+    try:
+        with transaction.atomic(using=qs.db), connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -139,6 +139,12 @@ class OrderError(Error):
     )
 
 
+class BulkOrderError(OrderError):
+    index = graphene.Int(
+        description="Index of an input list item that caused the error."
+    )
+
+
 class PermissionGroupError(Error):
     code = PermissionGroupErrorCode(description="The error code.", required=True)
     permissions = graphene.List(
@@ -1,6 +1,6 @@
 from enum import Enum
 from functools import wraps
-from typing import Iterable, Union
+from typing import FrozenSet, Iterable, Optional, Union
 
 from graphql_jwt import exceptions
 from graphql_jwt.decorators import context
@@ -24,8 +24,36 @@ def account_passes_test(test_func):
     return decorator
 
 
+def _get_user_permissions(context) -> Optional[FrozenSet[str]]:
+    """Return the permission codenames of the requesting user.
+
+    The set is computed once per request and stored on the context, so the
+    decorators check permissions with set lookups instead of `has_perms` calls.
+    When the principal cache primed the user's permission cache this doesn't
+    query the database at all. Returns None for superusers, who pass every check.
+    """
+    user = context.user
+    cached = getattr(context, "_user_permissions", None)
+    if cached is not None and cached[0] is user:
+        return cached[1]
+    if user.is_active and user.is_superuser:
+        permissions = None
+    elif user.is_active:
+        permissions = frozenset(user.get_all_permissions())
+    else:
+        permissions = frozenset()
+    context._user_permissions = (user, permissions)
+    return permissions
+
+
+def _has_perms(permissions: Optional[FrozenSet[str]], perms: Iterable[Enum]) -> bool:
+    if permissions is None:
+        return True
+    return all(getattr(perm, "value", perm) in permissions for perm in perms)
+
+
 def _permission_required(perms: Iterable[Enum], context):
-    if context.user.has_perms(perms):
+    if _has_perms(_get_user_permissions(context), perms):
         return True
     app = getattr(context, "app", None)
     if app:
@@ -6,6 +6,7 @@ from django.core.exceptions import ValidationError
 from ...account import models
 from ...account.error_codes import AccountErrorCode
 from ...core.permissions import AccountPermissions
+from ...core.total_count import invalidate_total_count
 from ..core.mutations import BaseBulkMutation, ModelBulkDeleteMutation
 from ..core.types.common import AccountError, StaffError
 from .types import User
@@ -110,3 +111,4 @@ class UserBulkSetActive(BaseBulkMutation):
     @classmethod
     def bulk_action(cls, queryset, is_active):
         queryset.update(is_active=is_active)
+        invalidate_total_count(models.User)
@@ -0,0 +1,191 @@
+from collections import defaultdict
+
+from django.db.models import Count
+
+from ...account.models import Address, GroupHierarchy, User
+from ..core.dataloaders import DataLoader
+
+
+class UserByUserIdLoader(DataLoader):
+    context_key = "user_by_id"
+
+    def batch_load(self, keys):
+        users = User.objects.in_bulk(keys)
+        return [users.get(user_id) for user_id in keys]
+
+
+class AddressByIdLoader(DataLoader):
+    context_key = "address_by_id"
+
+    def batch_load(self, keys):
+        addresses = Address.objects.in_bulk(keys)
+        return [addresses.get(address_id) for address_id in keys]
+
+
+class AddressesByUserIdLoader(DataLoader):
+    context_key = "addresses_by_user"
+
+    def batch_load(self, keys):
+        user_addresses = (
+            User.addresses.through.objects.filter(user_id__in=keys)
+            .select_related("address")
+            .order_by("address_id")
+        )
+        address_map = defaultdict(list)
+        for user_address in user_addresses.iterator():
+            address_map[user_address.user_id].append(user_address.address)
+        return [address_map.get(user_id, []) for user_id in keys]
+
+
+class DocumentsByUserIdLoader(DataLoader):
+    context_key = "documents_by_user"
+
+    def batch_load(self, keys):
+        user_documents = (
+            User.documents.through.objects.filter(user_id__in=keys)
+            .select_related("document")
+            .order_by("document_id")
+        )
+        document_map = defaultdict(list)
+        for user_document in user_documents.iterator():
+            document_map[user_document.user_id].append(user_document.document)
+        return [document_map.get(user_id, []) for user_id in keys]
+
+
+class RegionsByUserIdLoader(DataLoader):
+    context_key = "regions_by_user"
+
+    def batch_load(self, keys):
+        user_regions = (
+            User.regions.through.objects.filter(user_id__in=keys)
+            .select_related("region")
+            .order_by("region_id")
+        )
+        region_map = defaultdict(list)
+        for user_region in user_regions.iterator():
+            region_map[user_region.user_id].append(user_region.region)
+        return [region_map.get(user_id, []) for user_id in keys]
+
+
+class GroupsByUserIdLoader(DataLoader):
+    context_key = "groups_by_user"
+
+    def batch_load(self, keys):
+        user_groups = (
+            User.groups.through.objects.filter(user_id__in=keys)
+            .select_related("group")
+            .order_by("group_id")
+        )
+        group_map = defaultdict(list)
+        for user_group in user_groups.iterator():
+            group_map[user_group.user_id].append(user_group.group)
+        return [group_map.get(user_id, []) for user_id in keys]
+
+
+class UserCountByGroupIdLoader(DataLoader):
+    context_key = "user_count_by_group"
+
+    def batch_load(self, keys):
+        user_counts = dict(
+            User.objects.filter(groups__in=keys)
+            .values("groups")
+            .annotate(user_count=Count("id"))
+            .values_list("groups", "user_count")
+        )
+        return [user_counts.get(group_id, 0) for group_id in keys]
+
+
+class HasTxnByGroupIdLoader(DataLoader):
+    context_key = "has_txn_by_group"
+
+    def batch_load(self, keys):
+        has_txn_map = dict(
+            GroupHierarchy.objects.filter(parent_id__in=keys).values_list(
+                "parent_id", "has_txn"
+            )
+        )
+        return [has_txn_map.get(group_id, False) for group_id in keys]
+
+
+class ParentByUserIdLoader(DataLoader):
+    """Load the nearest user above each user in the group hierarchy.
+
+    Like `User.get_parents`, the candidates are the users of the ancestor groups
+    of the user's first group who share a region with the user, or all of them
+    for a user without regions. Users of the nearest ancestor group win.
+    """
+
+    context_key = "parent_by_user"
+
+    def batch_load(self, keys):
+        # The first group of a user is the one with the lowest ID.
+        group_map = {}
+        for user_id, group_id in (
+            User.groups.through.objects.filter(user_id__in=keys)
+            .order_by("-group_id")
+            .values_list("user_id", "group_id")
+        ):
+            group_map[user_id] = group_id
+        region_map = defaultdict(set)
+        for user_id, region_id in User.regions.through.objects.filter(
+            user_id__in=keys
+        ).values_list("user_id", "region_id"):
+            region_map[user_id].add(region_id)
+        parent_group_map = defaultdict(list)
+        for child_id, parent_id in GroupHierarchy.objects.filter(
+            child__isnull=False, parent__isnull=False
+        ).values_list("child_id", "parent_id"):
+            parent_group_map[child_id].append(parent_id)
+
+        ancestor_map = {
+            user_id: self.get_ancestors(group_id, parent_group_map)
+            for user_id, group_id in group_map.items()
+        }
+        ancestor_ids = {
+            group_id for ancestors in ancestor_map.values() for group_id in ancestors
+        }
+        candidates = User.objects.filter(groups__in=ancestor_ids)
+        if all(region_map.get(user_id) for user_id in keys):
+            candidates = candidates.filter(
+                regions__in=set().union(*region_map.values())
+            )
+        candidate_map = defaultdict(lambda: defaultdict(set))
+        for user_id, group_id, region_id in candidates.values_list(
+            "pk", "groups", "regions"
+        ):
+            candidate_map[group_id][user_id].add(region_id)
+
+        parent_ids = {}
+        for user_id, ancestors in ancestor_map.items():
+            regions = region_map.get(user_id)
+            for group_id in ancestors:
+                parent_id = next(
+                    (
+                        candidate_id
+                        for candidate_id, candidate_regions in sorted(
+                            candidate_map[group_id].items()
+                        )
+                        if candidate_id != user_id
+                        and (not regions or regions & candidate_regions)
+                    ),
+                    None,
+                )
+                if parent_id is not None:
+                    parent_ids[user_id] = parent_id
+                    break
+        parents = User.objects.in_bulk(set(parent_ids.values()))
+        return [parents.get(parent_ids.get(user_id)) for user_id in keys]
+
+    @staticmethod
+    def get_ancestors(group_id, parent_group_map):
+        """Return the ancestor groups of the group, the nearest ones first."""
+        ancestors, level = [], [group_id]
+        while level:
+            level = [
+                parent_id
+                for child_id in level
+                for parent_id in parent_group_map[child_id]
+                if parent_id not in ancestors and parent_id != group_id
+            ]
+            ancestors.extend(dict.fromkeys(level))
+        return ancestors
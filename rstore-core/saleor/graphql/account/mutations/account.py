@@ -20,6 +20,7 @@ from ...utils import check_if_attempted_from_valid_parent, get_child_group_names
 from ....account import Qualification, EmployeeCount, ShopType, ShopSize, Gender, UserApprovalRequest, \
     UserApproval, GROUP_SEQUENCE, DocumentFileTag
 from ....account.models import UserCorrectionRequest, UserRequest, get_hierarchy
+from ....account.scope import get_requester_scope
 from ....account.thumbnails import create_user_avatar_thumbnails
 from ....account.sms import send_initial_submission_sms, send_kyc_submission_sms, send_rejection_sms, \
     send_initial_approval_sms, send_kyc_approval_sms, send_notification_cm_sms, send_notification_dco_sms
@@ -2000,32 +2001,27 @@ class AssignParentToUser(BaseMutation):
             )
 
         requestor = info.context.user
-        group = requestor.groups.first()
+        group = get_requester_scope(info.context).group
         user_groups_allowed_to_be_managed = get_child_group_names(group)
         if group.name == "cm":
             check_if_attempted_from_valid_parent(requestor, user)
 
         if check_if_attempted_from_valid_parent(parent, user):
-            if user.groups.first().name == "agent":
-                user_userrequest = models.UserRequest.objects.filter(user=user, assigned=user.parent,
-                                                                     status=UserApprovalRequest.PENDING)
-                if len(user_userrequest) > 0:
-                    user_userrequest = user_userrequest[0]
-                    user_userrequest.assigned = parent
-                    user_userrequest.save()
-            elif user.groups.first().name in user_groups_allowed_to_be_managed:
-                agents = get_all_agents(user)
-                old_cm = get_cm(copy.deepcopy(user))
-                new_cm = get_cm(copy.deepcopy(parent))
-                for agent in agents:
-                    user_userrequest = models.UserRequest.objects.filter(user=agent, assigned=old_cm,
-                                                                         status=UserApprovalRequest.PENDING)
-                    if len(user_userrequest) > 0:
-                        user_userrequest = user_userrequest[0]
-                        user_userrequest.assigned = new_cm
-                        user_userrequest.save()
-            user.parent = parent
-            user.save()
+            with transaction.atomic():
+                if user.groups.first().name == "agent":
+                    models.UserRequest.objects.filter(
+                        user=user, assigned_id=user.parent_id, status=UserApprovalRequest.PENDING
+                    ).update(assigned=parent)
+                elif user.groups.first().name in user_groups_allowed_to_be_managed:
+                    old_cm_id = get_cm_id(user)
+                    new_cm_id = get_cm_id(parent)
+                    if old_cm_id != new_cm_id:
+                        models.UserRequest.objects.filter(
+                            user_id__in=get_all_agents(user), assigned_id=old_cm_id,
+                            status=UserApprovalRequest.PENDING
+                        ).update(assigned_id=new_cm_id)
+                user.parent = parent
+                user.save(update_fields=["parent", "updated"])
         else:
             raise ValidationError(
                 {
@@ -2039,10 +2035,21 @@ class AssignParentToUser(BaseMutation):
         return AssignParentToUser(user=user)
 
 
-def get_cm(user):
-    while user.groups.first().name != "cm":
-        user = user.parent
-    return user
+def get_cm_id(user):
+    """Return the id of the closest "cm" in the user's parent chain, user included.
+
+    The whole chain is fetched with a single query instead of one per level.
+    """
+    lookups = []
+    path = ""
+    for _ in GROUP_SEQUENCE:
+        lookups.extend([f"{path}id", f"{path}groups__name"])
+        path += "parent__"
+    for row in models.User.objects.filter(pk=user.pk).values_list(*lookups):
+        for user_id, group_name in zip(row[::2], row[1::2]):
+            if group_name == "cm":
+                return user_id
+    return None
 
 
 # def get_all_agents(user):
@@ -2056,17 +2063,13 @@ def get_cm(user):
 
 
 def get_all_agents(parent_user):
-    agents = []
+    """Return a subquery of ids of agents sharing a region with the given user."""
     all_users = models.User.objects.all()
 
-    if parent_user.regions.count() > 0:
-        user_regions = parent_user.regions.all()
-        all_users = all_users.filter(regions__in=user_regions, groups__name="agent")
-
-    for user in all_users:
-        agents.append(user.id)
+    if parent_user.regions.exists():
+        all_users = all_users.filter(regions__in=parent_user.regions.all(), groups__name="agent")
 
-    return agents
+    return all_users.values("id")
 
 
 def parent_is_valid(user, parent):
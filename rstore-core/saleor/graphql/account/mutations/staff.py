@@ -14,6 +14,7 @@ from ...utils import check_if_attempted_from_valid_parent
 from ....account import events as account_events, models, utils
 from ....account.emails import send_set_password_email_with_url
 from ....account.error_codes import AccountErrorCode
+from ....account.scope import get_requester_scope
 from ....account.thumbnails import create_user_avatar_thumbnails
 from ....account.utils import remove_staff_member
 from ....checkout import AddressType
@@ -300,7 +301,7 @@ class StaffUpdate(ModelMutation):
         user = models.User.objects.get(id=instance.pk)
 
         # check if requestor can manage this user
-        if requestor.groups.first().name == "cm":
+        if get_requester_scope(info.context).group_name == "cm":
             check_if_attempted_from_valid_parent(requestor, user)
             fields_intended = list(data.keys())
             update_permitted = ["first_name", "last_name", "location", "address"]
@@ -552,7 +553,7 @@ class StaffUpdate(ModelMutation):
                     }
                 )
 
-        if info.context.user.groups.first().name == "cm":
+        if get_requester_scope(info.context).group_name == "cm":
             instance.save()
         else:
             if cleaned_input.get('is_active'):
@@ -4,19 +4,23 @@ from typing import Optional
 import graphene
 from django.contrib.auth import models as auth_models
 from django.contrib.auth.models import Group
-from django.db.models import Q
+from django.db.models import F, Q, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lag
 from django.shortcuts import get_object_or_404
 from graphql_jwt.exceptions import PermissionDenied
 from i18naddress import get_validation_rules
 
-from ...account import models, UserApproval
+from ...account import models, reference_data, UserApproval
 from ...account.models import GroupHierarchy
+from ...account.scope import get_requester_scope
 from ...core.permissions import AccountPermissions
 from ...payment import gateway
 from ...payment.utils import fetch_customer_id
+from ..core.optimizer import optimize_connection_queryset
 from ..utils import format_permissions_for_display, get_user_or_app_from_context, get_child_group_names
 from ..utils.filters import filter_by_query_param
-from .types import AddressValidationData, ChoiceValue
+from .types import AddressValidationData, AgentRequest, ChoiceValue
 from .utils import (
     get_allowed_fields_camel_case,
     get_required_fields_camel_case,
@@ -54,7 +58,7 @@ def resolve_permission_groups(info, **_kwargs):
 
 
 def resolve_staff_users(info, query, **_kwargs):
-    children_list = info.context.user.get_children()
+    children_list = get_requester_scope(info.context).get_children()
     if _kwargs.get("group"):
         qs = models.User.objects.staff().filter(Q(groups__name__iexact=_kwargs.get("group")) & Q(id__in=children_list))
     else:
@@ -175,16 +179,16 @@ def resolve_permissions(root: models.User):
 
 
 def resolve_districts(info):
-    return models.District.objects.all()
+    return reference_data.get_districts()
 
 
 def resolve_thanas(info, district_id):
     _model, pk = graphene.Node.from_global_id(district_id)
-    return models.Thana.objects.filter(district_id=pk)
+    return reference_data.get_district_thanas(pk)
 
 
 def resolve_all_thanas(info):
-    return models.Thana.objects.all()
+    return reference_data.get_thanas()
 
 
 def resolve_tuple(array: list):
@@ -195,7 +199,29 @@ def resolve_tuple(array: list):
 
 
 def resolve_mfs_account_types():
-    return models.MFSAccountType.objects.all()
+    return reference_data.get_mfs_account_types()
+
+
+def _filter_status_changes(qs):
+    """Skip requests with the same status as the next newer request of the user.
+
+    Done in the database with a window function, so filtering, sorting and
+    pagination are applied to the deduplicated requests.
+    """
+    requests = qs.annotate(
+        next_status=Window(
+            expression=Lag("status"),
+            partition_by=[F("user_id")],
+            order_by=[F("created").desc(), F("pk").desc()],
+        )
+    ).values("id", "status", "next_status")
+    sql, params = requests.query.sql_with_params()
+    status_changes = RawSQL(
+        f"SELECT id FROM ({sql}) AS requests "
+        "WHERE next_status IS DISTINCT FROM status",
+        params,
+    )
+    return qs.filter(id__in=status_changes)
 
 
 def resolve_agent_requests(info, query, **_kwargs):
@@ -204,16 +230,9 @@ def resolve_agent_requests(info, query, **_kwargs):
         qs = models.UserRequest.objects.all().order_by('-created')
     else:
         qs = models.UserRequest.objects.filter(assigned_id=requester).order_by('-created')
-
-    valid_requests_ids = []
-    used = {}
-
-    for item in qs:
-        if used.get(item.user_id) != item.status:
-            used[item.user_id] = item.status
-            valid_requests_ids.append(item.id)
-
-    return qs.filter(id__in=valid_requests_ids)
+    # The field is a plain DjangoFilterConnectionField, which doesn't apply the
+    # optimizer hints of the node type itself.
+    return optimize_connection_queryset(_filter_status_changes(qs), info, AgentRequest)
 
 
 def resolve_agent_request_search(info, query, **_kwargs):
@@ -222,15 +241,7 @@ def resolve_agent_request_search(info, query, **_kwargs):
         qs = models.UserRequest.objects.all().order_by('-created')
     else:
         qs = models.UserRequest.objects.filter(assigned_id=requester).order_by('-created')
-    valid_requests_ids = []
-    used = {}
-
-    for item in qs:
-        if used.get(item.user_id) != item.status:
-            used[item.user_id] = item.status
-            valid_requests_ids.append(item.id)
-
-    return qs.filter(id__in=valid_requests_ids)
+    return _filter_status_changes(qs)
 
 
 def resolve_requested_agent(info, query, **_kwargs):
@@ -280,15 +291,7 @@ def resolve_user_correction_request_search(info, query, **_kwargs):
         qs = models.UserCorrectionRequest.objects.all().order_by('-created')
     else:
         qs = models.UserCorrectionRequest.objects.filter(assigned_id=requester).order_by('-created')
-    valid_requests_ids = []
-    used = {}
-
-    for item in qs:
-        if used.get(item.user_id) != item.status:
-            used[item.user_id] = item.status
-            valid_requests_ids.append(item.id)
-
-    return qs.filter(id__in=valid_requests_ids)
+    return _filter_status_changes(qs)
 
 
 def resolve_user_correction_requests(info, **kwargs):
@@ -297,7 +300,7 @@ def resolve_user_correction_requests(info, **kwargs):
     if user.groups.filter(name='admin').exists():
         qs = models.UserCorrectionRequest.objects.all()
     else:
-        children = user.get_children()
+        children = get_requester_scope(info.context).get_children()
         qs = models.UserCorrectionRequest.objects.filter(user__in=children)
     return qs
 
@@ -312,18 +315,18 @@ def resolve_group_map():
 
 
 def resolve_groups(info):
-    return auth_models.Group.objects.all()
+    return reference_data.get_groups()
 
 
 def resolve_user_manageable_groups(info):
     user = info.context.user
     if user.is_authenticated:
-        request_user_grp_id = user.groups.first().id
+        user_group = get_requester_scope(info.context).group
         has_hierarchy = GroupHierarchy.objects.filter(
-            Q(parent_id=request_user_grp_id) | Q(child_id=request_user_grp_id)
+            Q(parent_id=user_group.id) | Q(child_id=user_group.id)
         ).exists()
         if has_hierarchy:
-            child_groups = get_child_group_names(user.groups.first(), True)
+            child_groups = get_child_group_names(user_group, True)
             return auth_models.Group.objects.filter(name__in=child_groups)
         else:
             return Group.objects.filter(parent_group__has_txn=True)
@@ -2,6 +2,7 @@ import graphene
 from graphene_django.filter import DjangoFilterConnectionField
 
 from ...core.permissions import AccountPermissions, AppPermission
+from ..core.connection import TotalCountMode
 from ..core.fields import FilterInputConnectionField
 from ..core.types import FilterInputObjectType, Permission
 from ..decorators import one_of_permissions_required, permission_required
@@ -179,6 +180,7 @@ class AccountQueries(graphene.ObjectType):
         filter=StaffUserInput(description="Filtering options for staff users."),
         sort_by=UserSortingInput(description="Sort staff users."),
         description="List of the shop's staff users.",
+        count_mode=TotalCountMode.ESTIMATED,
     )
     service_accounts = FilterInputConnectionField(
         ServiceAccount,
@@ -0,0 +1,76 @@
+import graphene
+import pytest
+
+from ....account import UserApprovalRequest
+from ....account.models import User, UserRequest
+from ..schema import AccountQueries
+
+AGENT_REQUESTS_QUERY = """
+    query AgentRequests {
+        agentRequests(first: 20) {
+            edges {
+                node {
+                    status
+                    user {
+                        email
+                    }
+                    assigned {
+                        email
+                    }
+                }
+            }
+        }
+    }
+"""
+
+
+@pytest.fixture
+def schema():
+    return graphene.Schema(query=AccountQueries)
+
+
+@pytest.fixture
+def create_agent_requests(staff_user):
+    def create(count):
+        offset = UserRequest.objects.count()
+        users = [
+            User.objects.create(
+                phone=f"0171{offset + index:07d}",
+                email=f"agent-{offset + index}@example.com",
+            )
+            for index in range(count)
+        ]
+        UserRequest.objects.bulk_create(
+            [
+                UserRequest(
+                    user=user,
+                    assigned=staff_user,
+                    status=UserApprovalRequest.PENDING,
+                )
+                for user in users
+            ]
+        )
+
+    return create
+
+
+def test_agent_requests_query_count_does_not_grow_with_requests(
+    staff_api_client,
+    permission_manage_staff,
+    create_agent_requests,
+    assert_query_count_does_not_grow,
+):
+    # given
+    staff_api_client.user.user_permissions.add(permission_manage_staff)
+    create_agent_requests(1)
+
+    # when
+    content = assert_query_count_does_not_grow(
+        staff_api_client, AGENT_REQUESTS_QUERY, lambda: create_agent_requests(4)
+    )
+
+    # then
+    requests = content["agentRequests"]["edges"]
+    assert len(requests) == 5
+    for request in requests:
+        assert request["node"]["assigned"]["email"] == staff_api_client.user.email
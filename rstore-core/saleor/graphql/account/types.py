@@ -7,20 +7,30 @@ from graphene.types.generic import GenericScalar
 from graphene_federation import key
 from graphql_jwt.exceptions import PermissionDenied
 
-from ...account import models
+from ...account import models, reference_data
 from ...checkout.utils import get_user_checkout
 from ...core.permissions import AccountPermissions, OrderPermissions
 from ...order import models as order_models
 from ..checkout.types import Checkout
-from ..core.connection import CountableDjangoObjectType
+from ..core.connection import CountableDjangoObjectType, TotalCountMode
 from ..core.fields import PrefetchingConnectionField
 from ..core.types import CountryDisplay, Image, Permission
 from ..core.utils import from_global_id_strict_type
 from ..decorators import one_of_permissions_required, permission_required
 from ..meta.deprecated.resolvers import resolve_meta, resolve_private_meta
 from ..meta.types import ObjectWithMetadata
-from ..utils import format_permissions_for_display, get_immediate_parent
+from ..utils import format_permissions_for_display
 from ..wishlist.resolvers import resolve_wishlist_items_from_user
+from .dataloaders import (
+    AddressByIdLoader,
+    AddressesByUserIdLoader,
+    DocumentsByUserIdLoader,
+    GroupsByUserIdLoader,
+    HasTxnByGroupIdLoader,
+    ParentByUserIdLoader,
+    RegionsByUserIdLoader,
+    UserCountByGroupIdLoader,
+)
 from .enums import CountryCodeEnum, CustomerEventsEnum
 from .utils import can_user_manage_group, get_groups_which_user_can_manage
 
@@ -39,6 +49,12 @@ class AddressInput(graphene.InputObjectType):
     phone = graphene.String(description="Phone number.")
 
 
+def _get_document_by_tag(documents, file_tag):
+    return next(
+        (document for document in documents if document.file_tag == file_tag), None
+    )
+
+
 @key(fields="id")
 class Address(CountableDjangoObjectType):
     country = graphene.Field(
@@ -227,10 +243,13 @@ class UserStoreInfo(CountableDjangoObjectType):
 
     @staticmethod
     def resolve_store_phone(root: models.User, info, **_kwargs):
-        address = root.default_billing_address
-        if address:
-            return address.phone
-        return None
+        if root.default_billing_address_id is None:
+            return None
+        return (
+            AddressByIdLoader(info.context)
+            .load(root.default_billing_address_id)
+            .then(lambda address: address.phone if address else None)
+        )
 
     @staticmethod
     def resolve_store_address(root: models.User, info, **_kwargs):
@@ -291,7 +310,9 @@ class User(UserStoreInfo):
     )
     note = graphene.String(description="A note about the customer.")
     orders = PrefetchingConnectionField(
-        "saleor.graphql.order.types.Order", description="List of user's orders."
+        "saleor.graphql.order.types.Order",
+        description="List of user's orders.",
+        count_mode=TotalCountMode.ESTIMATED,
     )
     # deprecated, to remove in #5389
     permissions = graphene.List(
@@ -360,10 +381,14 @@ class User(UserStoreInfo):
             "documents",
             "regions"
         ]
+        optimizer_hints = {
+            "events": {"prefetch_related": ["events"]},
+            "gift_cards": {"prefetch_related": ["gift_cards"]},
+        }
 
     @staticmethod
-    def resolve_parent(root: models.User, _info):
-        return get_immediate_parent(root)
+    def resolve_parent(root: models.User, info):
+        return ParentByUserIdLoader(info.context).load(root.pk)
         # user = get_immediate_parent(root)
         # parent = graphene.Field(Parent)
         # if user is not None:
@@ -375,16 +400,51 @@ class User(UserStoreInfo):
         # return user
 
     @staticmethod
-    def resolve_nid_front(root: models.User, _info, **_kwargs):
-        return root.documents.filter(file_tag='nid_front').first()
+    def resolve_nid_front(root: models.User, info, **_kwargs):
+        return (
+            DocumentsByUserIdLoader(info.context)
+            .load(root.pk)
+            .then(lambda documents: _get_document_by_tag(documents, "nid_front"))
+        )
 
     @staticmethod
-    def resolve_nid_back(root: models.User, _info, **_kwargs):
-        return root.documents.filter(file_tag='nid_back').first()
+    def resolve_nid_back(root: models.User, info, **_kwargs):
+        return (
+            DocumentsByUserIdLoader(info.context)
+            .load(root.pk)
+            .then(lambda documents: _get_document_by_tag(documents, "nid_back"))
+        )
 
     @staticmethod
-    def resolve_addresses(root: models.User, _info, **_kwargs):
-        return root.addresses.annotate_default(root).all()
+    def resolve_addresses(root: models.User, info, **_kwargs):
+        def _annotate_default(addresses):
+            # Same attributes as set by `AddressQueryset.annotate_default`.
+            for address in addresses:
+                address.user_default_shipping_address_pk = (
+                    root.default_shipping_address_id
+                )
+                address.user_default_billing_address_pk = (
+                    root.default_billing_address_id
+                )
+            return addresses
+
+        return (
+            AddressesByUserIdLoader(info.context)
+            .load(root.pk)
+            .then(_annotate_default)
+        )
+
+    @staticmethod
+    def resolve_default_shipping_address(root: models.User, info, **_kwargs):
+        if root.default_shipping_address_id is None:
+            return None
+        return AddressByIdLoader(info.context).load(root.default_shipping_address_id)
+
+    @staticmethod
+    def resolve_default_billing_address(root: models.User, info, **_kwargs):
+        if root.default_billing_address_id is None:
+            return None
+        return AddressByIdLoader(info.context).load(root.default_billing_address_id)
 
     @staticmethod
     def resolve_checkout(root: models.User, _info, **_kwargs):
@@ -408,8 +468,8 @@ class User(UserStoreInfo):
         return resolve_permissions(root)
 
     @staticmethod
-    def resolve_permission_groups(root: models.User, _info, **_kwargs):
-        return root.groups.all()
+    def resolve_permission_groups(root: models.User, info, **_kwargs):
+        return GroupsByUserIdLoader(info.context).load(root.pk)
 
     @staticmethod
     def resolve_editable_groups(root: models.User, _info, **_kwargs):
@@ -456,12 +516,12 @@ class User(UserStoreInfo):
         raise PermissionDenied()
 
     @staticmethod
-    def resolve_documents(root: models.User, _info, **_kwargs):
-        return root.documents.all()
+    def resolve_documents(root: models.User, info, **_kwargs):
+        return DocumentsByUserIdLoader(info.context).load(root.pk)
 
     @staticmethod
-    def resolve_regions(root: models.User, _info, **_kwargs):
-        return root.regions.all()
+    def resolve_regions(root: models.User, info, **_kwargs):
+        return RegionsByUserIdLoader(info.context).load(root.pk)
 
     @staticmethod
     @one_of_permissions_required(
@@ -534,18 +594,25 @@ class User(UserStoreInfo):
 
     @staticmethod
     def resolve_store_address(root: models.User, info, **_kwargs):
-        store_address = None
+        def _resolve_store_address(addresses):
+            store_address = None
 
-        if root.addresses and len(root.addresses.annotate_default(root)) > 0:
-            default_address = root.addresses.annotate_default(root)[0]
-            store_address = default_address.street_address_1
+            if len(addresses) > 0:
+                default_address = addresses[0]
+                store_address = default_address.street_address_1
 
-            if default_address.postal_code:
-                if store_address != "":
-                    store_address = f'{store_address}, '
-                store_address = store_address + default_address.postal_code
+                if default_address.postal_code:
+                    if store_address != "":
+                        store_address = f'{store_address}, '
+                    store_address = store_address + default_address.postal_code
 
-        return store_address
+            return store_address
+
+        return (
+            AddressesByUserIdLoader(info.context)
+            .load(root.pk)
+            .then(_resolve_store_address)
+        )
 
 
 class UserRequest(graphene.ObjectType):
@@ -671,18 +738,13 @@ class Group(CountableDjangoObjectType):
         user = info.context.user
         return can_user_manage_group(user, root)
 
-    def resolve_user_count(self, info):
-        user_count = models.User.objects.filter(groups__name=self.name).count()
-        return user_count
+    @staticmethod
+    def resolve_user_count(root: auth_models.Group, info):
+        return UserCountByGroupIdLoader(info.context).load(root.pk)
 
     @staticmethod
-    def resolve_has_txn(root: auth_models.Group, _info, **_kwargs):
-        try:
-            entry = models.GroupHierarchy.objects.get(parent=root)
-            has_txn = entry.has_txn
-        except models.GroupHierarchy.DoesNotExist:
-            has_txn = False
-        return has_txn
+    def resolve_has_txn(root: auth_models.Group, info, **_kwargs):
+        return HasTxnByGroupIdLoader(info.context).load(root.pk)
 
 
 class Thana(CountableDjangoObjectType):
@@ -701,7 +763,7 @@ class District(CountableDjangoObjectType):
     thanas = graphene.List(Thana)
 
     def resolve_thanas(self, info):
-        return models.Thana.objects.filter(district_id=self.id)
+        return reference_data.get_district_thanas(self.id)
 
 
 class MFSAccountType(CountableDjangoObjectType):
@@ -716,6 +778,10 @@ class AgentRequest(CountableDjangoObjectType):
         description = "Represents an agent request"
         filter_fields = ['status']
         interfaces = [relay.Node]
+        optimizer_hints = {
+            "user": {"select_related": ["user"]},
+            "assigned": {"select_related": ["assigned"]},
+        }
 
 
 class UserCorrectionRequest(CountableDjangoObjectType):
@@ -724,6 +790,11 @@ class UserCorrectionRequest(CountableDjangoObjectType):
         description = "Represents an user correction request"
         model = models.UserCorrectionRequest
         filter_fields = ['status']
+        optimizer_hints = {
+            "user": {"select_related": ["user"]},
+            "assigned": {"select_related": ["assigned"]},
+            "user_correction": {"select_related": ["user_correction"]},
+        }
 
 
 class UserCorrection(CountableDjangoObjectType):
@@ -1,17 +1,30 @@
+import hashlib
+import json
+import time
 from typing import Optional
 
 import opentracing
 import opentracing.tags
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.db import connection
 from django.utils.functional import SimpleLazyObject
-from graphql import ResolveInfo
+from graphql import GraphQLError, ResolveInfo
 from graphql_jwt.middleware import JSONWebTokenMiddleware
 
 from .views import API_PATH, GraphQLView
+from ..account import reference_data
 from ..account.utils import authorize
+from ..app.auth_cache import get_app_by_token
 from ..app.models import App
 from ..core.exceptions import ReadOnlyException
+from ..core.metrics import QueryCounter, resolver_metrics, should_sample_request
+from ..core.query_cost import (
+    QUERY_COST_LIMIT,
+    QueryCostAnalyzer,
+    refund_query_cost_budget,
+    reserve_query_cost,
+)
 from ..core.tracing import should_trace
 
 
@@ -44,12 +57,185 @@ class OpentracingGrapheneMiddleware:
             span.set_tag(opentracing.tags.COMPONENT, "graphql")
             span.set_tag("graphql.parent_type", info.parent_type.name)
             span.set_tag("graphql.field_name", info.field_name)
+            result = next_(root, info, **kwargs)
+            scope = getattr(info.context, "requester_scope", None)
+            if scope is not None:
+                span.set_tag("requester_scope.hits", scope.hits)
+                span.set_tag("requester_scope.misses", scope.misses)
+            return result
+
+
+class QueryCostMiddleware:
+    """Reject operations whose static cost is over the limit or budget.
+
+    The cost is computed once per operation, before any of its root fields is
+    resolved, and reserved in the budget of accepted operations right away. It
+    is stored on the request for `query_cost_extensions_middleware`.
+    """
+
+    @staticmethod
+    def resolve(next_, root, info: ResolveInfo, **kwargs):
+        request = info.context
+        query_costs = getattr(request, "query_costs", None)
+        if query_costs is None:
+            query_costs = request.query_costs = {}
+        operation_key = id(info.operation)
+        if operation_key not in query_costs:
+            analyzer = QueryCostAnalyzer(
+                info.schema, info.fragments, info.variable_values
+            )
+            cost = analyzer.get_operation_cost(info.operation)
+            error = None
+            try:
+                reserve_query_cost(request, cost)
+            except GraphQLError as e:
+                error = e
+            query_costs[operation_key] = (cost, error)
+            request.query_cost = cost
+            if error is None:
+                # Refunded if the request fails before the operation is done.
+                request.reserved_query_cost = (
+                    getattr(request, "reserved_query_cost", 0) + cost
+                )
+            span = opentracing.global_tracer().active_span
+            if span is not None:
+                span.set_tag("graphql.query_cost", cost)
+                span.set_tag("graphql.query_cost_rejected", error is not None)
+        _cost, error = query_costs[operation_key]
+        if error is not None:
+            raise error
+        return next_(root, info, **kwargs)
+
+
+def query_cost_extensions_middleware(get_response):
+    """Report the cost of operations in the response extensions.
+
+    The budget reserved for the operations of a request which failed with a
+    server error, and so never completed, is refunded.
+    """
+
+    def middleware(request):
+        response = get_response(request)
+        reserved_query_cost = getattr(request, "reserved_query_cost", 0)
+        if reserved_query_cost and response.status_code >= 500:
+            refund_query_cost_budget(request, reserved_query_cost)
+        query_cost = getattr(request, "query_cost", None)
+        if query_cost is None or not response.get("Content-Type", "").startswith(
+            "application/json"
+        ):
+            return response
+        content = json.loads(response.content)
+        if isinstance(content, dict):
+            content.setdefault("extensions", {})["cost"] = {
+                "requestedQueryCost": query_cost,
+                "maximumAvailable": QUERY_COST_LIMIT,
+            }
+            response.content = json.dumps(content)
+        return response
+
+    return middleware
+
+
+# Root fields serving reference data, mapped to the dataset versioning them.
+REFERENCE_DATA_FIELDS = {
+    "districts": reference_data.REGIONS,
+    "thanas": reference_data.REGIONS,
+    "allThanas": reference_data.REGIONS,
+    "mfsAccountTypes": reference_data.MFS_ACCOUNT_TYPES,
+    "groups": reference_data.GROUPS,
+    "addressValidationRules": reference_data.STATIC,
+    "qualifications": reference_data.STATIC,
+    "shopSizes": reference_data.STATIC,
+    "shopTypes": reference_data.STATIC,
+    "numberOfEmployees": reference_data.STATIC,
+    "genders": reference_data.STATIC,
+}
+
+
+class ReferenceDataMiddleware:
+    """Collect versions of the reference data served by the root fields.
+
+    Used by `reference_data_etag_middleware` to tag responses consisting only
+    of reference data.
+    """
+
+    @staticmethod
+    def resolve(next_, root, info: ResolveInfo, **kwargs):
+        if root is None and len(info.path) == 1:
+            request = info.context
+            versions = getattr(request, "reference_data_versions", None)
+            if versions is None:
+                versions = request.reference_data_versions = {}
+                request.reference_data_only = True
+            dataset = REFERENCE_DATA_FIELDS.get(info.field_name)
+            if dataset is None:
+                request.reference_data_only = False
+            else:
+                versions[dataset] = reference_data.get_reference_data_version(dataset)
+        return next_(root, info, **kwargs)
+
+
+def reference_data_etag_middleware(get_response):
+    """Add ETag and versions to responses consisting only of reference data.
+
+    The ETag combines the request body with the versions of the served
+    datasets, so it changes only when the query or the data does. A matching
+    `If-None-Match` header gets an empty 304 response.
+    """
+
+    def middleware(request):
+        response = get_response(request)
+        versions = getattr(request, "reference_data_versions", None)
+        if (
+            not versions
+            or not getattr(request, "reference_data_only", False)
+            or response.status_code != 200
+        ):
+            return response
+        etag_source = request.body + json.dumps(versions, sort_keys=True).encode()
+        etag = '"%s"' % hashlib.sha256(etag_source).hexdigest()
+        if request.META.get("HTTP_IF_NONE_MATCH") == etag:
+            response.status_code = 304
+            response.content = b""
+        elif response.get("Content-Type", "").startswith("application/json"):
+            content = json.loads(response.content)
+            if isinstance(content, dict):
+                content.setdefault("extensions", {})["referenceData"] = versions
+                response.content = json.dumps(content)
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+    return middleware
+
+
+class ResolverMetricsMiddleware:
+    """Record latency and SQL query count histograms of sampled requests.
+
+    Only the fields which would be traced are measured. Resolvers returning a
+    promise are measured until the promise is created; the queries run by the
+    data loader are attributed to the field which dispatches the batch.
+    """
+
+    @staticmethod
+    def resolve(next_, root, info: ResolveInfo, **kwargs):
+        if not should_sample_request(info.context) or not should_trace(info):
             return next_(root, info, **kwargs)
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            result = next_(root, info, **kwargs)
+        resolver_metrics.observe(
+            info.parent_type.name,
+            info.field_name,
+            time.perf_counter() - start,
+            counter.count,
+        )
+        return result
 
 
 def get_app(auth_token) -> Optional[App]:
-    qs = App.objects.filter(tokens__auth_token=auth_token, is_active=True)
-    return qs.first()
+    return get_app_by_token(auth_token)
 
 
 def app_middleware(next, root, info, **kwargs):
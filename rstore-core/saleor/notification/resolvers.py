@@ -3,15 +3,15 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.db.models.query_utils import Q
 
 from .types import Segment
+from ...account.scope import get_requester_scope
 from ...notification import models
 
 
 def resolve_notifications(info):
     user = info.context.user
-    user_group = user.groups.first()
-    user_region = user.regions.all()
+    scope = get_requester_scope(info.context)
     notifications = models.Notification.objects.filter(
-        Q(recipients=user) | Q(groups=user_group) | Q(regions__in=user_region)
+        Q(recipients=user) | Q(groups=scope.group) | Q(regions__in=scope.region_ids)
     )
     for notification in notifications:
         try:
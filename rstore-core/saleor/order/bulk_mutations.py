@@ -0,0 +1,312 @@
+from collections import defaultdict
+
+import graphene
+from decouple import config
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.db.models import Q
+
+from ...account.models import User
+from ...app.auth_cache import get_app_partner
+from ...core.permissions import OrderPermissions
+from ...core.utils import get_client_ip
+from ...order import models
+from ...order.error_codes import OrderErrorCode
+from ...order.idempotency import (
+    OrderIdempotencyScope,
+    get_idempotency_records,
+    get_request_hash,
+)
+from ...order.ingestion import ingest_partner_orders
+from ...order.transitions import OrderStatusTransition
+from ...shipping.models import ShippingMethod
+from ..core.mutations import BaseMutation
+from ..core.types.common import BulkOrderError
+from .mutations.orders import (
+    CreateNewOrder,
+    CreateNewOrderInput,
+    PartnerOrderLookups,
+    UpdateOrder,
+    UpdateOrderInput,
+)
+from .types import Order
+
+BULK_ORDER_CREATE_MAX_SIZE = config("BULK_ORDER_CREATE_MAX_SIZE", default=500, cast=int)
+BULK_ORDER_UPDATE_MAX_SIZE = config(
+    "BULK_ORDER_UPDATE_MAX_SIZE", default=1000, cast=int
+)
+
+
+class BulkPartnerOrderLookups(PartnerOrderLookups):
+    """Resolve the records referenced by a batch of orders with a query each."""
+
+    def __init__(self, partner, orders_data):
+        super().__init__(partner)
+        emails = {data.get("user_email") for data in orders_data} - {None}
+        phones = {data.get("user_phone") for data in orders_data} - {None}
+        self.users_by_email, self.users_by_phone = {}, {}
+        users = User.objects.filter(Q(email__in=emails) | Q(phone__in=phones))
+        for user in users.select_related(
+            "default_shipping_address", "default_billing_address"
+        ).order_by("pk"):
+            self.users_by_email.setdefault(user.email, user)
+            self.users_by_phone.setdefault(user.phone, user)
+
+        self.warehouse = super().get_warehouse()
+        self.shipping_zone = super().get_shipping_zone()
+
+        prices = {0}
+        for data in orders_data:
+            shipping = data.get("shipping")
+            if shipping and shipping.get("price") is not None:
+                prices.add(shipping["price"])
+        self.shipping_methods = {}
+        shipping_methods = ShippingMethod.objects.filter(
+            shipping_zone=self.shipping_zone, price_amount__in=prices
+        )
+        for method in shipping_methods.order_by("pk"):
+            key = (method.shipping_zone_id, method.name.lower(), method.price_amount)
+            self.shipping_methods.setdefault(key, method)
+
+    def get_user(self, email, phone):
+        return self.users_by_email.get(email) or self.users_by_phone.get(phone)
+
+    def get_warehouse(self):
+        return self.warehouse
+
+    def get_shipping_zone(self):
+        return self.shipping_zone
+
+    def get_shipping_method(self, shipping_zone, name, price):
+        if shipping_zone is None:
+            return None
+        return self.shipping_methods.get((shipping_zone.pk, name.lower(), price))
+
+
+def add_indexes_to_errors(index, error, error_dict):
+    """Append errors with index in params to mutation error dict."""
+    for key, value in error.error_dict.items():
+        for e in value:
+            if e.params:
+                e.params["index"] = index
+            else:
+                e.params = {"index": index}
+        error_dict[key].extend(value)
+
+
+def get_partner_or_error(info):
+    partner = None
+    if info.context.app:
+        partner = get_app_partner(info.context.app)
+    if not partner:
+        raise ValidationError(
+            {
+                "partner": ValidationError(
+                    "Partner is not found", code=OrderErrorCode.NOT_FOUND,
+                )
+            }
+        )
+    return partner
+
+
+class BulkCreateOrders(BaseMutation):
+    count = graphene.Int(
+        required=True, description="Returns how many orders were created."
+    )
+    orders = graphene.List(
+        graphene.NonNull(Order),
+        required=True,
+        description=(
+            "List of created orders, including the ones created earlier by "
+            "requests with identical input."
+        ),
+    )
+
+    class Arguments:
+        orders = graphene.List(
+            graphene.NonNull(CreateNewOrderInput),
+            required=True,
+            description="Fields required to create orders from partner.",
+        )
+
+    class Meta:
+        description = (
+            "Creates orders from partner in bulk. Valid orders are created even "
+            "if some of the orders in the batch are invalid."
+        )
+        permissions = (OrderPermissions.MANAGE_ORDERS,)
+        error_type_class = BulkOrderError
+        error_type_field = "order_errors"
+
+    @classmethod
+    def clean_orders(cls, info, lookups, orders_data):
+        """Clean the orders and return the ones to create and already created.
+
+        An order already created by a request with identical input is
+        returned as it is, so a retried batch doesn't fail on it.
+        """
+        cleaned_orders, created_orders, errors = [], [], defaultdict(list)
+        partner = lookups.partner
+        partner_order_ids = {data.get("partner_order_id") for data in orders_data}
+        records = get_idempotency_records(
+            partner, OrderIdempotencyScope.CREATE, partner_order_ids
+        )
+        existing_ids = set(
+            models.Order.objects.filter(
+                partner=partner, partner_order_id__in=partner_order_ids
+            ).values_list("partner_order_id", flat=True)
+        )
+        for index, data in enumerate(orders_data):
+            partner_order_id = data.get("partner_order_id")
+            request_hash = get_request_hash(data)
+            record = records.get(partner_order_id)
+            try:
+                if record is not None and record.request_hash == request_hash:
+                    created_orders.append(record.order)
+                    continue
+                if partner_order_id in existing_ids:
+                    raise ValidationError(
+                        {
+                            "partner_order_id": ValidationError(
+                                "Order with this partner order ID already exists.",
+                                code=OrderErrorCode.UNIQUE,
+                            )
+                        }
+                    )
+                # Cleaning pops the fields, the input is kept for a retry.
+                cleaned_order = CreateNewOrder.clean_order_input(
+                    info, models.Order(), dict(data), lookups
+                )
+                cleaned_order["idempotency"] = (
+                    partner,
+                    partner_order_id,
+                    request_hash,
+                )
+                cleaned_orders.append(cleaned_order)
+                existing_ids.add(partner_order_id)
+            except ValidationError as exc:
+                add_indexes_to_errors(index, exc, errors)
+        return cleaned_orders, created_orders, errors
+
+    @classmethod
+    def create_orders(cls, info, partner, orders_data):
+        lookups = BulkPartnerOrderLookups(partner, orders_data)
+        cleaned_orders, created_orders, errors = cls.clean_orders(
+            info, lookups, orders_data
+        )
+        orders = ingest_partner_orders(
+            partner, cleaned_orders, customer_ip_address=get_client_ip(info.context)
+        )
+        return created_orders + orders, errors
+
+    @classmethod
+    def perform_mutation(cls, _root, info, **data):
+        orders_data = data["orders"]
+        if len(orders_data) > BULK_ORDER_CREATE_MAX_SIZE:
+            raise ValidationError(
+                {
+                    "orders": ValidationError(
+                        f"Up to {BULK_ORDER_CREATE_MAX_SIZE} orders can be "
+                        "created at once.",
+                        code=OrderErrorCode.INVALID,
+                    )
+                }
+            )
+
+        partner = get_partner_or_error(info)
+        try:
+            orders, errors = cls.create_orders(info, partner, orders_data)
+        except IntegrityError:
+            # Some of the orders were created by a concurrent request; clean
+            # the batch again to answer them from their records.
+            orders, errors = cls.create_orders(info, partner, orders_data)
+        if errors:
+            return cls.handle_errors(
+                ValidationError(errors), count=len(orders), orders=orders
+            )
+        return cls(count=len(orders), orders=orders)
+
+
+class BulkUpdateOrders(BaseMutation):
+    count = graphene.Int(
+        required=True, description="Returns how many orders were updated."
+    )
+    orders = graphene.List(
+        graphene.NonNull(Order), required=True, description="List of updated orders."
+    )
+
+    class Arguments:
+        orders = graphene.List(
+            graphene.NonNull(UpdateOrderInput),
+            required=True,
+            description=(
+                "Fields required to update status or payment status of orders."
+            ),
+        )
+
+    class Meta:
+        description = (
+            "Updates status or payment status of partner orders in bulk. Valid "
+            "updates are applied even if some of the updates in the batch are "
+            "invalid. Orders moving to the same statuses are updated together."
+        )
+        permissions = (OrderPermissions.MANAGE_ORDERS,)
+        error_type_class = BulkOrderError
+        error_type_field = "order_errors"
+
+    @classmethod
+    def perform_mutation(cls, _root, info, **data):
+        orders_data = data["orders"]
+        if len(orders_data) > BULK_ORDER_UPDATE_MAX_SIZE:
+            raise ValidationError(
+                {
+                    "orders": ValidationError(
+                        f"Up to {BULK_ORDER_UPDATE_MAX_SIZE} orders can be "
+                        "updated at once.",
+                        code=OrderErrorCode.INVALID,
+                    )
+                }
+            )
+        partner = get_partner_or_error(info)
+        instances = models.Order.objects.filter(
+            partner=partner,
+            partner_order_id__in={data["partner_order_id"] for data in orders_data},
+        ).in_bulk(field_name="partner_order_id")
+
+        errors = defaultdict(list)
+        groups = defaultdict(list)
+        for index, data in enumerate(orders_data):
+            instance = instances.get(data["partner_order_id"])
+            try:
+                cleaned_input = UpdateOrder.clean_statuses(instance, dict(data))
+            except ValidationError as exc:
+                add_indexes_to_errors(index, exc, errors)
+                continue
+            statuses = (cleaned_input["order_status"], cleaned_input["payment_status"])
+            groups[statuses].append((index, instance.pk))
+
+        warehouse = PartnerOrderLookups(partner).get_warehouse()
+        updated_ids = set()
+        for (order_status, payment_status), entries in groups.items():
+            transition = OrderStatusTransition(
+                order_status=order_status,
+                payment_status=payment_status,
+                user=info.context.user,
+                warehouse=warehouse,
+                customer_ip_address=get_client_ip(info.context),
+            )
+            transition_errors = transition.run(
+                [order_id for _index, order_id in entries]
+            )
+            for index, order_id in entries:
+                if order_id in transition_errors:
+                    add_indexes_to_errors(index, transition_errors[order_id], errors)
+                else:
+                    updated_ids.add(order_id)
+
+        orders = list(models.Order.objects.filter(pk__in=updated_ids))
+        if errors:
+            return cls.handle_errors(
+                ValidationError(errors), count=len(orders), orders=orders
+            )
+        return cls(count=len(orders), orders=orders)
@@ -0,0 +1,202 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from typing import Dict, Iterable, Optional
+
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils.text import slugify
+
+from ..product.models import Category, Product, ProductType, ProductVariant
+from ..warehouse.models import Stock
+
+PRODUCT_SYNC_FIELDS = (
+    "name",
+    "slug",
+    "description",
+    "price_amount",
+    "category_id",
+    "product_type_id",
+    "partner_id",
+    "is_published",
+)
+VARIANT_SYNC_FIELDS = (
+    "name",
+    "price_override_amount",
+    "track_inventory",
+    "weight",
+    "metadata",
+)
+
+
+def get_partner_sku(partner, sku: str) -> str:
+    return partner.partner_id + "-" + sku
+
+
+def get_default_product_type_id() -> Optional[int]:
+    """Return the product type synced products are created with."""
+    return ProductType.objects.order_by("pk").values_list("pk", flat=True).first()
+
+
+def _get_weight_value(weight):
+    return getattr(weight, "value", weight)
+
+
+def _get_categories(names: Iterable[str]) -> Dict[str, Category]:
+    """Return categories keyed by the lowercased name they were requested with.
+
+    A category matches on its name, regardless of case, or on its slug; the
+    missing ones are created.
+    """
+    names = {name.lower(): name for name in names}
+    if not names:
+        return {}
+    slugs = {key: slugify(name) for key, name in names.items()}
+    lookup = reduce(or_, [Q(name__iexact=name) for name in names.values()])
+    lookup |= Q(slug__in=set(slugs.values()) | set(names))
+    categories_by_name, categories_by_slug = {}, {}
+    for category in Category.objects.filter(lookup):
+        categories_by_name.setdefault(category.name.lower(), category)
+        categories_by_slug[category.slug.lower()] = category
+    categories = {}
+    missing = {}
+    for key, slug in slugs.items():
+        category = (
+            categories_by_name.get(key)
+            or categories_by_slug.get(key)
+            or categories_by_slug.get(slug)
+        )
+        if category is None:
+            category = missing.setdefault(slug, Category(name=names[key], slug=slug))
+        categories[key] = category
+    # Categories are an MPTT tree, whose columns are only filled in by `save()`.
+    for category in missing.values():
+        category.save()
+    return categories
+
+
+def _assign(instance, values: dict) -> bool:
+    """Set the values on the instance and return whether any of them changed."""
+    changed = False
+    for field, value in values.items():
+        current = getattr(instance, field)
+        if field == "weight":
+            current = _get_weight_value(current)
+        if current != value:
+            setattr(instance, field, value)
+            changed = True
+    return changed
+
+
+def sync_partner_catalog(partner, warehouse, lines) -> Dict[str, ProductVariant]:
+    """Upsert the products, variants and stocks of lines pushed by a partner.
+
+    SKUs and categories of all the lines are resolved with a query each, and
+    only the products and variants whose data differ from the line are
+    written. The stock of every variant is raised by the quantity ordered in
+    a single `UPDATE`. Returns variants keyed by the partner's SKU.
+    """
+    lines_by_sku = {}
+    quantities: Dict[str, int] = defaultdict(int)
+    for line in lines:
+        sku = get_partner_sku(partner, line["sku"])
+        # The last line of a SKU wins, like it would with consecutive orders.
+        lines_by_sku[sku] = line
+        quantities[sku] += line["quantity"]
+
+    variants = {
+        variant.sku: variant
+        for variant in ProductVariant.objects.filter(
+            sku__in=lines_by_sku
+        ).select_related("product")
+    }
+    categories = _get_categories(line["category"] for line in lines_by_sku.values())
+    product_type_id = get_default_product_type_id()
+
+    new_products, changed_products = [], []
+    for sku, line in lines_by_sku.items():
+        variant = variants.get(sku)
+        product = variant.product if variant else Product()
+        changed = _assign(
+            product,
+            {
+                "name": line["name"],
+                "slug": line["name"] + "-" + sku,
+                "description": line["description"],
+                "price_amount": line["base_price"],
+                "category_id": categories[line["category"].lower()].pk,
+                "product_type_id": product_type_id,
+                "partner_id": partner.pk,
+                "is_published": True,
+            },
+        )
+        if not variant:
+            new_products.append((sku, product))
+        elif changed:
+            changed_products.append(product)
+    Product.objects.bulk_update(changed_products, PRODUCT_SYNC_FIELDS)
+    Product.objects.bulk_create([product for _, product in new_products])
+    for sku, product in new_products:
+        variants[sku] = ProductVariant(product=product, sku=sku)
+
+    new_variants, changed_variants = [], []
+    for sku, line in lines_by_sku.items():
+        variant = variants[sku]
+        changed = _assign(
+            variant,
+            {
+                "name": line["name"],
+                "price_override_amount": line["base_price"],
+                "track_inventory": True,
+                "weight": line["weight"],
+                "metadata": {data.key: data.value for data in line["meta_data"]},
+            },
+        )
+        if not variant.pk:
+            new_variants.append(variant)
+        elif changed:
+            changed_variants.append(variant)
+    ProductVariant.objects.bulk_update(changed_variants, VARIANT_SYNC_FIELDS)
+    ProductVariant.objects.bulk_create(new_variants)
+
+    _add_stock(warehouse, variants, quantities)
+    return variants
+
+
+def update_stock_quantities(warehouse, quantities: Dict[int, int]):
+    """Change the stock quantities of variants by the given amounts.
+
+    Quantities are changed with `SET quantity = quantity + n` in one query,
+    so concurrent changes of the same stock never overwrite each other.
+    """
+    if not quantities:
+        return
+    Stock.objects.filter(
+        warehouse=warehouse, product_variant_id__in=quantities
+    ).update(
+        quantity=F("quantity")
+        + Case(
+            *[
+                When(product_variant_id=variant_id, then=Value(quantity))
+                for variant_id, quantity in quantities.items()
+            ],
+            output_field=IntegerField(),
+        )
+    )
+
+
+def _add_stock(warehouse, variants: Dict[str, ProductVariant], quantities):
+    """Raise the stock quantities of the ordered variants.
+
+    Missing stocks are inserted empty first, so they're raised like the rest.
+    """
+    quantities_by_variant = {
+        variants[sku].pk: quantity for sku, quantity in quantities.items()
+    }
+    Stock.objects.bulk_create(
+        [
+            Stock(product_variant_id=variant_id, warehouse=warehouse, quantity=0)
+            for variant_id in quantities_by_variant
+        ],
+        ignore_conflicts=True,
+    )
+    update_stock_quantities(warehouse, quantities_by_variant)
@@ -0,0 +1,75 @@
+from collections import defaultdict
+
+from ...order.models import Fulfillment, OrderEvent, OrderLine
+from ...order.pipeline import OrderPipelineStage
+from ...payment.models import Payment
+from ..core.dataloaders import DataLoader
+
+
+class OrderLineByIdLoader(DataLoader):
+    context_key = "orderline_by_id"
+
+    def batch_load(self, keys):
+        order_lines = OrderLine.objects.in_bulk(keys)
+        return [order_lines.get(line_id) for line_id in keys]
+
+
+class OrderLinesByOrderIdLoader(DataLoader):
+    context_key = "orderlines_by_order"
+
+    def batch_load(self, keys):
+        lines = OrderLine.objects.filter(order_id__in=keys).order_by("pk")
+        line_map = defaultdict(list)
+        for line in lines.iterator():
+            line_map[line.order_id].append(line)
+        return [line_map.get(order_id, []) for order_id in keys]
+
+
+class PaymentsByOrderIdLoader(DataLoader):
+    context_key = "payments_by_order"
+
+    def batch_load(self, keys):
+        # Transactions are read by Payment.can_void() and
+        # Payment.get_authorized_amount().
+        payments = (
+            Payment.objects.filter(order_id__in=keys)
+            .order_by("pk")
+            .prefetch_related("transactions")
+        )
+        payment_map = defaultdict(list)
+        for payment in payments:
+            payment_map[payment.order_id].append(payment)
+        return [payment_map.get(order_id, []) for order_id in keys]
+
+
+class OrderEventsByOrderIdLoader(DataLoader):
+    context_key = "orderevents_by_order"
+
+    def batch_load(self, keys):
+        events = OrderEvent.objects.filter(order_id__in=keys).order_by("pk")
+        event_map = defaultdict(list)
+        for event in events.iterator():
+            event_map[event.order_id].append(event)
+        return [event_map.get(order_id, []) for order_id in keys]
+
+
+class FulfillmentsByOrderIdLoader(DataLoader):
+    context_key = "fulfillments_by_order"
+
+    def batch_load(self, keys):
+        fulfillments = Fulfillment.objects.filter(order_id__in=keys).order_by("pk")
+        fulfillment_map = defaultdict(list)
+        for fulfillment in fulfillments.iterator():
+            fulfillment_map[fulfillment.order_id].append(fulfillment)
+        return [fulfillment_map.get(order_id, []) for order_id in keys]
+
+
+class OrderPipelineStagesByOrderIdLoader(DataLoader):
+    context_key = "orderpipelinestages_by_order"
+
+    def batch_load(self, keys):
+        stages = OrderPipelineStage.objects.filter(order_id__in=keys).order_by("pk")
+        stage_map = defaultdict(list)
+        for stage in stages.iterator():
+            stage_map[stage.order_id].append(stage)
+        return [stage_map.get(order_id, []) for order_id in keys]
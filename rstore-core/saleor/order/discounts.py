@@ -0,0 +1,82 @@
+from functools import partial
+from typing import Optional
+
+from django.conf import settings
+from django.db import models
+from prices import Money, fixed_discount, percentage_discount
+
+from ..discount import DiscountValueType
+from .models import Order
+from .utils import recalculate_order
+
+
+class OrderDiscount(models.Model):
+    """Discount a partner applied to a single order.
+
+    Partner discounts aren't reusable, so they're kept apart from the voucher
+    catalog instead of adding a voucher per discounted order.
+    """
+
+    order = models.OneToOneField(
+        Order, related_name="partner_discount", on_delete=models.CASCADE
+    )
+    name = models.CharField(max_length=255, blank=True, default="")
+    code = models.CharField(max_length=255, blank=True, default="")
+    value_type = models.CharField(
+        max_length=10,
+        choices=DiscountValueType.CHOICES,
+        default=DiscountValueType.FIXED,
+    )
+    value = models.DecimalField(
+        max_digits=settings.DEFAULT_MAX_DIGITS,
+        decimal_places=settings.DEFAULT_DECIMAL_PLACES,
+    )
+
+    class Meta:
+        app_label = "order"
+
+    def get_discount(self):
+        if self.value_type == DiscountValueType.FIXED:
+            discount_amount = Money(self.value, settings.DEFAULT_CURRENCY)
+            return partial(fixed_discount, discount=discount_amount)
+        if self.value_type == DiscountValueType.PERCENTAGE:
+            return partial(percentage_discount, percentage=self.value)
+        raise ValueError(f"Unknown discount type: {self.value_type}")
+
+    def get_discount_amount_for(self, price: Money):
+        discount = self.get_discount()
+        after_discount = discount(price)
+        if after_discount.amount < 0:
+            return price
+        return price - after_discount
+
+
+def get_discount_name(discount: dict) -> str:
+    return discount.get("name", "") + "-" + discount.get("code", "")
+
+
+def build_order_discount(order: Order, discount: Optional[dict]):
+    """Return the discount record of a discount given by a partner."""
+    if discount is None:
+        return None
+    return OrderDiscount(
+        order=order,
+        name=discount.get("name") or "",
+        code=discount.get("code") or "",
+        value_type=discount["discount_value_type"],
+        value=discount["discount_value"],
+    )
+
+
+def recalculate_order_with_discount(order: Order):
+    """Recalculate the totals of the order, applying its partner discount.
+
+    Orders without a partner discount are recalculated with their voucher.
+    """
+    try:
+        discount = order.partner_discount
+    except OrderDiscount.DoesNotExist:
+        recalculate_order(order)
+        return
+    order.discount = discount.get_discount_amount_for(order.get_subtotal().gross)
+    recalculate_order(order, update_voucher_discount=False)
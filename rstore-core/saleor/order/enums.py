@@ -2,10 +2,18 @@ import graphene
 
 from ...graphql.core.enums import to_enum
 from ...order import OrderEvents, OrderEventsEmails, OrderType
+from ...order.pipeline import (
+    OrderPipelineStageName,
+    OrderPipelineStatus,
+    OrderProcessingStatus,
+)
 
 OrderEventsEnum = to_enum(OrderEvents)
 OrderEventsEmailsEnum = to_enum(OrderEventsEmails)
 OrderTypeEnum = to_enum(OrderType)
+OrderPipelineStageNameEnum = to_enum(OrderPipelineStageName)
+OrderPipelineStatusEnum = to_enum(OrderPipelineStatus)
+OrderProcessingStatusEnum = to_enum(OrderProcessingStatus)
 
 
 class OrderStatusFilter(graphene.Enum):
@@ -0,0 +1,82 @@
+import hashlib
+import json
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import models
+
+from ..partner.models import Partner
+from .models import Order
+
+IDEMPOTENCY_KEY_HEADER = "HTTP_IDEMPOTENCY_KEY"
+
+
+class OrderIdempotencyScope:
+    # Orders are created once per partner order ID.
+    CREATE = "create"
+    UPDATE = "update"
+
+    CHOICES = [(CREATE, "Order creation"), (UPDATE, "Order update")]
+
+
+class OrderIdempotencyKey(models.Model):
+    """Order a partner's request was applied to, keyed by its idempotency key.
+
+    The unique index makes a concurrent duplicate wait for the original
+    request and fail once it commits, so it's answered from this record
+    instead of being applied again.
+    """
+
+    partner = models.ForeignKey(
+        Partner, related_name="order_idempotency_keys", on_delete=models.CASCADE
+    )
+    scope = models.CharField(max_length=32, choices=OrderIdempotencyScope.CHOICES)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    order = models.ForeignKey(
+        Order, related_name="idempotency_keys", on_delete=models.CASCADE
+    )
+    created = models.DateTimeField(auto_now_add=True, editable=False)
+
+    class Meta:
+        app_label = "order"
+        unique_together = (("partner", "scope", "key"),)
+
+
+def get_request_hash(data: dict) -> str:
+    content = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def get_idempotency_key(request, key: Optional[str] = None) -> Optional[str]:
+    """Return the key given in the input or in the `Idempotency-Key` header."""
+    return key or request.META.get(IDEMPOTENCY_KEY_HEADER) or None
+
+
+def get_idempotency_records(
+    partner, scope: str, keys: Iterable[str]
+) -> Dict[str, OrderIdempotencyKey]:
+    records = OrderIdempotencyKey.objects.filter(
+        partner=partner, scope=scope, key__in=keys
+    ).select_related("order")
+    return {record.key: record for record in records}
+
+
+def create_idempotency_records(
+    partner, scope: str, entries: Iterable[Tuple[str, str, Order]]
+):
+    """Record requests given as (key, request hash, order).
+
+    Raises `IntegrityError` if any of the keys was recorded in the meantime.
+    """
+    OrderIdempotencyKey.objects.bulk_create(
+        [
+            OrderIdempotencyKey(
+                partner=partner,
+                scope=scope,
+                key=key,
+                request_hash=request_hash,
+                order=order,
+            )
+            for key, request_hash, order in entries
+        ]
+    )
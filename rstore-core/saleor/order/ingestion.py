@@ -0,0 +1,163 @@
+from typing import List
+from uuid import uuid4
+
+from django.db import transaction
+
+from ..account.models import Address
+from ..core.total_count import invalidate_total_count
+from ..shipping.models import ShippingMethod
+from .catalog import get_partner_sku, sync_partner_catalog
+from .discounts import OrderDiscount, build_order_discount, get_discount_name
+from .idempotency import OrderIdempotencyScope, create_idempotency_records
+from .models import Order, OrderLine
+from .pipeline import create_order_pipelines, schedule_order_pipelines
+
+DEFAULT_SHIPPING_METHOD_NAME = "Default Shipping"
+
+
+def _save_addresses(cleaned_orders):
+    addresses = []
+    for cleaned_order in cleaned_orders:
+        if cleaned_order["new_shipping_address"]:
+            addresses.append(cleaned_order["shipping_address"])
+        if cleaned_order["new_billing_address"]:
+            addresses.append(cleaned_order["billing_address"])
+    Address.objects.bulk_create(addresses)
+
+
+def _get_shipping_methods(cleaned_orders) -> List[ShippingMethod]:
+    """Return the shipping method of every order, creating the missing ones once."""
+    created = {}
+    shipping_methods = []
+    for cleaned_order in cleaned_orders:
+        shipping_method = cleaned_order["existing_shipping_method"]
+        if shipping_method is None:
+            shipping = cleaned_order["shipping"] or {
+                "name": DEFAULT_SHIPPING_METHOD_NAME,
+                "price": 0,
+            }
+            key = (
+                cleaned_order["shipping_zone"].pk,
+                shipping["name"].lower(),
+                shipping["price"],
+            )
+            shipping_method = created.setdefault(
+                key,
+                ShippingMethod(
+                    name=shipping["name"],
+                    type="price",
+                    price_amount=shipping["price"],
+                    shipping_zone=cleaned_order["shipping_zone"],
+                ),
+            )
+        shipping_methods.append(shipping_method)
+    ShippingMethod.objects.bulk_create(created.values())
+    return shipping_methods
+
+
+def _build_order(cleaned_order, shipping_method) -> Order:
+    order = Order(
+        token=str(uuid4()),
+        status=cleaned_order["order_status"],
+        user=cleaned_order["user"],
+        partner=cleaned_order["partner"],
+        partner_order_id=cleaned_order["partner_order_id"],
+        shipping_address=cleaned_order["shipping_address"],
+        billing_address=cleaned_order["billing_address"],
+        customer_note=cleaned_order.get("customer_note", ""),
+        shipping_method=shipping_method,
+        shipping_price_gross_amount=shipping_method.price_amount,
+        shipping_price_net_amount=shipping_method.price_amount,
+    )
+    if "type" in cleaned_order:
+        order.type = cleaned_order["type"]
+    if cleaned_order["discount"] is not None:
+        order.discount_name = get_discount_name(cleaned_order["discount"])
+    other_charge = cleaned_order["other_charge"]
+    if other_charge:
+        order.other_charge_name = other_charge["name"]
+        order.other_charge_amount = other_charge["amount"]
+    return order
+
+
+def build_order_lines(partner, order, lines, variants) -> List[OrderLine]:
+    order_lines = []
+    for line in lines:
+        variant = variants[get_partner_sku(partner, line["sku"])]
+        order_lines.append(
+            OrderLine(
+                order=order,
+                product_name=variant.name,
+                product_sku=variant.sku,
+                quantity=line["quantity"],
+                variant=variant,
+                unit_price_net_amount=variant.price_override_amount,
+                variant_name=variant.name,
+                unit_price_gross_amount=variant.price_override_amount,
+                is_shipping_required=True,
+            )
+        )
+    return order_lines
+
+
+def ingest_partner_orders(
+    partner, cleaned_orders, customer_ip_address=None
+) -> List[Order]:
+    """Create orders pushed by a partner in bulk.
+
+    Addresses, shipping methods, catalog entries, orders, lines and discounts
+    are written with a handful of bulk queries in one transaction. The rest
+    of the work, starting with the order events and totals, is left to the
+    order pipelines, which a single task runs once the transaction commits.
+    Idempotency records of the orders are created in the same transaction.
+    """
+    if not cleaned_orders:
+        return []
+
+    with transaction.atomic():
+        _save_addresses(cleaned_orders)
+        shipping_methods = _get_shipping_methods(cleaned_orders)
+        variants = sync_partner_catalog(
+            partner,
+            cleaned_orders[0]["warehouse"],
+            [line for cleaned_order in cleaned_orders for line in cleaned_order["lines"]],
+        )
+
+        orders = Order.objects.bulk_create(
+            [
+                _build_order(cleaned_order, shipping_method)
+                for cleaned_order, shipping_method in zip(
+                    cleaned_orders, shipping_methods
+                )
+            ]
+        )
+
+        order_lines = []
+        for order, cleaned_order in zip(orders, cleaned_orders):
+            order_lines.extend(
+                build_order_lines(partner, order, cleaned_order["lines"], variants)
+            )
+        OrderLine.objects.bulk_create(order_lines)
+        invalidate_total_count(Order)
+        order_discounts = [
+            build_order_discount(order, cleaned_order["discount"])
+            for order, cleaned_order in zip(orders, cleaned_orders)
+        ]
+        OrderDiscount.objects.bulk_create(
+            [order_discount for order_discount in order_discounts if order_discount]
+        )
+
+        idempotency_entries = []
+        for order, cleaned_order in zip(orders, cleaned_orders):
+            _partner, key, request_hash = cleaned_order["idempotency"]
+            idempotency_entries.append((key, request_hash, order))
+        create_idempotency_records(
+            partner, OrderIdempotencyScope.CREATE, idempotency_entries
+        )
+
+        create_order_pipelines(
+            (order, cleaned_order["payment_status"], customer_ip_address)
+            for order, cleaned_order in zip(orders, cleaned_orders)
+        )
+        schedule_order_pipelines([order.pk for order in orders])
+    return orders
@@ -0,0 +1,123 @@
+from django.core.management import BaseCommand
+from django.core.management.base import CommandParser
+from django.db import transaction
+from django.db.models import Count, Min
+from django.db.models.functions import Lower
+
+from ....checkout.models import Checkout
+from ....core.total_count import invalidate_total_count
+from ....discount import VoucherType
+from ....discount.models import Voucher
+from ....shipping.models import ShippingMethod
+from ...discounts import OrderDiscount
+from ...models import Order
+
+# Shipping methods are only merged if they're identical apart from the case of
+# their names.
+SHIPPING_METHOD_KEY_FIELDS = [
+    "shipping_zone_id",
+    "lower_name",
+    "type",
+    "currency",
+    "price_amount",
+    "minimum_order_price_amount",
+    "maximum_order_price_amount",
+    "minimum_order_weight",
+    "maximum_order_weight",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge duplicated shipping methods and move the per-order vouchers of "
+        "partner orders to order discounts."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            dest="batch_size",
+            type=int,
+            default=500,
+            help="Number of orders whose vouchers are moved in a transaction.",
+        )
+
+    def handle(self, *args, **options):
+        merged = self.compact_shipping_methods()
+        self.stdout.write(f"Removed {merged} duplicated shipping methods.")
+        moved = self.compact_vouchers(options["batch_size"])
+        self.stdout.write(f"Moved the vouchers of {moved} orders to order discounts.")
+
+    def compact_shipping_methods(self) -> int:
+        shipping_methods = ShippingMethod.objects.annotate(lower_name=Lower("name"))
+        groups = (
+            shipping_methods.values(*SHIPPING_METHOD_KEY_FIELDS)
+            .annotate(keep_id=Min("pk"), count=Count("pk"))
+            .filter(count__gt=1)
+            .order_by()
+        )
+        removed = 0
+        for group in groups.iterator():
+            keep_id = group.pop("keep_id")
+            group.pop("count")
+            duplicate_ids = list(
+                shipping_methods.filter(**group)
+                .exclude(pk=keep_id)
+                .values_list("pk", flat=True)
+            )
+            with transaction.atomic():
+                Order.objects.filter(shipping_method_id__in=duplicate_ids).update(
+                    shipping_method_id=keep_id
+                )
+                Checkout.objects.filter(shipping_method_id__in=duplicate_ids).update(
+                    shipping_method_id=keep_id
+                )
+                ShippingMethod.objects.filter(pk__in=duplicate_ids).delete()
+                invalidate_total_count(Order)
+            removed += len(duplicate_ids)
+        return removed
+
+    def compact_vouchers(self, batch_size: int) -> int:
+        orders = (
+            Order.objects.filter(
+                partner__isnull=False,
+                voucher__isnull=False,
+                partner_discount__isnull=True,
+            )
+            .select_related("voucher")
+            .order_by("pk")
+        )
+        moved, last_pk = 0, 0
+        while True:
+            batch = list(orders.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return moved
+            last_pk = batch[-1].pk
+            voucher_ids = {order.voucher_id for order in batch}
+            discounts = []
+            for order in batch:
+                voucher = order.voucher
+                discounts.append(
+                    OrderDiscount(
+                        order=order,
+                        name=voucher.name or "",
+                        value_type=voucher.discount_value_type,
+                        value=voucher.discount_value,
+                    )
+                )
+                # The discount amount of the order is kept as it is.
+                order.discount_name = order.discount_name or voucher.name
+                order.voucher = None
+            with transaction.atomic():
+                OrderDiscount.objects.bulk_create(discounts, ignore_conflicts=True)
+                Order.objects.bulk_update(batch, ["voucher", "discount_name"])
+                invalidate_total_count(Order)
+                # Vouchers still used by other orders aren't per-order ones.
+                Voucher.objects.filter(
+                    pk__in=voucher_ids, type=VoucherType.ENTIRE_ORDER
+                ).exclude(
+                    pk__in=Order.objects.filter(voucher_id__in=voucher_ids).values(
+                        "voucher_id"
+                    )
+                ).delete()
+            moved += len(batch)
@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management import BaseCommand, CommandError
+from django.core.management.base import CommandParser
+
+from ...totals import rebuild_order_totals
+
+
+class Command(BaseCommand):
+    help = "Recompute the order totals rollup from the orders."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--since",
+            dest="since",
+            help="YYYY-MM-DD, inclusive. All days are recomputed if not given.",
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            try:
+                since = date.fromisoformat(options["since"])
+            except ValueError:
+                raise CommandError(
+                    f"Invalid date: {options['since']}. Use the YYYY-MM-DD format."
+                )
+        rebuild_order_totals(since=since)
+        self.stdout.write("Rebuilt the order totals.")
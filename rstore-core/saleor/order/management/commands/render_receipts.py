@@ -0,0 +1,68 @@
+from datetime import date
+
+from django.core.management import BaseCommand, CommandError
+from django.core.management.base import CommandParser
+
+from ...models import Order
+from ...tasks import render_receipts_task
+
+
+class Command(BaseCommand):
+    help = (
+        "Render receipts of the orders created in a date range. Batches are "
+        "rendered in parallel by the workers of the receipt queue."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--from", dest="start_date", required=True, help="YYYY-MM-DD, inclusive."
+        )
+        parser.add_argument(
+            "--to", dest="end_date", required=True, help="YYYY-MM-DD, inclusive."
+        )
+        parser.add_argument(
+            "--batch-size",
+            dest="batch_size",
+            type=int,
+            default=100,
+            help="Number of orders rendered by a single task.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Render receipts even if their content didn't change.",
+        )
+
+    def parse_date(self, value: str) -> date:
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f"Invalid date: {value}. Use the YYYY-MM-DD format.")
+
+    def handle(self, *args, **options):
+        start_date = self.parse_date(options["start_date"])
+        end_date = self.parse_date(options["end_date"])
+        if start_date > end_date:
+            raise CommandError("The start date must not be after the end date.")
+
+        order_ids = (
+            Order.objects.non_draft()
+            .filter(created__date__gte=start_date, created__date__lte=end_date)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+            .iterator()
+        )
+        batch_size = options["batch_size"]
+        batch, batches, total = [], 0, 0
+        for order_id in order_ids:
+            batch.append(order_id)
+            if len(batch) == batch_size:
+                render_receipts_task.delay(batch, force=options["force"])
+                batches += 1
+                total += len(batch)
+                batch = []
+        if batch:
+            render_receipts_task.delay(batch, force=options["force"])
+            batches += 1
+            total += len(batch)
+        self.stdout.write(f"Queued receipts of {total} orders in {batches} tasks.")
@@ -27,7 +27,8 @@ from ...product.types import ProductVariant
 from ..types import Order, OrderLine
 from ..utils import validate_draft_order
 
-from ....order.actions import generate_pdf_receipt
+from ....order.receipts import schedule_receipt_render
+from ....order.totals import schedule_order_totals_refresh
 
 
 class OrderLineInput(graphene.InputObjectType):
@@ -267,12 +268,10 @@ class DraftOrderComplete(BaseMutation):
 
         order.save()
 
-        order_lines = []
         for line in order:
             if line.variant.track_inventory:
                 try:
                     allocate_stock(line, country, line.quantity)
-                    order_lines.append(line)
                 except InsufficientStock as exc:
                     raise ValidationError(
                         {
@@ -284,8 +283,8 @@ class DraftOrderComplete(BaseMutation):
                     )
 
         order_created(order, user=info.context.user, from_draft=True)
-
-        generate_pdf_receipt(order, order_lines)
+        schedule_receipt_render(order)
+        schedule_order_totals_refresh([order.pk])
         return DraftOrderComplete(order=order)
 
 
@@ -1,7 +1,6 @@
 import graphene
 from django.core.exceptions import ValidationError
-from django.db import transaction
-from django.utils.text import slugify
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 from graphene.types import InputObjectType
 
@@ -17,12 +16,32 @@ from ....order.actions import (
     order_refunded,
     order_shipping_updated,
     order_voided,
-    create_fulfillments,
-    cancel_fulfillment,
     order_created,
 )
 from ....order.error_codes import OrderErrorCode
-from ....order.utils import get_valid_shipping_methods_for_order, recalculate_order
+from ....order.idempotency import (
+    OrderIdempotencyScope,
+    create_idempotency_records,
+    get_idempotency_key,
+    get_idempotency_records,
+    get_request_hash,
+)
+from ....order.catalog import sync_partner_catalog
+from ....order.discounts import (
+    build_order_discount,
+    get_discount_name,
+    recalculate_order_with_discount,
+)
+from ....order.ingestion import DEFAULT_SHIPPING_METHOD_NAME, build_order_lines
+from ....order.receipts import schedule_receipt_render
+from ....order.totals import schedule_order_totals_refresh
+from ....order.transitions import OrderStatusTransition
+from ....order.pipeline import (
+    OrderPipelineStageName,
+    create_order_pipelines,
+    schedule_order_pipelines,
+)
+from ....order.utils import get_valid_shipping_methods_for_order
 from ....payment import CustomPaymentChoices, PaymentError, gateway
 from ...account.types import AddressInput
 from ...core.mutations import BaseMutation, ModelMutation
@@ -33,42 +52,25 @@ from ...meta.deprecated.types import MetaInput, MetaPath
 from ...order.mutations.draft_orders import DraftOrderUpdate
 from ...order.types import Order, OrderEvent
 from ...shipping.types import ShippingMethod
-from ....order.actions import generate_pdf_receipt, generate_pdf_order_cancelled
+from ....order.actions import generate_pdf_order_cancelled
 
 from ..enums import OrderStatusFilter, OrderTypeEnum
 from ...discount.mutations import VoucherInput
 from ...meta.mutations import MetadataInput
 from ...payment.enums import PaymentChargeStatusEnum
 from ...shipping.mutations import ShippingPriceInput
+from ....app.auth_cache import get_app_partner
 from ....core.utils import get_client_ip
-from ....core.utils.promo_code import generate_promo_code
-from ....discount.models import Voucher as VoucherModel
 from ....payment import ChargeStatus
-from ....payment.utils import create_payment
-from ....product.models import ProductVariant as ProductVariantModel
-from ....product.models import Product as ProductModel
-from ....product.models import Category as CategoryModel
-from ....product.models import ProductType as ProductTypeModel
 from ....warehouse.models import Warehouse as WarehouseModel
-from ....warehouse.models import Stock as StockModel
-from ....partner.models import Partner as PartnerModel
-from ....payment.models import Payment as PaymentModel
 from ....shipping.models import ShippingMethod as ShippingMethodModel
 from ....shipping.models import ShippingZone as ShippingZoneModel
 from ....product.error_codes import ProductErrorCode
 from ...account.i18n import I18nMixin
 
-from collections import defaultdict
-import uuid
-from datetime import datetime
 from django.conf import settings
 
-from business_rules import run_all
-from ....commission.models import Rule
-from ....commission.commission_calculation import OrderVariables, OrderActions
-from ....order.sms import send_new_order_placement_sms, update_order_sms
-from ....order.achievement_calculations import calculate_attribute_target_progress, calculate_partner_target_progress, \
-    add_general_achievement, remove_general_achievement, remove_attribute_achievement, remove_partner_achievement
+from ....order.achievement_calculations import remove_general_achievement
 
 
 def clean_order_update_shipping(order, method):
@@ -215,8 +217,7 @@ class OrderUpdate(DraftOrderUpdate):
             user = User.objects.filter(email=instance.user_email).first()
             instance.user = user
         instance.save()
-        order_lines = models.OrderLine.objects.filter(order=instance)
-        generate_pdf_receipt(instance, order_lines)
+        schedule_receipt_render(instance)
 
 
 class OrderUpdateShippingInput(graphene.InputObjectType):
@@ -297,9 +298,7 @@ class OrderUpdateShipping(BaseMutation):
         )
         # Post-process the results
         order_shipping_updated(order)
-
-        order_lines = models.OrderLine.objects.filter(order__id=order.id)
-        generate_pdf_receipt(order, order_lines)
+        schedule_receipt_render(order)
 
         return OrderUpdateShipping(order=order)
 
@@ -353,9 +352,7 @@ class OrderAddNote(BaseMutation):
             user=info.context.user,
             message=cleaned_input["input"]["message"],
         )
-
-        order_lines = models.OrderLine.objects.filter(order__id=order.id)
-        generate_pdf_receipt(order, order_lines)
+        schedule_receipt_render(order)
 
         return OrderAddNote(order=order, event=event)
 
@@ -378,6 +375,7 @@ class OrderCancel(BaseMutation):
         clean_order_cancel(order)
         cancel_order(order=order, user=info.context.user)
         remove_general_achievement.delay(order.pk)
+        schedule_order_totals_refresh([order.pk])
         orderlines = models.OrderLine.objects.filter(order__id=order.id)
         generate_pdf_order_cancelled(order, orderlines, base_url=getattr(settings, "API_URL"))
         return OrderCancel(order=order)
@@ -413,8 +411,7 @@ class OrderMarkAsPaid(BaseMutation):
         )
 
         mark_order_as_paid(order, info.context.user)
-        order_lines = models.OrderLine.objects.filter(order__id=order.id)
-        generate_pdf_receipt(order, order_lines)
+        schedule_receipt_render(order)
 
         return OrderMarkAsPaid(order=order)
 
@@ -726,7 +723,117 @@ class CreateNewOrderInput(InputObjectType):
     )
 
 
-class CreateNewOrder(ModelMutation, I18nMixin):
+PARTNER_WAREHOUSE_NAME = "Bangladesh"
+PARTNER_SHIPPING_ZONE_NAME = "Bangladesh"
+
+
+class PartnerOrderLookups:
+    """Resolve the records referenced by an order pushed by a partner."""
+
+    def __init__(self, partner):
+        self.partner = partner
+
+    def get_user(self, email, phone):
+        return User.objects.filter(Q(email=email) | Q(phone=phone)).first()
+
+    def get_warehouse(self):
+        return WarehouseModel.objects.filter(name=PARTNER_WAREHOUSE_NAME).first()
+
+    def get_shipping_zone(self):
+        return ShippingZoneModel.objects.filter(
+            name=PARTNER_SHIPPING_ZONE_NAME
+        ).first()
+
+    def get_shipping_method(self, shipping_zone, name, price):
+        return (
+            ShippingMethodModel.objects.filter(
+                shipping_zone=shipping_zone, name__iexact=name, price_amount=price
+            )
+            .order_by("pk")
+            .first()
+        )
+
+
+class PartnerIdempotencyMixin:
+    """Answer a repeated request of a partner with the order of the first one.
+
+    Requests are identified by a key within `idempotency_scope`. A repeated
+    key with identical input returns the order without applying the request
+    again; a repeated key with different input is rejected.
+    """
+
+    idempotency_scope = None
+    idempotency_error_field = "idempotency_key"
+
+    @classmethod
+    def get_partner(cls, info):
+        if info.context.app:
+            return get_app_partner(info.context.app)
+        return None
+
+    @classmethod
+    def get_request_idempotency_key(cls, info, data):
+        raise NotImplementedError()
+
+    @classmethod
+    def get_idempotency(cls, info, data):
+        """Return the (partner, key, request hash) of the request, if keyed."""
+        partner = cls.get_partner(info)
+        key = cls.get_request_idempotency_key(info, data)
+        if partner is None or not key:
+            return None
+        return partner, key, get_request_hash(data)
+
+    @classmethod
+    def replay(cls, idempotency):
+        partner, key, request_hash = idempotency
+        record = get_idempotency_records(
+            partner, cls.idempotency_scope, [key]
+        ).get(key)
+        if record is None:
+            return None
+        if record.request_hash != request_hash:
+            raise ValidationError(
+                {
+                    cls.idempotency_error_field: ValidationError(
+                        "The key was already used for a request with different input.",
+                        code=OrderErrorCode.UNIQUE,
+                    )
+                }
+            )
+        return cls.success_response(record.order)
+
+    @classmethod
+    def record_idempotency(cls, instance, cleaned_input):
+        idempotency = cleaned_input.get("idempotency")
+        if idempotency is None:
+            return
+        partner, key, request_hash = idempotency
+        create_idempotency_records(
+            partner, cls.idempotency_scope, [(key, request_hash, instance)]
+        )
+
+    @classmethod
+    def perform_mutation(cls, _root, info, **data):
+        idempotency = cls.get_idempotency(info, data["input"])
+        if idempotency is None:
+            return super().perform_mutation(_root, info, **data)
+        response = cls.replay(idempotency)
+        if response is not None:
+            return response
+        try:
+            return super().perform_mutation(_root, info, **data)
+        except IntegrityError:
+            # A concurrent request with the same key committed first. Orders
+            # are created under their partner order ID, which is also unique
+            # per partner on the orders themselves.
+            response = cls.replay(idempotency)
+            if response is None:
+                raise
+            return response
+
+
+class CreateNewOrder(PartnerIdempotencyMixin, ModelMutation, I18nMixin):
     class Arguments:
         input = CreateNewOrderInput(
             required=True, description="Fields required to create an order from partner."
@@ -740,15 +847,50 @@ class CreateNewOrder(ModelMutation, I18nMixin):
         error_type_field = "order_errors"
         exclude = ['order_receipt']
 
+    idempotency_scope = OrderIdempotencyScope.CREATE
+    idempotency_error_field = "partner_order_id"
+
+    @classmethod
+    def get_request_idempotency_key(cls, info, data):
+        return data.get("partner_order_id")
+
+    @classmethod
+    def replay(cls, idempotency):
+        response = super().replay(idempotency)
+        partner, partner_order_id, _request_hash = idempotency
+        if response is None and models.Order.objects.filter(
+            partner=partner, partner_order_id=partner_order_id
+        ).exists():
+            # Orders created before keys were recorded can't be compared.
+            raise ValidationError(
+                {
+                    "partner_order_id": ValidationError(
+                        "Order with this partner order ID already exists.",
+                        code=OrderErrorCode.UNIQUE,
+                    )
+                }
+            )
+        return response
+
     @classmethod
     def clean_input(cls, info, instance, data):
+        # The hash is taken before cleaning pops the fields of the input.
+        idempotency = cls.get_idempotency(info, data)
+        cleaned_input = cls.clean_order_input(
+            info, instance, data, PartnerOrderLookups(cls.get_partner(info))
+        )
+        cleaned_input["idempotency"] = idempotency
+        return cleaned_input
+
+    @classmethod
+    def clean_order_input(cls, info, instance, data, lookups):
         cleaned_input = {}
         cleaned_lines = []
 
         user_email = data.pop("user_email", None)
         user_phone = data.pop("user_phone", None)
 
-        user = User.objects.filter(Q(email=user_email) | Q(phone=user_phone)).first()
+        user = lookups.get_user(user_email, user_phone)
         if user is None:
             raise ValidationError(
                 {
@@ -760,8 +902,7 @@ class CreateNewOrder(ModelMutation, I18nMixin):
             )
         cleaned_input["user"] = user
 
-        if info.context.app:
-            partner = PartnerModel.objects.filter(partner_app=info.context.app).first()
+        partner = lookups.partner
         if not partner:
             raise ValidationError(
                 {
@@ -948,11 +1089,8 @@ class CreateNewOrder(ModelMutation, I18nMixin):
                 }
             )
 
-        warehouse = WarehouseModel.objects.filter(name="Bangladesh").first()
-        cleaned_input["warehouse"] = warehouse
-
-        shipping_zone = ShippingZoneModel.objects.filter(name="Bangladesh").first()
-        cleaned_input["shipping_zone"] = shipping_zone
+        cleaned_input["warehouse"] = lookups.get_warehouse()
+        cleaned_input["shipping_zone"] = lookups.get_shipping_zone()
 
         shipping = data.pop("shipping", None)
         if shipping is not None and \
@@ -966,14 +1104,16 @@ class CreateNewOrder(ModelMutation, I18nMixin):
                 }
             )
 
+        # Shipping methods are shared by the orders with the same zone, name
+        # and price.
         if shipping is None:
-            existing_shipping_method = ShippingMethodModel.objects.filter(
-                Q(name__iexact="Default Shipping") & Q(price_amount=0)
-            ).first()
+            existing_shipping_method = lookups.get_shipping_method(
+                cleaned_input["shipping_zone"], DEFAULT_SHIPPING_METHOD_NAME, 0
+            )
         else:
-            existing_shipping_method = ShippingMethodModel.objects.filter(
-                Q(name__iexact=shipping["name"]) & Q(price_amount=shipping["price"])
-            ).first()
+            existing_shipping_method = lookups.get_shipping_method(
+                cleaned_input["shipping_zone"], shipping["name"], shipping["price"]
+            )
 
         cleaned_input["existing_shipping_method"] = existing_shipping_method
         cleaned_input["shipping"] = shipping
@@ -1096,6 +1236,10 @@ class CreateNewOrder(ModelMutation, I18nMixin):
             if cleaned_input["existing_shipping_method"] is not None:
                 shipping_method = cleaned_input["existing_shipping_method"]
             else:
+                shipping = shipping or {
+                    "name": DEFAULT_SHIPPING_METHOD_NAME,
+                    "price": 0,
+                }
                 shipping_method = ShippingMethodModel(
                     name=shipping["name"],
                     type="price",
@@ -1109,15 +1253,7 @@ class CreateNewOrder(ModelMutation, I18nMixin):
 
             discount = cleaned_input["discount"]
             if discount is not None:
-                voucher = VoucherModel(
-                    type="entire_order",
-                    code=generate_promo_code(),
-                    name=discount.get("name", "") + "-" + discount.get("code", ""),
-                    discount_value=discount["discount_value"],
-                    discount_value_type=discount["discount_value_type"]
-                )
-                voucher.save()
-                instance.voucher = voucher
+                instance.discount_name = get_discount_name(discount)
 
             other_charge = cleaned_input["other_charge"]
             if other_charge:
@@ -1125,113 +1261,32 @@ class CreateNewOrder(ModelMutation, I18nMixin):
                 instance.other_charge_amount = other_charge["amount"]
 
             super().save(info, instance, cleaned_input)
-
-            order_lines = []
-            for item in lines:
-                _sku = partner.partner_id + '-' + item.get("sku")
-                product_variant = ProductVariantModel.objects.filter(sku=_sku).first()
-
-                if product_variant:
-                    product_id = product_variant.product_id
-                    product = ProductModel.objects.get(pk=product_id)
-                else:
-                    product = ProductModel()
-
-                category = item.get("category")
-                category_object = CategoryModel.objects.filter(
-                    Q(name__iexact=category) | Q(slug__iexact=category)
-                ).first()
-                if category_object is None:
-                    category_object = CategoryModel(name=category, slug=slugify(category))
-                    category_object.save()
-
-                product.name = item.get("name")
-                product.slug = item.get("name") + '-' + _sku
-                product.description = item.get("description")
-                product.price_amount = item.get("base_price")
-                product.category_id = category_object.id
-                product.product_type_id = ProductTypeModel.objects.first().id
-                product.partner = partner
-                product.is_published = True
-                product.save()
-
-                if product_variant is None:
-                    product_variant = ProductVariantModel(product=product, sku=_sku)
-
-                product_variant.name = item.get("name")
-                product_variant.price_override_amount = item.get("base_price")
-                product_variant.track_inventory = True
-                product_variant.weight = item.get("weight")
-                meta_data_items = {data.key: data.value for data in item.get("meta_data")}
-                product_variant.metadata = meta_data_items
-                product_variant.save()
-
-                stock = StockModel.objects.filter(
-                    product_variant=product_variant,
-                    warehouse=cleaned_input["warehouse"]
-                ).first()
-
-                if stock is None:
-                    stock = StockModel(
-                        product_variant=product_variant,
-                        warehouse=cleaned_input["warehouse"],
-                        quantity=item.get("quantity")
-                    )
-                else:
-                    stock.quantity = stock.quantity + item.get("quantity")
-
-                stock.save()
-
-                order_line = models.OrderLine(
-                    order=instance,
-                    product_name=product_variant.name,
-                    product_sku=product_variant.sku,
-                    quantity=item.get("quantity"),
-                    variant=product_variant,
-                    unit_price_net_amount=product_variant.price_override_amount,
-                    variant_id=product_variant.id,
-                    variant_name=product_variant.name,
-                    unit_price_gross_amount=product_variant.price_override_amount,
-                    is_shipping_required=True,
-
-                )
-                order_line.save()
-                order_lines.append(order_line)
-
-            order_created(instance, user=instance.user, from_draft=False)
-            recalculate_order(instance)
-
-            payment_status = cleaned_input['payment_status']
-            payment = create_payment(
-                gateway="rstore.payments",
-                customer_ip_address=get_client_ip(info.context),
-                email=instance.user_email,
-                order=instance,
-                payment_token=str(uuid.uuid4()),
-                total=instance.total.gross.amount,
-                currency=instance.total.gross.currency,
+            cls.record_idempotency(instance, cleaned_input)
+            order_discount = build_order_discount(instance, discount)
+            if order_discount is not None:
+                order_discount.save()
+
+            variants = sync_partner_catalog(partner, cleaned_input["warehouse"], lines)
+            models.OrderLine.objects.bulk_create(
+                build_order_lines(partner, instance, lines, variants)
             )
-            gateway.authorize(payment, payment.token)
 
-            if payment_status == ChargeStatus.FULLY_CHARGED:
-                gateway.capture(payment)
-
-            generate_pdf_receipt(instance, order_lines, base_url=getattr(settings, "API_URL"))
-            send_new_order_placement_sms.delay(instance.user.phone, instance.partner_order_id)
+            order_created(instance, user=instance.user, from_draft=False)
+            recalculate_order_with_discount(instance)
 
-            for rule in Rule.objects.filter(is_active=True):
-                if rule.get_latest_rule():
-                    run_all(
-                        rule_list=rule.get_latest_rule().engine_rule,
-                        defined_variables=OrderVariables(instance),
-                        defined_actions=OrderActions(instance),
-                        stop_on_first_trigger=False
+            # Payment, receipt, notification, commission and target progress
+            # are handled by the order pipeline once the order is committed.
+            create_order_pipelines(
+                [
+                    (
+                        instance,
+                        cleaned_input["payment_status"],
+                        get_client_ip(info.context),
                     )
-
-        month = datetime.today().strftime('%Y-%m') + '-01'
-        add_general_achievement.delay(month, instance.pk, instance.user_id)
-        calculate_partner_target_progress.delay(instance.pk)
-        calculate_attribute_target_progress.delay(instance.pk)
+                ],
+                done_stages=[OrderPipelineStageName.TOTALS],
+            )
+            schedule_order_pipelines([instance.pk])
 
 
 class UpdateOrderInput(InputObjectType):
@@ -1242,6 +1297,15 @@ class UpdateOrderInput(InputObjectType):
         ),
         required=True
     )
+    idempotency_key = graphene.String(
+        description=(
+            "Unique key of the update. This field is optional, "
+            "the Idempotency-Key header is used if it's not provided.\n"
+            "Retrying an update with the same key and input returns the order "
+            "without applying the update again."
+        ),
+        required=False
+    )
     payment_status = PaymentChargeStatusEnum(
         description=(
             "Status of the order's payment. This field is required if orderStatus is not provided.\n"
@@ -1259,7 +1323,7 @@ class UpdateOrderInput(InputObjectType):
     )
 
 
-class UpdateOrder(ModelMutation):
+class UpdateOrder(PartnerIdempotencyMixin, ModelMutation):
     class Arguments:
         input = UpdateOrderInput(
             required=True, description="Fields required to update status or payment status of an order."
@@ -1273,19 +1337,38 @@ class UpdateOrder(ModelMutation):
         error_type_field = "order_errors"
         exclude = ['order_receipt']
 
+    idempotency_scope = OrderIdempotencyScope.UPDATE
+
     @classmethod
-    def get_instance(cls, info, **data):
-        partner = None
-        if info.context.app:
-            partner = PartnerModel.objects.filter(partner_app=info.context.app).first()
+    def get_request_idempotency_key(cls, info, data):
+        return get_idempotency_key(info.context, data.get("idempotency_key"))
 
+    @classmethod
+    def get_instance(cls, info, **data):
+        partner = cls.get_partner(info)
         partner_order_id = data["input"]["partner_order_id"]
-        instance = models.Order.objects.filter(Q(partner=partner) & Q(partner_order_id=partner_order_id)).first()
-        return instance
+        try:
+            return models.Order.objects.get(
+                partner=partner, partner_order_id=partner_order_id
+            )
+        except models.Order.DoesNotExist:
+            raise ValidationError(
+                {
+                    "partner_order_id": ValidationError(
+                        "Could not find order with given information.",
+                        code=OrderErrorCode.NOT_FOUND,
+                    )
+                }
+            )
 
     @classmethod
     def clean_input(cls, info, instance, data):
+        cleaned_input = {"idempotency": cls.get_idempotency(info, data)}
+        cleaned_input.update(cls.clean_statuses(instance, data))
+        return cleaned_input
 
+    @classmethod
+    def clean_statuses(cls, instance, data):
         cleaned_input = {}
         order_status = data.pop("order_status", None)
         payment_status = data.pop("payment_status", None)
@@ -1347,129 +1430,20 @@ class UpdateOrder(ModelMutation):
 
     @classmethod
     def save(cls, info, instance, cleaned_input):
-        user = info.context.user
-        notify_customer = False
-        existing_order_status = instance.status
-        order_status = cleaned_input['order_status']
-        payment_status = cleaned_input['payment_status']
-        payment = PaymentModel.objects.filter(order=instance).first()
-
-        order_lines = models.OrderLine.objects.filter(order=instance)
-        warehouse = WarehouseModel.objects.first()
-        lines_for_warehouses = defaultdict(list)
-
-        for order_line in order_lines:
-            lines_for_warehouses[warehouse.id].append(
-                {"order_line": order_line, "quantity": order_line.quantity}
-            )
-
-        if order_status == OrderStatusFilter.FULFILLED.value:
-            if existing_order_status == OrderStatusFilter.UNFULFILLED.value:
-                create_fulfillments(
-                    user, instance, dict(lines_for_warehouses), notify_customer
-                )
-            elif existing_order_status == OrderStatusFilter.FULFILLED.value:
-                pass
-            else:
-                raise ValidationError(
-                    {
-                        "order_status": ValidationError(
-                            "Canceled order can not be fulfilled.",
-                            code=OrderErrorCode.INVALID,
-                        )
-                    }
-                )
-
-        if order_status == OrderStatusFilter.UNFULFILLED.value:
-            if existing_order_status == OrderStatusFilter.FULFILLED.value:
-                fulfillments = models.Fulfillment.objects.filter(order=instance)
-                for fulfillment in fulfillments:
-                    cancel_fulfillment(fulfillment, user, warehouse)
-                instance.status = order_status
-            elif existing_order_status == OrderStatusFilter.UNFULFILLED.value:
-                pass
-            else:
-                raise ValidationError(
-                    {
-                        "order_status": ValidationError(
-                            "Canceled order can not be unfulfilled.",
-                            code=OrderErrorCode.INVALID,
-                        )
-                    }
-                )
-
-        if order_status == OrderStatusFilter.CANCELED.value:
-            if existing_order_status == OrderStatusFilter.UNFULFILLED.value:
-                cancel_order(instance, user)
-                remove_general_achievement.delay(instance.pk)
-                remove_attribute_achievement.delay(instance.pk)
-                remove_partner_achievement.delay(instance.pk)
-            elif existing_order_status == OrderStatusFilter.CANCELED.value:
-                pass
-            else:
-                fulfillments = models.Fulfillment.objects.filter(order=instance)
-                for fulfillment in fulfillments:
-                    cancel_fulfillment(fulfillment, user, warehouse)
-                cancel_order(instance, user)
-                remove_general_achievement.delay(instance.pk)
-                remove_attribute_achievement.delay(instance.pk)
-                remove_partner_achievement.delay(instance.pk)
-
-        if payment_status == ChargeStatus.FULLY_REFUNDED:
-            if payment and payment.charge_status == ChargeStatus.FULLY_CHARGED:
-                gateway.refund(payment)
-            elif payment and payment.charge_status == ChargeStatus.FULLY_REFUNDED:
-                pass
-            else:
-                raise ValidationError(
-                    {
-                        "payment_status": ValidationError(
-                            "An unpaid order can not be refunded.",
-                            code=OrderErrorCode.CANNOT_REFUND,
-                        )
-                    }
-                )
-
-        if payment_status == ChargeStatus.FULLY_CHARGED:
-            if payment and payment.charge_status == ChargeStatus.NOT_CHARGED:
-                gateway.capture(payment)
-            elif payment and payment.charge_status == ChargeStatus.FULLY_CHARGED:
-                pass
-            else:
-                raise ValidationError(
-                    {
-                        "payment_status": ValidationError(
-                            "A refunded order can not be paid again.",
-                            code=OrderErrorCode.PAYMENT_ERROR,
-                        )
-                    }
-                )
-
-        if payment_status == ChargeStatus.NOT_CHARGED:
-            if payment is None:
-                payment = create_payment(
-                    gateway="rstore.payments",
-                    customer_ip_address=get_client_ip(info.context),
-                    email=instance.user_email,
-                    order=instance,
-                    payment_token=str(uuid.uuid4()),
-                    total=instance.total.gross.amount,
-                    currency=instance.total.gross.currency,
-                )
-                gateway.authorize(payment, payment.token)
-            elif payment and payment.charge_status == ChargeStatus.NOT_CHARGED:
-                pass
-            else:
-                raise ValidationError(
-                    {
-                        "payment_status": ValidationError(
-                            "A paid or refunded order can not be undone.",
-                            code=OrderErrorCode.PAYMENT_ERROR,
-                        )
-                    }
-                )
+        with transaction.atomic():
+            cls.record_idempotency(instance, cleaned_input)
+            cls.update_order(info, instance, cleaned_input)
 
-        instance.save()
-        generate_pdf_receipt(instance, order_lines, base_url=getattr(settings, "API_URL"))
-        if order_status is not None:
-            update_order_sms.delay(instance.user.phone, instance.partner_order_id, order_status)
+    @classmethod
+    def update_order(cls, info, instance, cleaned_input):
+        transition = OrderStatusTransition(
+            order_status=cleaned_input["order_status"],
+            payment_status=cleaned_input["payment_status"],
+            user=info.context.user,
+            warehouse=PartnerOrderLookups(instance.partner).get_warehouse(),
+            customer_ip_address=get_client_ip(info.context),
+        )
+        errors = transition.run([instance.pk])
+        if instance.pk in errors:
+            raise errors[instance.pk]
+        instance.refresh_from_db()
@@ -0,0 +1,175 @@
+from datetime import timedelta
+from typing import Iterable, List, Tuple
+
+from decouple import config
+from django.contrib.postgres.fields import JSONField
+from django.db import models, transaction
+from django.utils import timezone
+
+from .models import Order
+
+ORDER_PIPELINE_MAX_ATTEMPTS = config(
+    "ORDER_PIPELINE_MAX_ATTEMPTS", default=10, cast=int
+)
+# Unfinished stages untouched for this long are picked up again by the
+# periodic resume task, e.g. when their task was lost by the broker.
+ORDER_PIPELINE_RESUME_AFTER = config(
+    "ORDER_PIPELINE_RESUME_AFTER", default=60 * 10, cast=int
+)
+ORDER_PIPELINE_RESUME_BATCH_SIZE = 500
+
+
+class OrderPipelineStageName:
+    TOTALS = "totals"
+    PAYMENT = "payment"
+    RECEIPT = "receipt"
+    NOTIFICATION = "notification"
+    COMMISSION = "commission"
+    TARGETS = "targets"
+    ACHIEVEMENTS = "achievements"
+
+    # Stages of an order run in this order.
+    ORDERED = [
+        TOTALS,
+        PAYMENT,
+        RECEIPT,
+        NOTIFICATION,
+        COMMISSION,
+        TARGETS,
+        ACHIEVEMENTS,
+    ]
+    # A failure of these stages doesn't hold back the stages after them.
+    NON_BLOCKING = [RECEIPT, NOTIFICATION]
+
+    CHOICES = [
+        (TOTALS, "Order event and totals"),
+        (PAYMENT, "Payment"),
+        (RECEIPT, "Receipt"),
+        (NOTIFICATION, "Notification"),
+        (COMMISSION, "Commission"),
+        (TARGETS, "Target progress"),
+        (ACHIEVEMENTS, "Achievements"),
+    ]
+
+
+class OrderPipelineStatus:
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
+    CHOICES = [(PENDING, "Pending"), (DONE, "Done"), (FAILED, "Failed")]
+
+
+class OrderProcessingStatus:
+    PENDING = "pending"
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    CHOICES = [
+        (PENDING, "Pending"),
+        (PROCESSING, "Processing"),
+        (COMPLETED, "Completed"),
+        (FAILED, "Failed"),
+    ]
+
+
+class OrderPipelineStage(models.Model):
+    order = models.ForeignKey(
+        Order, related_name="pipeline_stages", on_delete=models.CASCADE
+    )
+    stage = models.CharField(max_length=32, choices=OrderPipelineStageName.CHOICES)
+    status = models.CharField(
+        max_length=32,
+        choices=OrderPipelineStatus.CHOICES,
+        default=OrderPipelineStatus.PENDING,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    payload = JSONField(blank=True, default=dict)
+    created = models.DateTimeField(auto_now_add=True, editable=False)
+    updated = models.DateTimeField(auto_now=True, editable=False)
+
+    class Meta:
+        app_label = "order"
+        ordering = ("pk",)
+        unique_together = (("order", "stage"),)
+        indexes = [models.Index(fields=["status", "updated"])]
+
+
+def create_order_pipelines(
+    orders: Iterable[Tuple[Order, str, str]],
+    done_stages: Iterable[str] = (),
+):
+    """Create the stages of orders given as (order, charge status, client IP)."""
+    stages = []
+    for order, charge_status, customer_ip_address in orders:
+        for stage in OrderPipelineStageName.ORDERED:
+            payload = {}
+            if stage == OrderPipelineStageName.PAYMENT:
+                payload = {
+                    "charge_status": charge_status,
+                    "customer_ip_address": customer_ip_address,
+                }
+            status = OrderPipelineStatus.PENDING
+            if stage in done_stages:
+                status = OrderPipelineStatus.DONE
+            stages.append(
+                OrderPipelineStage(
+                    order=order, stage=stage, status=status, payload=payload
+                )
+            )
+    OrderPipelineStage.objects.bulk_create(stages, ignore_conflicts=True)
+
+
+def schedule_order_pipelines(order_ids: List[int]):
+    """Run the pipelines of the orders once the current transaction commits."""
+    from .tasks import run_order_pipelines_task
+
+    transaction.on_commit(lambda: run_order_pipelines_task.delay(order_ids))
+
+
+def get_order_processing_status(stages: List[OrderPipelineStage]) -> str:
+    statuses = {stage.status for stage in stages}
+    if OrderPipelineStatus.FAILED in statuses:
+        return OrderProcessingStatus.FAILED
+    if OrderPipelineStatus.PENDING not in statuses:
+        # Orders created before the pipeline existed were processed inline.
+        return OrderProcessingStatus.COMPLETED
+    if OrderPipelineStatus.DONE in statuses:
+        return OrderProcessingStatus.PROCESSING
+    return OrderProcessingStatus.PENDING
+
+
+def is_stage_exhausted(stage: OrderPipelineStage) -> bool:
+    return (
+        stage.status != OrderPipelineStatus.DONE
+        and stage.attempts >= ORDER_PIPELINE_MAX_ATTEMPTS
+    )
+
+
+def get_unfinished_order_ids() -> List[int]:
+    """Return orders with stages left to run, skipping the abandoned ones.
+
+    An order is abandoned once one of its blocking stages has failed
+    ORDER_PIPELINE_MAX_ATTEMPTS times, as the stages after it can't run.
+    """
+    updated_before = timezone.now() - timedelta(seconds=ORDER_PIPELINE_RESUME_AFTER)
+    abandoned_order_ids = (
+        OrderPipelineStage.objects.exclude(status=OrderPipelineStatus.DONE)
+        .exclude(stage__in=OrderPipelineStageName.NON_BLOCKING)
+        .filter(attempts__gte=ORDER_PIPELINE_MAX_ATTEMPTS)
+        .values("order_id")
+    )
+    order_ids = (
+        OrderPipelineStage.objects.filter(
+            status__in=[OrderPipelineStatus.PENDING, OrderPipelineStatus.FAILED],
+            updated__lt=updated_before,
+            attempts__lt=ORDER_PIPELINE_MAX_ATTEMPTS,
+        )
+        .exclude(order_id__in=abandoned_order_ids)
+        .order_by("order_id")
+        .values_list("order_id", flat=True)
+        .distinct()
+    )
+    return list(order_ids[:ORDER_PIPELINE_RESUME_BATCH_SIZE])
@@ -0,0 +1,119 @@
+import hashlib
+import json
+from typing import List, Optional
+
+from decouple import config
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Q
+
+from ..payment.models import Payment
+from . import OrderEvents
+from .actions import generate_pdf_receipt
+from .models import Order, OrderLine
+
+RECEIPT_RENDER_QUEUE = config("RECEIPT_RENDER_QUEUE", default="receipts")
+# When disabled, receipts are only rendered, in the receipt queue, when they're
+# requested.
+RECEIPT_PRERENDER = config("RECEIPT_PRERENDER", default=True, cast=bool)
+RECEIPT_HASH_KEY = "receipt_hash"
+
+
+def _get_address_data(address) -> Optional[dict]:
+    return address.as_data() if address else None
+
+
+def get_receipt_content_hash(
+    order: Order, lines: List[OrderLine], payments: List[Payment], note_count: int
+) -> str:
+    """Return the hash of the data printed on the receipt of the order.
+
+    The addresses are read from the order, so they should be selected with it.
+    """
+    data = {
+        "order": [
+            order.status,
+            order.partner_order_id,
+            order.user_email,
+            order.customer_note,
+            order.shipping_method_name,
+            order.shipping_price_gross_amount,
+            order.total_net_amount,
+            order.total_gross_amount,
+            order.discount_amount,
+            order.discount_name,
+            order.other_charge_name,
+            order.other_charge_amount,
+            order.voucher_id,
+            note_count,
+        ],
+        "shipping_address": _get_address_data(order.shipping_address),
+        "billing_address": _get_address_data(order.billing_address),
+        "lines": [
+            [
+                line.pk,
+                line.product_name,
+                line.variant_name,
+                line.product_sku,
+                line.quantity,
+                line.quantity_fulfilled,
+                line.unit_price_net_amount,
+                line.unit_price_gross_amount,
+            ]
+            for line in sorted(lines, key=lambda line: line.pk)
+        ],
+        "payments": [
+            [payment.pk, payment.charge_status, payment.captured_amount]
+            for payment in sorted(payments, key=lambda payment: payment.pk)
+        ],
+    }
+    content = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def get_receipt_orders(order_ids: List[int]):
+    """Return the orders with everything their receipt content hash needs."""
+    return (
+        Order.objects.filter(pk__in=order_ids)
+        .select_related("shipping_address", "billing_address")
+        .prefetch_related("lines", "payments")
+        .annotate(
+            note_count=Count("events", filter=Q(events__type=OrderEvents.NOTE_ADDED))
+        )
+    )
+
+
+def render_receipt(order: Order, force: bool = False) -> bool:
+    """Render the receipt unless the current one has identical content.
+
+    The order is expected to come from `get_receipt_orders`. Returns whether
+    the receipt was rendered.
+    """
+    lines = list(order.lines.all())
+    payments = list(order.payments.all())
+    content_hash = get_receipt_content_hash(order, lines, payments, order.note_count)
+    if (
+        not force
+        and order.order_receipt_id
+        and order.get_value_from_private_metadata(RECEIPT_HASH_KEY) == content_hash
+    ):
+        return False
+    generate_pdf_receipt(order, lines, base_url=getattr(settings, "API_URL"))
+    order.store_value_in_private_metadata({RECEIPT_HASH_KEY: content_hash})
+    order.save(update_fields=["private_metadata"])
+    return True
+
+
+def schedule_receipt_render(order: Order, requested: bool = False):
+    """Render the receipt in the receipt queue once the transaction commits.
+
+    Unless the receipt is `requested` by a client, nothing is scheduled with
+    prerendering disabled.
+    """
+    from .tasks import render_receipts_task
+
+    if not RECEIPT_PRERENDER and not requested:
+        return
+    order_id = order.pk
+    transaction.on_commit(lambda: render_receipts_task.delay([order_id]))
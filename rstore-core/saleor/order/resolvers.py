@@ -1,9 +1,12 @@
 import graphene
+from django.db.models import Subquery
 
+from ...account.scope import get_requester_scope
 from ...order import OrderStatus, models
 from ...order.events import OrderEvents
 from ...order.models import OrderEvent
-from ...order.utils import sum_order_totals
+from ...order.totals import get_order_totals
+from ..utils import reporting_period_to_date
 from ..utils.filters import filter_by_period
 from .enums import OrderStatusFilter
 from .types import Order
@@ -29,21 +32,20 @@ def filter_orders(qs, info, created, status):
 
 
 def resolve_orders(info, created, status, **_kwargs):
-    children_list = info.context.user.get_children()
+    children_list = get_requester_scope(info.context).get_children()
     qs = models.Order.objects.confirmed().filter(user_id__in=children_list)
     return filter_orders(qs, info, created, status)
 
 
 def resolve_draft_orders(info, created, **_kwargs):
-    children_list = info.context.user.get_children()
+    children_list = get_requester_scope(info.context).get_children()
     qs = models.Order.objects.drafts().filter(user_id__in=children_list)
     return filter_orders(qs, info, created, None)
 
 
 def resolve_orders_total(_info, period):
-    qs = models.Order.objects.confirmed().exclude(status=OrderStatus.CANCELED)
-    qs = filter_by_period(qs, period, "created")
-    return sum_order_totals(qs)
+    # Periods start at midnight UTC, so they're whole days of the rollup.
+    return get_order_totals(start_date=reporting_period_to_date(period).date())
 
 
 def resolve_order(info, order_id):
@@ -62,17 +64,15 @@ def resolve_homepage_events(info):
         OrderEvents.FULFILLMENT_CANCELED,
         OrderEvents.FULFILLMENT_FULFILLED_ITEMS,
     ]
-    children_list = info.context.user.get_children()
-    qs = OrderEvent.objects.filter(type__in=types, order__user_id__in=children_list).order_by('-created')
-    valid_order_event_ids = []
-    used = {}
-
-    for item in qs:
-        if item.order_id not in used.keys():
-            used[item.order_id] = item.order_id
-            valid_order_event_ids.append(item.id)
-
-    return qs.filter(id__in=valid_order_event_ids)
+    children_list = get_requester_scope(info.context).get_children()
+    qs = OrderEvent.objects.filter(type__in=types, order__user_id__in=children_list)
+    # Only the latest event of each order.
+    latest_events = (
+        qs.order_by("order_id", "-created", "-pk")
+        .distinct("order_id")
+        .values("id")
+    )
+    return qs.filter(id__in=Subquery(latest_events)).order_by('-created')
 
 
 def resolve_order_by_token(token):
@@ -0,0 +1,250 @@
+import logging
+import uuid
+from typing import List
+
+from business_rules import run_all
+from decouple import config
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from ..celeryconf import app
+from ..commission.commission_calculation import OrderActions, OrderVariables
+from ..commission.models import Commission, Rule
+from ..payment import ChargeStatus, gateway
+from ..payment.utils import create_payment
+from . import OrderStatus
+from .achievement_calculations import (
+    add_general_achievement,
+    calculate_attribute_target_progress,
+    calculate_partner_target_progress,
+    remove_attribute_achievement,
+    remove_general_achievement,
+    remove_partner_achievement,
+)
+from .actions import order_created
+from .discounts import recalculate_order_with_discount
+from .models import Order
+from .pipeline import (
+    ORDER_PIPELINE_MAX_ATTEMPTS,
+    OrderPipelineStageName,
+    OrderPipelineStatus,
+    get_unfinished_order_ids,
+    is_stage_exhausted,
+)
+from .receipts import (
+    RECEIPT_PRERENDER,
+    RECEIPT_RENDER_QUEUE,
+    get_receipt_orders,
+    render_receipt,
+    schedule_receipt_render,
+)
+from .sms import send_new_order_placement_sms, update_order_sms
+from .totals import reconcile_order_totals, refresh_order_totals
+
+logger = logging.getLogger(__name__)
+
+ORDER_PIPELINE_MAX_RETRIES = config("ORDER_PIPELINE_MAX_RETRIES", default=5, cast=int)
+ORDER_PIPELINE_RETRY_DELAY = config("ORDER_PIPELINE_RETRY_DELAY", default=30, cast=int)
+
+
+class OrderPipeline:
+    """Run the unfinished stages of orders, one stage per transaction.
+
+    A stage row is locked while it runs and marked as done in the same
+    transaction as its side effects, so a stage is never completed twice. A
+    failed blocking stage stops the pipeline of its order until the next
+    attempt.
+    """
+
+    @cached_property
+    def engine_rules(self) -> list:
+        engine_rules = []
+        for rule in Rule.objects.filter(is_active=True):
+            latest_rule = rule.get_latest_rule()
+            if latest_rule:
+                engine_rules.append(latest_rule.engine_rule)
+        return engine_rules
+
+    def run(self, order_ids: List[int]) -> List[int]:
+        """Run the pipelines of the orders and return the IDs of failed ones."""
+        failed_order_ids = []
+        for order in Order.objects.filter(pk__in=order_ids).select_related("user"):
+            if not self.run_order(order):
+                failed_order_ids.append(order.pk)
+        try:
+            refresh_order_totals(order_ids)
+        except Exception:
+            # The nightly reconciliation catches up with the totals.
+            logger.exception("Refreshing the totals of orders %s failed.", order_ids)
+        return failed_order_ids
+
+    def run_order(self, order: Order) -> bool:
+        """Run the unfinished stages of the order and return False to retry it.
+
+        Stages that failed ORDER_PIPELINE_MAX_ATTEMPTS times aren't run again.
+        An exhausted blocking stage abandons the rest of the pipeline, while
+        a failed non-blocking one, like the notification, is skipped.
+        """
+        stages = {
+            stage.stage: stage
+            for stage in order.pipeline_stages.exclude(status=OrderPipelineStatus.DONE)
+        }
+        failed = False
+        for stage_name in OrderPipelineStageName.ORDERED:
+            if stage_name not in stages:
+                continue
+            blocking = stage_name not in OrderPipelineStageName.NON_BLOCKING
+            if is_stage_exhausted(stages[stage_name]):
+                if blocking:
+                    logger.warning(
+                        "Pipeline of order %s abandoned at stage %s.",
+                        order.pk,
+                        stage_name,
+                    )
+                    return True
+                continue
+            try:
+                with transaction.atomic():
+                    stage = (
+                        order.pipeline_stages.select_for_update(skip_locked=True)
+                        .filter(
+                            stage=stage_name,
+                            attempts__lt=ORDER_PIPELINE_MAX_ATTEMPTS,
+                        )
+                        .exclude(status=OrderPipelineStatus.DONE)
+                        .first()
+                    )
+                    if stage is None:
+                        # Another worker is running the stage or has just
+                        # finished it; leave the rest of the pipeline to it.
+                        return not failed
+                    getattr(self, f"run_{stage_name}")(order, stage.payload)
+                    stage.status = OrderPipelineStatus.DONE
+                    stage.attempts += 1
+                    stage.error = ""
+                    stage.save(update_fields=["status", "attempts", "error", "updated"])
+            except Exception as e:
+                logger.exception(
+                    "Stage %s of order %s failed.", stage_name, order.pk
+                )
+                order.pipeline_stages.filter(stage=stage_name).update(
+                    status=OrderPipelineStatus.FAILED,
+                    attempts=F("attempts") + 1,
+                    error=str(e),
+                    updated=timezone.now(),
+                )
+                if blocking:
+                    return False
+                failed = True
+        return not failed
+
+    def run_totals(self, order: Order, _payload):
+        order_created(order, user=order.user, from_draft=False)
+        recalculate_order_with_discount(order)
+
+    def run_payment(self, order: Order, payload):
+        payment = order.get_last_payment()
+        if payment is None:
+            payment = create_payment(
+                gateway="rstore.payments",
+                customer_ip_address=payload.get("customer_ip_address"),
+                email=order.user_email,
+                order=order,
+                payment_token=str(uuid.uuid4()),
+                total=order.total.gross.amount,
+                currency=order.total.gross.currency,
+            )
+            gateway.authorize(payment, payment.token)
+        if (
+            payload.get("charge_status") == ChargeStatus.FULLY_CHARGED
+            and payment.charge_status == ChargeStatus.NOT_CHARGED
+        ):
+            gateway.capture(payment)
+
+    def run_receipt(self, order: Order, _payload):
+        # Rendering is left to the low-priority receipt queue.
+        schedule_receipt_render(order)
+
+    def run_notification(self, order: Order, _payload):
+        send_new_order_placement_sms(order.user.phone, order.partner_order_id)
+
+    def run_commission(self, order: Order, _payload):
+        Commission.objects.filter(order=order).delete()
+        for engine_rule in self.engine_rules:
+            run_all(
+                rule_list=engine_rule,
+                defined_variables=OrderVariables(order),
+                defined_actions=OrderActions(order),
+                stop_on_first_trigger=False,
+            )
+
+    def run_targets(self, order: Order, _payload):
+        # Canceling an order removes its progress, so it must not be added
+        # back by a stage running late.
+        if order.status == OrderStatus.CANCELED:
+            return
+        calculate_partner_target_progress(order.pk)
+        calculate_attribute_target_progress(order.pk)
+
+    def run_achievements(self, order: Order, _payload):
+        if order.status == OrderStatus.CANCELED:
+            return
+        month = timezone.localtime(order.created).strftime("%Y-%m") + "-01"
+        add_general_achievement(month, order.pk, order.user_id)
+
+
+@app.task(bind=True, max_retries=ORDER_PIPELINE_MAX_RETRIES)
+def run_order_pipelines_task(self, order_ids):
+    failed_order_ids = OrderPipeline().run(order_ids)
+    if failed_order_ids:
+        raise self.retry(
+            args=(failed_order_ids,),
+            countdown=ORDER_PIPELINE_RETRY_DELAY * 2 ** self.request.retries,
+        )
+
+
+@app.task
+def resume_order_pipelines_task():
+    order_ids = get_unfinished_order_ids()
+    if order_ids:
+        run_order_pipelines_task.delay(order_ids)
+
+
+@app.task(queue=RECEIPT_RENDER_QUEUE)
+def render_receipts_task(order_ids, force=False):
+    for order in get_receipt_orders(order_ids):
+        render_receipt(order, force=force)
+
+
+@app.task
+def order_status_changed_task(
+    order_ids, order_status, status_changed_order_ids, canceled_order_ids
+):
+    """Run the side effects of an order status transition of many orders."""
+    refresh_order_totals(status_changed_order_ids)
+    if RECEIPT_PRERENDER:
+        render_receipts_task.delay(order_ids)
+    for order_id in canceled_order_ids:
+        remove_general_achievement(order_id)
+        remove_attribute_achievement(order_id)
+        remove_partner_achievement(order_id)
+    orders = Order.objects.filter(pk__in=status_changed_order_ids).select_related(
+        "user"
+    )
+    for order in orders:
+        try:
+            update_order_sms(order.user.phone, order.partner_order_id, order_status)
+        except Exception:
+            logger.exception("Status SMS of order %s failed.", order.pk)
+
+
+@app.task
+def refresh_order_totals_task(order_ids):
+    refresh_order_totals(order_ids)
+
+
+@app.task
+def reconcile_order_totals_task():
+    reconcile_order_totals()
@@ -0,0 +1,106 @@
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from measurement.measures import Weight
+
+from ...payment import ChargeStatus
+from ...product.models import Category, Product
+from .. import OrderStatus
+from ..ingestion import ingest_partner_orders
+
+
+@pytest.fixture
+def category(db):
+    return Category.objects.create(name="Groceries", slug="groceries")
+
+
+def get_cleaned_order(partner, warehouse, customer_user, sku, category_name):
+    partner_order_id = str(uuid4())
+    address = customer_user.default_billing_address
+    return {
+        "existing_shipping_method": None,
+        "shipping": None,
+        "shipping_zone": warehouse.shipping_zones.get(),
+        "order_status": OrderStatus.UNFULFILLED,
+        "user": customer_user,
+        "partner": partner,
+        "partner_order_id": partner_order_id,
+        "shipping_address": address,
+        "billing_address": address,
+        "new_shipping_address": False,
+        "new_billing_address": False,
+        "discount": None,
+        "other_charge": None,
+        "lines": [
+            {
+                "sku": sku,
+                "quantity": 2,
+                "name": f"Product {sku}",
+                "description": "",
+                "base_price": Decimal("10.00"),
+                "category": category_name,
+                "weight": Weight(kg=1),
+                "meta_data": [],
+            }
+        ],
+        "warehouse": warehouse,
+        "idempotency": (partner, partner_order_id, "hash"),
+        "payment_status": ChargeStatus.NOT_CHARGED,
+    }
+
+
+def test_ingest_order_with_new_category(
+    partner, warehouse, customer_user, product_type, category
+):
+    # given
+    cleaned_order = get_cleaned_order(
+        partner, warehouse, customer_user, "rice", "Fresh Food"
+    )
+
+    # when
+    ingest_partner_orders(partner, [cleaned_order])
+
+    # then
+    new_category = Category.objects.get(name="Fresh Food")
+    assert new_category.slug == "fresh-food"
+    assert new_category.level == 0
+    assert (new_category.lft, new_category.rght) == (1, 2)
+    assert new_category.tree_id != category.tree_id
+    product = Product.objects.get(variants__sku=f"{partner.partner_id}-rice")
+    assert product.category == new_category
+
+
+def test_ingest_orders_create_new_category_once(
+    partner, warehouse, customer_user, product_type
+):
+    # given
+    cleaned_orders = [
+        get_cleaned_order(partner, warehouse, customer_user, "rice", "Fresh Food"),
+        get_cleaned_order(partner, warehouse, customer_user, "dal", "fresh food"),
+    ]
+
+    # when
+    ingest_partner_orders(partner, cleaned_orders)
+
+    # then
+    new_category = Category.objects.get()
+    assert new_category.name == "Fresh Food"
+    assert Product.objects.filter(category=new_category).count() == 2
+
+
+def test_ingest_order_with_existing_category_in_other_case(
+    partner, warehouse, customer_user, product_type, category
+):
+    # given
+    cleaned_order = get_cleaned_order(
+        partner, warehouse, customer_user, "rice", "GROCERIES"
+    )
+
+    # when
+    ingest_partner_orders(partner, [cleaned_order])
+
+    # then
+    assert Category.objects.get() == category
+    product = Product.objects.get(variants__sku=f"{partner.partner_id}-rice")
+    assert product.category == category
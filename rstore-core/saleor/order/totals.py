@@ -0,0 +1,210 @@
+from datetime import date, datetime, time, timedelta
+from functools import reduce
+from operator import or_
+from typing import Iterable, List, Optional
+
+import pytz
+from decouple import config
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import TruncDay
+from prices import Money, TaxedMoney
+
+from . import OrderStatus
+from .models import Order
+
+# Days recomputed from the orders by the nightly reconciliation.
+ORDER_TOTALS_RECONCILE_DAYS = config(
+    "ORDER_TOTALS_RECONCILE_DAYS", default=62, cast=int
+)
+
+# Orders in these statuses aren't counted in the totals.
+EXCLUDED_STATUSES = [OrderStatus.DRAFT, OrderStatus.CANCELED]
+
+# Advisory lock held by every refresh in shared mode and by a rebuild
+# exclusively, so a rebuild never interleaves with a refresh.
+ORDER_TOTALS_LOCK = "order-totals"
+
+
+class OrderTotals(models.Model):
+    """Totals of the orders of a user and partner created on a day.
+
+    Days are UTC dates, like the start of the reporting periods. Orders
+    without a user or partner are rolled up with 0 in its place, which keeps
+    the unique key free of NULLs.
+    """
+
+    user_id = models.PositiveIntegerField(default=0)
+    partner_id = models.PositiveIntegerField(default=0)
+    day = models.DateField()
+    status = models.CharField(max_length=32)
+    order_count = models.PositiveIntegerField(default=0)
+    total_net_amount = models.DecimalField(
+        max_digits=settings.DEFAULT_MAX_DIGITS,
+        decimal_places=settings.DEFAULT_DECIMAL_PLACES,
+        default=0,
+    )
+    total_gross_amount = models.DecimalField(
+        max_digits=settings.DEFAULT_MAX_DIGITS,
+        decimal_places=settings.DEFAULT_DECIMAL_PLACES,
+        default=0,
+    )
+
+    class Meta:
+        app_label = "order"
+        unique_together = (("user_id", "partner_id", "day", "status"),)
+        indexes = [models.Index(fields=["day", "status"])]
+
+
+def _get_day():
+    return TruncDay("created", output_field=DateField(), tzinfo=pytz.utc)
+
+
+def _get_day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=pytz.utc)
+
+
+def _lock(keys: List[str], shared: bool = False):
+    """Hold transaction-level advisory locks for the keys until the commit.
+
+    Keys are locked in a fixed order, so overlapping lockers can't deadlock.
+    """
+    function = "pg_advisory_xact_lock_shared" if shared else "pg_advisory_xact_lock"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {function}(hashtext(key)) "
+            "FROM (SELECT DISTINCT unnest(%s::text[]) AS key ORDER BY key) AS keys",
+            [keys],
+        )
+
+
+def _aggregate_orders(orders) -> List[OrderTotals]:
+    rows = (
+        orders.exclude(status=OrderStatus.DRAFT)
+        .annotate(day=_get_day())
+        .values("user_id", "partner_id", "day", "status")
+        .annotate(
+            order_count=Count("pk"),
+            total_net_amount=Sum("total_net_amount"),
+            total_gross_amount=Sum("total_gross_amount"),
+        )
+        .order_by()
+    )
+    return [
+        OrderTotals(
+            user_id=row["user_id"] or 0,
+            partner_id=row["partner_id"] or 0,
+            day=row["day"],
+            status=row["status"],
+            order_count=row["order_count"],
+            total_net_amount=row["total_net_amount"] or 0,
+            total_gross_amount=row["total_gross_amount"] or 0,
+        )
+        for row in rows
+    ]
+
+
+def refresh_order_totals(order_ids: Iterable[int]):
+    """Recompute the totals of the users, partners and days of the orders.
+
+    Every status of a day is recomputed, so it's also correct after the
+    status of an order changes and can safely run more than once. Refreshes
+    of the same user, partner and day are serialized by an advisory lock and
+    aggregate only once they hold it, so the last one to commit has read
+    every order committed before it.
+    """
+    orders = (
+        Order.objects.filter(pk__in=order_ids)
+        .annotate(day=_get_day())
+        .values_list("user_id", "partner_id", "day")
+        .order_by()
+        .distinct()
+    )
+    keys = list(orders)
+    if not keys:
+        return
+    orders_lookup = reduce(
+        or_,
+        [
+            Q(
+                user_id=user_id,
+                partner_id=partner_id,
+                created__gte=_get_day_start(day),
+                created__lt=_get_day_start(day + timedelta(days=1)),
+            )
+            for user_id, partner_id, day in keys
+        ],
+    )
+    totals_lookup = reduce(
+        or_,
+        [
+            Q(user_id=user_id or 0, partner_id=partner_id or 0, day=day)
+            for user_id, partner_id, day in keys
+        ],
+    )
+    with transaction.atomic():
+        _lock([ORDER_TOTALS_LOCK], shared=True)
+        _lock(
+            [
+                f"{ORDER_TOTALS_LOCK}:{user_id or 0}:{partner_id or 0}:{day}"
+                for user_id, partner_id, day in keys
+            ]
+        )
+        rows = _aggregate_orders(Order.objects.filter(orders_lookup))
+        OrderTotals.objects.filter(totals_lookup).delete()
+        OrderTotals.objects.bulk_create(rows)
+
+
+def schedule_order_totals_refresh(order_ids: List[int]):
+    """Refresh the totals of the orders once the current transaction commits."""
+    from .tasks import refresh_order_totals_task
+
+    transaction.on_commit(lambda: refresh_order_totals_task.delay(order_ids))
+
+
+def rebuild_order_totals(since: Optional[date] = None):
+    """Recompute the totals of every day from `since` on from the orders."""
+    orders = Order.objects.all()
+    totals = OrderTotals.objects.all()
+    if since is not None:
+        orders = orders.filter(created__gte=_get_day_start(since))
+        totals = totals.filter(day__gte=since)
+    with transaction.atomic():
+        _lock([ORDER_TOTALS_LOCK])
+        rows = _aggregate_orders(orders)
+        totals.delete()
+        OrderTotals.objects.bulk_create(rows, batch_size=1000)
+
+
+def reconcile_order_totals():
+    today = datetime.now(pytz.utc).date()
+    rebuild_order_totals(since=today - timedelta(days=ORDER_TOTALS_RECONCILE_DAYS))
+
+
+def get_order_totals(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    user_ids: Optional[Iterable[int]] = None,
+    partner_ids: Optional[Iterable[int]] = None,
+) -> TaxedMoney:
+    """Return the total of the counted orders created in a range of UTC days.
+
+    Both ends of the range are inclusive and optional.
+    """
+    totals = OrderTotals.objects.exclude(status__in=EXCLUDED_STATUSES)
+    if start_date is not None:
+        totals = totals.filter(day__gte=start_date)
+    if end_date is not None:
+        totals = totals.filter(day__lte=end_date)
+    if user_ids is not None:
+        totals = totals.filter(user_id__in=user_ids)
+    if partner_ids is not None:
+        totals = totals.filter(partner_id__in=partner_ids)
+    result = totals.aggregate(
+        net=Sum("total_net_amount"), gross=Sum("total_gross_amount")
+    )
+    currency = settings.DEFAULT_CURRENCY
+    return TaxedMoney(
+        Money(result["net"] or 0, currency), Money(result["gross"] or 0, currency)
+    )
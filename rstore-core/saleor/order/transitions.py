@@ -0,0 +1,422 @@
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Max, Sum
+
+from ..core.total_count import invalidate_total_count
+from ..payment import ChargeStatus, PaymentError, gateway
+from ..payment.models import Payment
+from ..payment.utils import create_payment
+from ..plugins.manager import get_plugins_manager
+from ..warehouse.models import Allocation, Stock
+from . import FulfillmentStatus, OrderEvents, OrderStatus
+from .catalog import update_stock_quantities
+from .error_codes import OrderErrorCode
+from .models import Fulfillment, FulfillmentLine, Order, OrderEvent, OrderLine
+
+
+class OrderStatusChange:
+    FULFILL = "fulfill"
+    UNFULFILL = "unfulfill"
+    CANCEL = "cancel"
+
+
+def _error(field: str, message: str, code: str) -> ValidationError:
+    return ValidationError({field: ValidationError(message, code=code)})
+
+
+class OrderStatusTransition:
+    """Move orders to a requested order and payment status.
+
+    Orders are locked and moved as a set: fulfillments, stock, allocations,
+    lines and statuses of all of them are changed with a fixed number of
+    queries. They get the same events as when they're fulfilled, unfulfilled
+    or canceled one by one, created in bulk. Plugins are notified of every
+    changed order once the transaction commits, and the side effects that can
+    wait, like notifications and achievements, are left to one task per
+    transition.
+    """
+
+    def __init__(
+        self,
+        order_status: Optional[str] = None,
+        payment_status: Optional[str] = None,
+        user=None,
+        warehouse=None,
+        customer_ip_address: Optional[str] = None,
+    ):
+        self.order_status = order_status
+        self.payment_status = payment_status
+        self.user = user if user and not user.is_anonymous else None
+        self.warehouse = warehouse
+        self.customer_ip_address = customer_ip_address
+
+    def get_status_change(self, order: Order) -> Optional[str]:
+        status = order.status
+        if self.order_status is None or self.order_status == status:
+            return None
+        if self.order_status == OrderStatus.FULFILLED:
+            if status == OrderStatus.UNFULFILLED:
+                return OrderStatusChange.FULFILL
+            raise _error(
+                "order_status",
+                "Canceled order can not be fulfilled.",
+                OrderErrorCode.INVALID,
+            )
+        if self.order_status == OrderStatus.UNFULFILLED:
+            if status == OrderStatus.FULFILLED:
+                return OrderStatusChange.UNFULFILL
+            raise _error(
+                "order_status",
+                "Canceled order can not be unfulfilled.",
+                OrderErrorCode.INVALID,
+            )
+        if self.order_status == OrderStatus.CANCELED:
+            return OrderStatusChange.CANCEL
+        raise _error(
+            "order_status",
+            "Order status can only be UNFULFILLED, FULFILLED or CANCELED",
+            OrderErrorCode.INVALID,
+        )
+
+    def clean_payment_status(self, payment: Optional[Payment]) -> bool:
+        """Return whether the payment has to change to the requested status."""
+        charge_status = payment.charge_status if payment else None
+        if self.payment_status is None or self.payment_status == charge_status:
+            return False
+        if self.payment_status == ChargeStatus.FULLY_REFUNDED:
+            if charge_status == ChargeStatus.FULLY_CHARGED:
+                return True
+            raise _error(
+                "payment_status",
+                "An unpaid order can not be refunded.",
+                OrderErrorCode.CANNOT_REFUND,
+            )
+        if self.payment_status == ChargeStatus.FULLY_CHARGED:
+            if charge_status == ChargeStatus.NOT_CHARGED:
+                return True
+            raise _error(
+                "payment_status",
+                "A refunded order can not be paid again.",
+                OrderErrorCode.PAYMENT_ERROR,
+            )
+        if self.payment_status == ChargeStatus.NOT_CHARGED:
+            if payment is None:
+                return True
+            raise _error(
+                "payment_status",
+                "A paid or refunded order can not be undone.",
+                OrderErrorCode.PAYMENT_ERROR,
+            )
+        raise _error(
+            "payment_status",
+            "Payment status can only be FULLY_CHARGED, FULLY_REFUNDED or NOT_CHARGED",
+            OrderErrorCode.INVALID,
+        )
+
+    def change_payment(self, order: Order, payment: Optional[Payment]):
+        if self.payment_status == ChargeStatus.FULLY_REFUNDED:
+            gateway.refund(payment)
+        elif self.payment_status == ChargeStatus.FULLY_CHARGED:
+            gateway.capture(payment)
+        else:
+            payment = create_payment(
+                gateway="rstore.payments",
+                customer_ip_address=self.customer_ip_address,
+                email=order.user_email,
+                order=order,
+                payment_token=str(uuid.uuid4()),
+                total=order.total.gross.amount,
+                currency=order.total.gross.currency,
+            )
+            gateway.authorize(payment, payment.token)
+
+    def run(self, order_ids: List[int]) -> Dict[int, ValidationError]:
+        """Move the orders and return the errors of the ones left as they were.
+
+        Orders that don't exist are left out of both.
+        """
+        errors = {}
+        with transaction.atomic():
+            orders = Order.objects.select_for_update().filter(pk__in=order_ids)
+            orders = list(orders.order_by("pk"))
+            # Orders are charged with their first payment.
+            payments = {}
+            for payment in Payment.objects.filter(order__in=orders).order_by("-pk"):
+                payments[payment.order_id] = payment
+
+            changes = defaultdict(list)
+            for order in orders:
+                payment = payments.get(order.pk)
+                try:
+                    change = self.get_status_change(order)
+                    if self.clean_payment_status(payment):
+                        # Gateway calls can't be made in bulk; a savepoint
+                        # keeps a failed one from undoing the rest.
+                        with transaction.atomic():
+                            self.change_payment(order, payment)
+                except ValidationError as e:
+                    errors[order.pk] = e
+                    continue
+                except PaymentError as e:
+                    errors[order.pk] = _error(
+                        "payment_status", str(e), OrderErrorCode.PAYMENT_ERROR
+                    )
+                    continue
+                if change:
+                    changes[change].append(order)
+
+            events = []
+            events += self.fulfill(changes[OrderStatusChange.FULFILL])
+            events += self.unfulfill(changes[OrderStatusChange.UNFULFILL])
+            events += self.cancel(changes[OrderStatusChange.CANCEL])
+            OrderEvent.objects.bulk_create(events)
+            transaction.on_commit(lambda: self.notify_plugins(changes))
+
+            updated_ids = [order.pk for order in orders if order.pk not in errors]
+            canceled_ids = [order.pk for order in changes[OrderStatusChange.CANCEL]]
+            status_changed_ids = [
+                order.pk for changed in changes.values() for order in changed
+            ]
+            self.schedule_status_changed(updated_ids, status_changed_ids, canceled_ids)
+        return errors
+
+    def set_status(self, orders: List[Order], status: str):
+        Order.objects.filter(pk__in=[order.pk for order in orders]).update(
+            status=status
+        )
+        invalidate_total_count(Order)
+        for order in orders:
+            order.status = status
+
+    def fulfill(self, orders: List[Order]) -> List[OrderEvent]:
+        if not orders:
+            return []
+        order_ids = [order.pk for order in orders]
+        lines = list(
+            OrderLine.objects.filter(
+                order_id__in=order_ids, quantity_fulfilled__lt=F("quantity")
+            ).values("pk", "order_id", "variant_id", "quantity", "quantity_fulfilled")
+        )
+        last_fulfillment_orders = dict(
+            Fulfillment.objects.filter(order_id__in=order_ids)
+            .values("order_id")
+            .annotate(last=Max("fulfillment_order"))
+            .values_list("order_id", "last")
+        )
+        fulfillments = Fulfillment.objects.bulk_create(
+            [
+                Fulfillment(
+                    order=order,
+                    fulfillment_order=last_fulfillment_orders.get(order.pk, 0) + 1,
+                    status=FulfillmentStatus.FULFILLED,
+                )
+                for order in orders
+            ]
+        )
+        fulfillments_by_order = {
+            fulfillment.order_id: fulfillment for fulfillment in fulfillments
+        }
+
+        stock_ids = {}
+        if self.warehouse is not None:
+            stock_ids = dict(
+                Stock.objects.filter(
+                    warehouse=self.warehouse,
+                    product_variant_id__in={line["variant_id"] for line in lines},
+                ).values_list("product_variant_id", "pk")
+            )
+        quantities = defaultdict(int)
+        fulfillment_lines = []
+        for line in lines:
+            quantity = line["quantity"] - line["quantity_fulfilled"]
+            quantities[line["variant_id"]] -= quantity
+            fulfillment_lines.append(
+                FulfillmentLine(
+                    order_line_id=line["pk"],
+                    fulfillment=fulfillments_by_order[line["order_id"]],
+                    quantity=quantity,
+                    stock_id=stock_ids.get(line["variant_id"]),
+                )
+            )
+        fulfillment_lines = FulfillmentLine.objects.bulk_create(fulfillment_lines)
+        update_stock_quantities(self.warehouse, quantities)
+        # Every line is fulfilled in full, so nothing stays allocated.
+        self.deallocate(orders)
+        OrderLine.objects.filter(pk__in=[line["pk"] for line in lines]).update(
+            quantity_fulfilled=F("quantity")
+        )
+        self.set_status(orders, OrderStatus.FULFILLED)
+
+        fulfilled_items = defaultdict(list)
+        for fulfillment_line in fulfillment_lines:
+            fulfilled_items[fulfillment_line.fulfillment.order_id].append(
+                fulfillment_line.pk
+            )
+        return [
+            OrderEvent(
+                order=order,
+                user=self.user,
+                type=OrderEvents.FULFILLMENT_FULFILLED_ITEMS,
+                parameters={"fulfilled_items": fulfilled_items[order.pk]},
+            )
+            for order in orders
+        ]
+
+    def allocate(self, line_quantities: List[Tuple[int, int, int]]):
+        """Allocate restocked quantities to their order lines again.
+
+        Takes the order line ID, variant ID and quantity of every restocked
+        line; quantities are allocated from the stock of the warehouse.
+        """
+        if self.warehouse is None or not line_quantities:
+            return
+        stock_ids = dict(
+            Stock.objects.filter(
+                warehouse=self.warehouse,
+                product_variant_id__in={
+                    variant_id for _, variant_id, _ in line_quantities
+                },
+            ).values_list("product_variant_id", "pk")
+        )
+        allocations = {
+            (allocation.order_line_id, allocation.stock_id): allocation
+            for allocation in Allocation.objects.filter(
+                order_line_id__in=[line_id for line_id, _, _ in line_quantities],
+                stock_id__in=stock_ids.values(),
+            )
+        }
+        new_allocations, changed_allocations = [], []
+        for order_line_id, variant_id, quantity in line_quantities:
+            stock_id = stock_ids.get(variant_id)
+            if stock_id is None:
+                continue
+            allocation = allocations.get((order_line_id, stock_id))
+            if allocation is None:
+                new_allocations.append(
+                    Allocation(
+                        order_line_id=order_line_id,
+                        stock_id=stock_id,
+                        quantity_allocated=quantity,
+                    )
+                )
+            else:
+                allocation.quantity_allocated += quantity
+                changed_allocations.append(allocation)
+        Allocation.objects.bulk_update(changed_allocations, ["quantity_allocated"])
+        Allocation.objects.bulk_create(new_allocations)
+
+    def deallocate(self, orders: List[Order]):
+        Allocation.objects.filter(
+            order_line__order__in=orders, quantity_allocated__gt=0
+        ).update(quantity_allocated=0)
+
+    def cancel_fulfillments(
+        self, orders: List[Order], allocate: bool
+    ) -> List[OrderEvent]:
+        """Cancel the fulfillments of the orders and restock their items.
+
+        With `allocate`, the restocked items are allocated to their lines again,
+        as the lines of an unfulfilled order are. Returns the canceled and
+        restocked events of every canceled fulfillment.
+        """
+        if not orders:
+            return []
+        fulfillments = list(
+            Fulfillment.objects.filter(order__in=orders)
+            .exclude(status=FulfillmentStatus.CANCELED)
+            .order_by("pk")
+        )
+        fulfillment_lines = FulfillmentLine.objects.filter(fulfillment__in=fulfillments)
+        fulfillment_quantities = dict(
+            fulfillment_lines.values("fulfillment_id")
+            .annotate(quantity=Sum("quantity"))
+            .values_list("fulfillment_id", "quantity")
+        )
+        line_quantities = list(
+            fulfillment_lines.values("order_line_id", "order_line__variant_id")
+            .annotate(quantity=Sum("quantity"))
+            .values_list("order_line_id", "order_line__variant_id", "quantity")
+        )
+        quantities = defaultdict(int)
+        for _, variant_id, quantity in line_quantities:
+            quantities[variant_id] += quantity
+        update_stock_quantities(self.warehouse, quantities)
+        if allocate:
+            self.allocate(line_quantities)
+        OrderLine.objects.filter(order__in=orders).update(quantity_fulfilled=0)
+        Fulfillment.objects.filter(
+            pk__in=[fulfillment.pk for fulfillment in fulfillments]
+        ).update(status=FulfillmentStatus.CANCELED)
+
+        warehouse_pk = self.warehouse.pk if self.warehouse else None
+        events = []
+        for fulfillment in fulfillments:
+            order_id = fulfillment.order_id
+            events.append(
+                OrderEvent(
+                    order_id=order_id,
+                    user=self.user,
+                    type=OrderEvents.FULFILLMENT_CANCELED,
+                    parameters={
+                        "composed_id": f"{order_id}-{fulfillment.fulfillment_order}"
+                    },
+                )
+            )
+            events.append(
+                OrderEvent(
+                    order_id=order_id,
+                    user=self.user,
+                    type=OrderEvents.FULFILLMENT_RESTOCKED_ITEMS,
+                    parameters={
+                        "quantity": fulfillment_quantities.get(fulfillment.pk, 0),
+                        "warehouse": warehouse_pk,
+                    },
+                )
+            )
+        return events
+
+    def unfulfill(self, orders: List[Order]) -> List[OrderEvent]:
+        events = self.cancel_fulfillments(orders, allocate=True)
+        self.set_status(orders, OrderStatus.UNFULFILLED)
+        return events
+
+    def cancel(self, orders: List[Order]) -> List[OrderEvent]:
+        events = self.cancel_fulfillments(
+            [order for order in orders if order.status != OrderStatus.UNFULFILLED],
+            allocate=False,
+        )
+        self.deallocate(orders)
+        self.set_status(orders, OrderStatus.CANCELED)
+        return events + [
+            OrderEvent(order=order, user=self.user, type=OrderEvents.CANCELED)
+            for order in orders
+        ]
+
+    def notify_plugins(self, changes: Dict[str, List[Order]]):
+        """Notify plugins of the changed orders, like single order actions do."""
+        manager = get_plugins_manager()
+        for order in changes[OrderStatusChange.FULFILL]:
+            manager.order_updated(order)
+            manager.order_fulfilled(order)
+        for order in changes[OrderStatusChange.UNFULFILL]:
+            manager.order_updated(order)
+        for order in changes[OrderStatusChange.CANCEL]:
+            manager.order_cancelled(order)
+            manager.order_updated(order)
+
+    def schedule_status_changed(self, order_ids, status_changed_ids, canceled_ids):
+        """Run the side effects of the transition in one task after commit."""
+        from .tasks import order_status_changed_task
+
+        if not order_ids:
+            return
+        order_status = self.order_status
+        transaction.on_commit(
+            lambda: order_status_changed_task.delay(
+                order_ids, order_status, status_changed_ids, canceled_ids
+            )
+        )
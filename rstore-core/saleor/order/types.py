@@ -1,16 +1,22 @@
+from operator import attrgetter
+
 import graphene
 from django.core.exceptions import ValidationError
 from graphene import relay
 from graphql_jwt.exceptions import PermissionDenied
 
 from ...core.permissions import AccountPermissions, OrderPermissions
-from ...core.taxes import display_gross_prices
+from ...core.taxes import display_gross_prices, zero_money, zero_taxed_money
 from ...order import OrderStatus, models
 from ...order.models import FulfillmentStatus
+from ...order.pipeline import get_order_processing_status
+from ...order.receipts import RECEIPT_PRERENDER, schedule_receipt_render
 from ...order.utils import get_order_country, get_valid_shipping_methods_for_order
+from ...payment import ChargeStatus
 from ...plugins.manager import get_plugins_manager
 from ...product.templatetags.product_images import get_product_image_thumbnail
 from ...warehouse import models as warehouse_models
+from ..account.dataloaders import UserByUserIdLoader
 from ..account.types import User, Document
 from ..core.connection import CountableDjangoObjectType
 from ..core.types.common import Image
@@ -23,9 +29,33 @@ from ..payment.types import OrderAction, Payment, PaymentChargeStatusEnum
 from ..product.types import ProductVariant
 from ..shipping.types import ShippingMethod
 from ..warehouse.types import Warehouse
-from .enums import OrderEventsEmailsEnum, OrderEventsEnum
+from .dataloaders import (
+    FulfillmentsByOrderIdLoader,
+    OrderEventsByOrderIdLoader,
+    OrderLineByIdLoader,
+    OrderLinesByOrderIdLoader,
+    OrderPipelineStagesByOrderIdLoader,
+    PaymentsByOrderIdLoader,
+)
+from .enums import (
+    OrderEventsEmailsEnum,
+    OrderEventsEnum,
+    OrderPipelineStageNameEnum,
+    OrderPipelineStatusEnum,
+    OrderProcessingStatusEnum,
+)
 from .utils import validate_draft_order
 
+PAID_CHARGE_STATUSES = (
+    ChargeStatus.PARTIALLY_CHARGED,
+    ChargeStatus.FULLY_CHARGED,
+    ChargeStatus.PARTIALLY_REFUNDED,
+)
+
+
+def _get_last_payment(payments):
+    return max(payments, default=None, key=attrgetter("pk"))
+
 
 class OrderEventOrderLineObject(graphene.ObjectType):
     quantity = graphene.Int(description="The variant quantity.")
@@ -71,11 +101,13 @@ class OrderEvent(CountableDjangoObjectType):
     def resolve_user(root: models.OrderEvent, info):
         user = info.context.user
         if (
-            user == root.user
+            user.pk == root.user_id
             or user.has_perm(AccountPermissions.VIEW_USER)
             or user.has_perm(AccountPermissions.MANAGE_STAFF)
         ):
-            return root.user
+            if root.user_id is None:
+                return None
+            return UserByUserIdLoader(info.context).load(root.user_id)
         raise PermissionDenied()
 
     @staticmethod
@@ -121,33 +153,34 @@ class OrderEvent(CountableDjangoObjectType):
         return root.order_id
 
     @staticmethod
-    def resolve_lines(root: models.OrderEvent, _info):
+    def resolve_lines(root: models.OrderEvent, info):
         raw_lines = root.parameters.get("lines", None)
 
         if not raw_lines:
             return None
 
-        line_pks = []
-        for entry in raw_lines:
-            line_pks.append(entry.get("line_pk", None))
-
-        lines = models.OrderLine.objects.filter(pk__in=line_pks).all()
-        results = []
-        for raw_line, line_pk in zip(raw_lines, line_pks):
-            line_object = None
-            for line in lines:
-                if line.pk == line_pk:
-                    line_object = line
-                    break
-            results.append(
-                OrderEventOrderLineObject(
-                    quantity=raw_line["quantity"],
-                    order_line=line_object,
-                    item_name=raw_line["item"],
+        line_pks = [entry.get("line_pk", None) for entry in raw_lines]
+
+        def _resolve_lines(loaded_lines):
+            # Entries without a line keep their position with no order line.
+            loaded_lines = iter(loaded_lines)
+            lines = [next(loaded_lines) if pk else None for pk in line_pks]
+            results = []
+            for raw_line, line_object in zip(raw_lines, lines):
+                results.append(
+                    OrderEventOrderLineObject(
+                        quantity=raw_line["quantity"],
+                        order_line=line_object,
+                        item_name=raw_line["item"],
+                    )
                 )
-            )
+            return results
 
-        return results
+        return (
+            OrderLineByIdLoader(info.context)
+            .load_many([pk for pk in line_pks if pk])
+            .then(_resolve_lines)
+        )
 
     @staticmethod
     def resolve_fulfilled_items(root: models.OrderEvent, _info):
@@ -284,6 +317,22 @@ class OrderLine(CountableDjangoObjectType):
         return root.translated_variant_name
 
 
+class OrderProcessingStage(graphene.ObjectType):
+    stage = OrderPipelineStageNameEnum(
+        description="Post-order processing stage.", required=True
+    )
+    status = OrderPipelineStatusEnum(description="Status of the stage.", required=True)
+    attempts = graphene.Int(
+        description="How many times the stage was run.", required=True
+    )
+    updated = graphene.DateTime(
+        description="Date and time of the last change of the stage.", required=True
+    )
+
+    class Meta:
+        description = "Represents a stage of the processing following order creation."
+
+
 class Order(CountableDjangoObjectType):
     fulfillments = graphene.List(
         Fulfillment, required=True, description="List of shipments for the order."
@@ -343,6 +392,18 @@ class Order(CountableDjangoObjectType):
         description="Returns True, if order requires shipping.", required=True
     )
     receipt = graphene.Field(Document, description="Order receipt")
+    processing_status = OrderProcessingStatusEnum(
+        description=(
+            "Status of the payment, receipt, notification, commission and target "
+            "processing following order creation."
+        ),
+        required=True,
+    )
+    processing_stages = graphene.List(
+        graphene.NonNull(OrderProcessingStage),
+        description="Stages of the processing following order creation.",
+        required=True,
+    )
 
     class Meta:
         description = "Represents an order in the shop."
@@ -375,84 +436,173 @@ class Order(CountableDjangoObjectType):
             "other_charge_name",
             "type",
         ]
+        optimizer_hints = {
+            "billing_address": {"select_related": ["billing_address"]},
+            "shipping_address": {"select_related": ["shipping_address"]},
+            "shipping_method": {"select_related": ["shipping_method"]},
+            "voucher": {"select_related": ["voucher"]},
+            "partner": {"select_related": ["partner"]},
+            "gift_cards": {"prefetch_related": ["gift_cards"]},
+        }
 
     @staticmethod
     def resolve_shipping_price(root: models.Order, _info):
         return root.shipping_price
 
     @staticmethod
-    def resolve_actions(root: models.Order, _info):
-        actions = []
-        payment = root.get_last_payment()
-        if root.can_capture(payment):
-            actions.append(OrderAction.CAPTURE)
-        if root.can_mark_as_paid():
-            actions.append(OrderAction.MARK_AS_PAID)
-        if root.can_refund(payment):
-            actions.append(OrderAction.REFUND)
-        if root.can_void(payment):
-            actions.append(OrderAction.VOID)
-        return actions
+    def resolve_actions(root: models.Order, info):
+        def _resolve_actions(payments):
+            actions = []
+            payment = _get_last_payment(payments)
+            if payment is None:
+                actions.append(OrderAction.MARK_AS_PAID)
+                return actions
+            if root.can_capture(payment):
+                actions.append(OrderAction.CAPTURE)
+            if root.can_refund(payment):
+                actions.append(OrderAction.REFUND)
+            if root.can_void(payment):
+                actions.append(OrderAction.VOID)
+            return actions
+
+        return (
+            PaymentsByOrderIdLoader(info.context).load(root.pk).then(_resolve_actions)
+        )
 
     @staticmethod
-    def resolve_subtotal(root: models.Order, _info):
-        return root.get_subtotal()
+    def resolve_subtotal(root: models.Order, info):
+        def _resolve_subtotal(lines):
+            return sum([line.get_total() for line in lines], zero_taxed_money())
+
+        return (
+            OrderLinesByOrderIdLoader(info.context)
+            .load(root.pk)
+            .then(_resolve_subtotal)
+        )
 
     @staticmethod
     def resolve_total(root: models.Order, _info):
         return root.total
 
     @staticmethod
-    def resolve_total_authorized(root: models.Order, _info):
+    def resolve_total_authorized(root: models.Order, info):
         # FIXME adjust to multiple payments in the future
-        return root.total_authorized
+        def _resolve_total_authorized(payments):
+            payment = _get_last_payment(payments)
+            return payment.get_authorized_amount() if payment else zero_money()
+
+        return (
+            PaymentsByOrderIdLoader(info.context)
+            .load(root.pk)
+            .then(_resolve_total_authorized)
+        )
 
     @staticmethod
-    def resolve_total_captured(root: models.Order, _info):
+    def resolve_total_captured(root: models.Order, info):
         # FIXME adjust to multiple payments in the future
-        return root.total_captured
+        def _resolve_total_captured(payments):
+            payment = _get_last_payment(payments)
+            return payment.get_captured_amount() if payment else zero_money()
+
+        return (
+            PaymentsByOrderIdLoader(info.context)
+            .load(root.pk)
+            .then(_resolve_total_captured)
+        )
 
     @staticmethod
-    def resolve_total_balance(root: models.Order, _info):
-        return root.total_balance
+    def resolve_total_balance(root: models.Order, info):
+        def _resolve_total_balance(payments):
+            payment = _get_last_payment(payments)
+            total_captured = payment.get_captured_amount() if payment else zero_money()
+            return total_captured - root.total.gross
+
+        return (
+            PaymentsByOrderIdLoader(info.context)
+            .load(root.pk)
+            .then(_resolve_total_balance)
+        )
 
     @staticmethod
     def resolve_fulfillments(root: models.Order, info):
         user = info.context.user
-        if user.is_staff:
-            qs = root.fulfillments.all()
-        else:
-            qs = root.fulfillments.exclude(status=FulfillmentStatus.CANCELED)
-        return qs.order_by("pk")
+
+        def _resolve_fulfillments(fulfillments):
+            if user.is_staff:
+                return fulfillments
+            return [
+                fulfillment
+                for fulfillment in fulfillments
+                if fulfillment.status != FulfillmentStatus.CANCELED
+            ]
+
+        return (
+            FulfillmentsByOrderIdLoader(info.context)
+            .load(root.pk)
+            .then(_resolve_fulfillments)
+        )
 
     @staticmethod
-    def resolve_lines(root: models.Order, _info):
-        return root.lines.all().order_by("pk")
+    def resolve_lines(root: models.Order, info):
+        return OrderLinesByOrderIdLoader(info.context).load(root.pk)
 
     @staticmethod
     @permission_required(OrderPermissions.VIEW_ORDER)
-    def resolve_events(root: models.Order, _info):
-        return root.events.all().order_by("pk")
+    def resolve_events(root: models.Order, info):
+        return OrderEventsByOrderIdLoader(info.context).load(root.pk)
+
+    @staticmethod
+    def resolve_is_paid(root: models.Order, info):
+        def _resolve_is_paid(payments):
+            total_paid = sum(
+                [
+                    payment.get_captured_amount()
+                    for payment in payments
+                    if payment.charge_status in PAID_CHARGE_STATUSES
+                ],
+                zero_taxed_money(),
+            )
+            return total_paid.gross >= root.total.gross
 
-    @staticmethod
-    def resolve_is_paid(root: models.Order, _info):
-        return root.is_fully_paid()
+        return (
+            PaymentsByOrderIdLoader(info.context)
+            .load(root.pk)
+            .then(_resolve_is_paid)
+        )
 
     @staticmethod
     def resolve_number(root: models.Order, _info):
         return str(root.pk)
 
     @staticmethod
-    def resolve_payment_status(root: models.Order, _info):
-        return root.get_payment_status()
+    def resolve_payment_status(root: models.Order, info):
+        def _resolve_payment_status(payments):
+            payment = _get_last_payment(payments)
+            return payment.charge_status if payment else ChargeStatus.NOT_CHARGED
+
+        return (
+            PaymentsByOrderIdLoader(info.context)
+            .load(root.pk)
+            .then(_resolve_payment_status)
+        )
 
     @staticmethod
-    def resolve_payment_status_display(root: models.Order, _info):
-        return root.get_payment_status_display()
+    def resolve_payment_status_display(root: models.Order, info):
+        def _resolve_payment_status_display(payments):
+            payment = _get_last_payment(payments)
+            if payment:
+                return payment.get_charge_status_display()
+            return dict(ChargeStatus.CHOICES).get(ChargeStatus.NOT_CHARGED)
+
+        return (
+            PaymentsByOrderIdLoader(info.context)
+            .load(root.pk)
+            .then(_resolve_payment_status_display)
+        )
 
     @staticmethod
-    def resolve_payments(root: models.Order, _info):
-        return root.payments.all()
+    def resolve_payments(root: models.Order, info):
+        return PaymentsByOrderIdLoader(info.context).load(root.pk)
 
     @staticmethod
     def resolve_status_display(root: models.Order, _info):
@@ -475,8 +625,10 @@ class Order(CountableDjangoObjectType):
     @staticmethod
     def resolve_user(root: models.Order, info):
         user = info.context.user
-        if user == root.user or user.has_perm(AccountPermissions.VIEW_USER):
-            return root.user
+        if user.pk == root.user_id or user.has_perm(AccountPermissions.VIEW_USER):
+            if root.user_id is None:
+                return None
+            return UserByUserIdLoader(info.context).load(root.user_id)
         raise PermissionDenied()
 
     @staticmethod
@@ -500,8 +652,15 @@ class Order(CountableDjangoObjectType):
         return available
 
     @staticmethod
-    def resolve_is_shipping_required(root: models.Order, _info):
-        return root.is_shipping_required()
+    def resolve_is_shipping_required(root: models.Order, info):
+        def _resolve_is_shipping_required(lines):
+            return any(line.is_shipping_required for line in lines)
+
+        return (
+            OrderLinesByOrderIdLoader(info.context)
+            .load(root.pk)
+            .then(_resolve_is_shipping_required)
+        )
 
     @staticmethod
     def resolve_gift_cards(root: models.Order, _info):
@@ -518,4 +677,21 @@ class Order(CountableDjangoObjectType):
 
     @staticmethod
     def resolve_receipt(root: models.Order, _info):
+        # Receipts are never rendered on the request. A missing one is queued
+        # and returned once the receipt worker has rendered it; without
+        # prerendering, a stored one is also queued in case it's outdated.
+        if not root.order_receipt_id or not RECEIPT_PRERENDER:
+            schedule_receipt_render(root, requested=True)
         return root.order_receipt
+
+    @staticmethod
+    def resolve_processing_status(root: models.Order, info):
+        return (
+            OrderPipelineStagesByOrderIdLoader(info.context)
+            .load(root.pk)
+            .then(get_order_processing_status)
+        )
+
+    @staticmethod
+    def resolve_processing_stages(root: models.Order, info):
+        return OrderPipelineStagesByOrderIdLoader(info.context).load(root.pk)
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import Optional
+
+import opentracing
+import opentracing.tags
+from decouple import config
+from django.core.cache import cache
+from graphql import GraphQLError, execute, parse, validate
+from graphql.backend.base import GraphQLDocument
+from graphql.backend.core import GraphQLCoreBackend
+from graphql.execution import ExecutionResult
+
+from .views import GraphQLView
+
+PERSISTED_QUERY_KEY_PREFIX = "persisted-query"
+PERSISTED_QUERIES_FILE = config("PERSISTED_QUERIES_FILE", default=None)
+PERSISTED_QUERIES_ALLOW_LIST = config(
+    "PERSISTED_QUERIES_ALLOW_LIST", default=False, cast=bool
+)
+GRAPHQL_DOCUMENT_CACHE_SIZE = config(
+    "GRAPHQL_DOCUMENT_CACHE_SIZE", default=500, cast=int
+)
+
+_registered_queries = None
+
+
+def get_query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def get_registered_queries() -> dict:
+    """Return the operations shipped with the clients, keyed by their hash."""
+    global _registered_queries
+    if _registered_queries is None:
+        _registered_queries = {}
+        if PERSISTED_QUERIES_FILE:
+            with open(PERSISTED_QUERIES_FILE) as f:
+                _registered_queries = json.load(f)
+    return _registered_queries
+
+
+def get_persisted_query(query_hash: str) -> Optional[str]:
+    query = get_registered_queries().get(query_hash)
+    if query is None and not PERSISTED_QUERIES_ALLOW_LIST:
+        query = cache.get(f"{PERSISTED_QUERY_KEY_PREFIX}:{query_hash}")
+    return query
+
+
+def persist_query(query_hash: str, query: str):
+    if get_query_hash(query) != query_hash:
+        raise GraphQLError("Provided sha256Hash does not match the query.")
+    if query_hash in get_registered_queries():
+        return
+    if PERSISTED_QUERIES_ALLOW_LIST:
+        raise GraphQLError("Query is not in the list of allowed operations.")
+    cache.set(f"{PERSISTED_QUERY_KEY_PREFIX}:{query_hash}", query, timeout=None)
+
+
+def resolve_persisted_query(data: dict) -> dict:
+    """Fill in the query of a request which refers to a persisted query.
+
+    Follows the automatic persisted queries protocol: a request may send only
+    `extensions.persistedQuery.sha256Hash`, and a client receiving
+    `PersistedQueryNotFound` retries with both the hash and the query, which
+    registers it. In the allow-list mode only the operations from
+    `PERSISTED_QUERIES_FILE` can be executed.
+    """
+    extensions = data.get("extensions") or {}
+    if isinstance(extensions, str):
+        extensions = json.loads(extensions)
+    persisted_query = extensions.get("persistedQuery")
+    query = data.get("query")
+
+    if not persisted_query:
+        if query and PERSISTED_QUERIES_ALLOW_LIST:
+            if get_query_hash(query) not in get_registered_queries():
+                raise GraphQLError("Query is not in the list of allowed operations.")
+        return data
+
+    query_hash = persisted_query.get("sha256Hash")
+    if not query_hash:
+        raise GraphQLError("Persisted query must provide sha256Hash.")
+    if query:
+        persist_query(query_hash, query)
+        return data
+    query = get_persisted_query(query_hash)
+    if query is None:
+        raise GraphQLError("PersistedQueryNotFound")
+    return {**data, "query": query}
+
+
+class DocumentCache:
+    """Thread-safe LRU cache of parsed and validated documents."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._documents: "OrderedDict[str, GraphQLDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[GraphQLDocument]:
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+            return document
+
+    def set(self, key: str, document: GraphQLDocument):
+        with self._lock:
+            self._documents[key] = document
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.max_size:
+                self._documents.popitem(last=False)
+
+
+def _get_invalid_result(errors, *_args, **_kwargs):
+    return ExecutionResult(errors=errors, invalid=True)
+
+
+class CachedDocumentBackend(GraphQLCoreBackend):
+    """Parse and validate every distinct query string once per process.
+
+    Valid documents are kept in an LRU cache keyed by the query hash and are
+    executed without being validated again.
+    """
+
+    def __init__(self, *args, cache_size=GRAPHQL_DOCUMENT_CACHE_SIZE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.document_cache = DocumentCache(cache_size)
+
+    def document_from_string(self, schema, document_string):
+        if not isinstance(document_string, str):
+            return super().document_from_string(schema, document_string)
+
+        tracer = opentracing.global_tracer()
+        key = f"{id(schema)}:{get_query_hash(document_string)}"
+        document = self.document_cache.get(key)
+        span = tracer.active_span
+        if span is not None:
+            span.set_tag("graphql.document_cache_hit", document is not None)
+        if document is not None:
+            return document
+
+        with tracer.start_active_span("graphql.parse") as scope:
+            scope.span.set_tag(opentracing.tags.COMPONENT, "graphql")
+            document_ast = parse(document_string)
+        with tracer.start_active_span("graphql.validate") as scope:
+            scope.span.set_tag(opentracing.tags.COMPONENT, "graphql")
+            validation_errors = validate(schema, document_ast)
+
+        if validation_errors:
+            return GraphQLDocument(
+                schema=schema,
+                document_string=document_string,
+                document_ast=document_ast,
+                execute=partial(_get_invalid_result, validation_errors),
+            )
+        document = GraphQLDocument(
+            schema=schema,
+            document_string=document_string,
+            document_ast=document_ast,
+            execute=partial(execute, schema, document_ast, **self.execute_params),
+        )
+        self.document_cache.set(key, document)
+        return document
+
+
+class PersistedQueryGraphQLView(GraphQLView):
+    """GraphQL view accepting persisted queries and caching parsed documents."""
+
+    def __init__(self, *args, backend=None, **kwargs):
+        if backend is None:
+            backend = CachedDocumentBackend()
+        super().__init__(*args, backend=backend, **kwargs)
+
+    def execute_graphql_request(self, request, data):
+        try:
+            data = resolve_persisted_query(data)
+        except GraphQLError as e:
+            return ExecutionResult(errors=[e], invalid=True)
+        return super().execute_graphql_request(request, data)
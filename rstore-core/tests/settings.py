@@ -0,0 +1,9 @@
+from saleor.settings import *  # noqa: F403
+
+SECRET_KEY = "NOTREALLY"
+
+DEFAULT_FROM_EMAIL = "saleor@example.com"
+
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]